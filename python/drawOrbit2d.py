@@ -103,11 +103,15 @@ class pOrbitViewer:
         self.StopMet  = self.M7Parser.TimePoints[-1]
         self.SaaPoca  = None
 
-    def getCoordinates(self, position):
-        position.processCoordinates()
-        lon = position.getLongitude()
-        lat = position.getLatitude()
-        dsaa = position.getDistanceToSAA()
+    def getCoordinates(self, met):
+        (lats, lons, alts) = self.M7Parser.getEarthCoordinates()
+        index = self.M7Parser.getSCPositionIndex((met, 0))
+        lon = float(lons[index])
+        lat = float(lats[index])
+        if self.M7Parser.SAAPolygon is None:
+            dsaa = -9999
+        else:
+            dsaa = self.M7Parser.SAAPolygon.getDistanceAt(lon, lat)
         return (lon, lat, dsaa)
 
     def run(self, deltaTimeStepMin, saaPocaTimePaddingMin, saaPocaMaxDistance):
@@ -118,8 +122,7 @@ class pOrbitViewer:
         for (i, met) in enumerate(self.M7Parser.TimePoints[:-1]):
             secFromStart = met - self.StartMet
             secToEnd = self.StopMet - met
-            position = self.M7Parser.getSCPosition((met, 0))
-            (lon, lat, dsaa) = self.getCoordinates(position)
+            (lon, lat, dsaa) = self.getCoordinates(met)
             self.Orbit.SetPoint(i, lon, lat)
             if i == 0:
                 date = pTimeUtils.met2utc(met, '%b %d, %Y %H:%M:%S')
@@ -162,8 +165,7 @@ class pOrbitViewer:
         maxLat = MIN_LAT
         for (i, met) in enumerate(self.M7Parser.TimePoints[:-1]):
             if abs(met - self.SaaPoca.Met) < timePadding:
-                position = self.M7Parser.getSCPosition((met, 0))
-                (lon, lat, dsaa) = self.getCoordinates(position)
+                (lon, lat, dsaa) = self.getCoordinates(met)
                 if lon < minLon:
                     minLon = lon
                 if lon > maxLon:
@@ -14,6 +14,39 @@ from copy import copy
 
 class pAEMcontributionIteratorBase(LDF.AEMcontributionIterator):
 
+    ## @var FusedFunctions
+    ## @brief Implementations of the per-channel variable functions,
+    #  inlined by the code generator into the header() and pha() methods of
+    #  the generated iterator (see pTKRcontributionIteratorBase.FusedFunctions
+    #  for the format). The arguments are the ones of header() and pha(),
+    #  i.e. cable (the tile cable id), channel (the tile channel id),
+    #  header (the contribution header) and pha (the tile pulse height).
+
+    FusedFunctions = {
+        # Number of tiles hit.
+        'acd_tile_count__pha__':
+        (None, ['acd_tile_countArray[0] += 1']),
+        # The tile hit map.
+        'acd_tile_hitmap__header__':
+        (None, ['acd_tile_hitmapArray[0] = header.hitMap()']),
+        # Number of hits per cable and channel [12,18].
+        'AcdHitChannel__pha__':
+        (None, ['AcdHitChannelArray[cable, channel] += 1'])
+        }
+
+    ## @var FusedGuards
+    ## @brief The range checks of the fused blocks (see
+    #  pTKRcontributionIteratorBase.FusedGuards): none for the ACD, where
+    #  an index out of range is a genuine error.
+
+    FusedGuards = {}
+
+    ## @var NoOpFunctions
+    ## @brief The iterator methods whose implementation below does nothing
+    #  (see pTKRcontributionIteratorBase.NoOpFunctions).
+
+    NoOpFunctions = []
+
     ## @brief Constructor.
     ## @param self
     #  The class instance.
@@ -102,41 +135,3 @@ class pAEMcontributionIteratorBase(LDF.AEMcontributionIterator):
                                    [cable, channel, self.AcceptList])
         if pha.parityError():
             self.ErrorHandler.fill('ACD_PHA_PARITY_ERROR', [cable, channel])
-
-    ## @brief Fill acd_tile_count tree branch.
-    ## @param self
-    #  The class instance.
-    ## @param cable
-    #  The tile cable id.
-    ## @param channel
-    #  The tile channel id.
-    ## @param pha
-    #  The tile pulse height.
-
-    def acd_tile_count__pha__(self, cable, channel, pha):
-	self.TreeMaker.getVariable('acd_tile_count')[0] += 1
-
-    ## @brief Fill acd_tile_hitmap tree branch.
-    ## @param self
-    #  The class instance.
-    ## @param cable
-    #  The tile cable id.
-    ## @param header
-    #  The contribution header.
-   
-    def acd_tile_hitmap__header__(self, cable, header):
-	self.TreeMaker.getVariable('acd_tile_hitmap')[0] = header.hitMap()
-
-    ## @brief Fill AcdHitChannel tree branch [12,18].
-    ## @param self
-    #  The class instance.
-    ## @param cable
-    #  The tile cable id.
-    ## @param channel
-    #  The tile channel id.
-    ## @param pha
-    #  The tile pulse height.
-
-    def AcdHitChannel__pha__(self, cable, channel, pha):
-	self.TreeMaker.getVariable('AcdHitChannel')[cable][channel] += 1
-
@@ -0,0 +1,341 @@
+#! /bin/env python
+
+## @package pBenchmark
+## @brief End to end benchmarks of the FastMon processing.
+#
+#  For each benchmark scenario (i.e. a set of detector occupancies, see
+#  BENCHMARK_SCENARIOS) a synthetic ldf file is written by the
+#  @ref pEventGenerator and processed by the pDataProcessor (with the stage
+#  profiler enabled, see @ref pStageProfiler) and by the
+#  pFastMonTreeProcessor, exactly as the FastMon scripts do. The event
+#  rate, the time spent in each stage, the time spent processing the ROOT
+#  tree and the peak resident memory are reported and written into an xml
+#  file, which can be used as a reference for the following runs: any
+#  scenario slower (or larger) than the reference by more than the given
+#  tolerance is flagged as a regression.
+#
+#  Each scenario runs in a separate process, so that the peak resident
+#  memory is not polluted by the previous ones. The event loop always runs
+#  in that single process: the stage profiler and the error handler of the
+#  pParallelProcessor workers are not merged back, so the stage timings and
+#  the fraction of events with errors would not be available.
+#
+#  If the LDF python bindings are not available (or if the --framing-only
+#  option is given), the scenario only measures the framing, i.e. the time
+#  needed to read the events out of the ldf file: no FastMon code decodes
+#  the events, and the results are reported (and compared with the
+#  reference) in a separate "framing" mode.
+#
+#  python pBenchmark.py [-n events] [-s scenario] [-r reference.xml] [-o results.xml]
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pBenchmark')
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import Queue
+import resource
+import multiprocessing
+
+from xml.dom         import minidom
+from pEventGenerator import pEventGenerator
+
+## @brief The benchmark scenarios: each entry is a (TKR, CAL, ACD)
+#  occupancy tuple (see pEventGenerator).
+
+BENCHMARK_SCENARIOS = {
+    'low'    : (0.01, 0.005, 0.01),
+    'nominal': (0.05, 0.02 , 0.05),
+    'high'   : (0.25, 0.10 , 0.20)
+    }
+
+## @brief The quantities compared with the reference (True if larger is
+#  better).
+
+BENCHMARK_FIGURES = {'events_per_second': True,
+                     'peak_rss_kb'      : False}
+
+## @brief The default tolerance for the comparison with the reference.
+
+BENCHMARK_TOLERANCE = 0.1
+
+
+## @brief Return the peak resident memory (in kB) of the current process
+#  and of its (terminated) child processes.
+
+def getPeakRSS():
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+## @brief Run a benchmark scenario and return the dictionary of the
+#  results.
+#
+#  This is the function run by the process running the scenario.
+## @param args
+#  The (scenario name, number of events, error rate, seed, configuration
+#  file path, work directory, framing only flag) tuple.
+
+def runScenario(args):
+    (scenario, numEvents, errorRate, seed, configFilePath, workDirPath,\
+     framingOnly) = args
+    (tkrOccupancy, calOccupancy, acdOccupancy) = BENCHMARK_SCENARIOS[scenario]
+    results = {'scenario'  : scenario,
+               'num_events': numEvents,
+               'stages'    : []}
+    basePath = os.path.join(workDirPath, scenario)
+    inputFilePath = '%s.ldf' % basePath
+    generator = pEventGenerator(tkrOccupancy, calOccupancy, acdOccupancy,\
+                                errorRate, seed)
+    startTime = time.time()
+    generator.writeFile(inputFilePath, numEvents)
+    results['generation_time'] = time.time() - startTime
+    results['injected_error_fraction'] =\
+        float(sum(generator.InjectedErrorsDict.values()))/max(numEvents, 1)
+    results['input_file_size'] = os.path.getsize(inputFilePath)
+    if not framingOnly:
+        try:
+            import LDF
+        except ImportError:
+            logger.warn('LDF bindings not available, measuring the framing '\
+                        'only.')
+            framingOnly = True
+    if framingOnly:
+        from pLDFReader import pLDFReader
+        results['mode'] = 'framing'
+        startTime = time.time()
+        reader = pLDFReader(inputFilePath)
+        numEvents = 0
+        while reader.readEvent() is not None:
+            numEvents += 1
+        reader.close()
+        elapsedTime = time.time() - startTime
+        results['elapsed_time'] = elapsedTime
+        results['events_per_second'] = numEvents/max(elapsedTime, 1e-9)
+        results['peak_rss_kb'] = getPeakRSS()
+        return results
+    from pStageProfiler import pStageProfiler
+    from pDataProcessor import pDataProcessor
+    results['mode'] = 'full'
+    dataProcessor = pDataProcessor(inputFilePath, configFilePath,\
+                                   '%s.root' % basePath,\
+                                   '%s.processed.root' % basePath,\
+                                   '%s.errors.xml' % basePath)
+    dataProcessor.Profiler = pStageProfiler()
+    startTime = time.time()
+    dataProcessor.startProcessing(-1)
+    elapsedTime = time.time() - startTime
+    results['elapsed_time'] = elapsedTime
+    results['events_per_second'] = numEvents/max(elapsedTime, 1e-9)
+    results['stages'] = dataProcessor.Profiler.getStages()
+    results['error_event_fraction'] =\
+        float(dataProcessor.ErrorHandler.NumErrorEvents)/max(numEvents, 1)
+    startTime = time.time()
+    dataProcessor.TreeProcessor.run()
+    results['tree_processing_time'] = time.time() - startTime
+    results['peak_rss_kb'] = getPeakRSS()
+    return results
+
+## @brief Run a benchmark scenario and put the results (or the error
+#  message) into a queue.
+#
+#  This is the target function of the process running the scenario.
+## @param args
+#  The arguments of runScenario().
+## @param queue
+#  The multiprocessing.Queue object.
+
+def runScenarioTarget(args, queue):
+    try:
+        queue.put((runScenario(args), None))
+    except BaseException, e:
+        queue.put((None, '%s: %s' % (e.__class__.__name__, e)))
+
+## @brief Run a benchmark scenario in a separate process.
+## @param args
+#  The arguments of runScenario().
+
+def runScenarioProcess(args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target = runScenarioTarget,
+                                      args = (args, queue))
+    process.start()
+    (results, error) = (None, 'process terminated unexpectedly')
+    while True:
+        try:
+            (results, error) = queue.get(timeout = 1)
+            break
+        except Queue.Empty:
+            if not process.is_alive():
+                break
+    process.join()
+    if error is not None:
+        sys.exit('Scenario %s failed (%s). Abort.' % (args[0], error))
+    return results
+
+## @brief Log the results of a benchmark scenario.
+## @param results
+#  The dictionary of the results.
+
+def logResults(results):
+    logger.info('Scenario %s (%s mode): %d events, %.1f events/s, '\
+                'peak RSS %d kB.' % (results['scenario'], results['mode'],\
+                                     results['num_events'],\
+                                     results['events_per_second'],\
+                                     results['peak_rss_kb']))
+    if 'error_event_fraction' in results:
+        logger.info('Events with errors: %.4f (injected %.4f).' %\
+                    (results['error_event_fraction'],\
+                     results['injected_error_fraction']))
+    if 'tree_processing_time' in results:
+        logger.info('Tree processing: %.2f s.' %\
+                    results['tree_processing_time'])
+    for (stageName, numCalls, elapsedTime) in results['stages']:
+        logger.info('  %-20s %10d calls %10.3f s (%.1f us/event)' %\
+                    (stageName, numCalls, elapsedTime,\
+                     1e6*elapsedTime/max(results['num_events'], 1)))
+
+## @brief Write the results of the benchmark scenarios into an xml file.
+## @param resultsList
+#  The list of the dictionaries of the results.
+## @param xmlFilePath
+#  The path to the output file.
+
+def writeResults(resultsList, xmlFilePath):
+    from pXmlWriter import pXmlWriter
+    logger.info('Writing benchmark results to %s...' % xmlFilePath)
+    writer = pXmlWriter(xmlFilePath)
+    writer.openTag('benchmark', {'date': time.asctime()})
+    writer.indent()
+    for results in resultsList:
+        writer.openTag('scenario', {'name': results['scenario'],
+                                    'mode': results['mode']})
+        writer.indent()
+        for key in sorted(results.keys()):
+            if key not in ['scenario', 'mode', 'stages']:
+                writer.writeTag(key, {}, results[key])
+        for (stageName, numCalls, elapsedTime) in results['stages']:
+            writer.writeTag('stage', {'name'   : stageName,
+                                      'calls'  : numCalls,
+                                      'seconds': '%.6f' % elapsedTime})
+        writer.backup()
+        writer.closeTag('scenario')
+    writer.backup()
+    writer.closeTag('benchmark')
+    writer.closeFile()
+
+## @brief Read the results of a previous benchmark from an xml file and
+#  return the dictionary of the figures (see BENCHMARK_FIGURES) indexed by
+#  (scenario name, mode).
+## @param xmlFilePath
+#  The path to the xml file.
+
+def readResults(xmlFilePath):
+    if not os.path.exists(xmlFilePath):
+        sys.exit('Could not find %s. Abort.' % xmlFilePath)
+    xmlDoc = minidom.parse(file(xmlFilePath))
+    resultsDict = {}
+    for element in xmlDoc.getElementsByTagName('scenario'):
+        figures = {}
+        for figureName in BENCHMARK_FIGURES.keys():
+            nodes = element.getElementsByTagName(figureName)
+            if nodes:
+                figures[figureName] =\
+                    float(nodes[0].firstChild.data.strip())
+        resultsDict[(element.getAttribute('name'),\
+                     element.getAttribute('mode'))] = figures
+    return resultsDict
+
+## @brief Compare the results of the benchmark scenarios with a reference
+#  and return the number of regressions.
+## @param resultsList
+#  The list of the dictionaries of the results.
+## @param referenceDict
+#  The dictionary returned by readResults().
+## @param tolerance
+#  The relative tolerance.
+
+def compareResults(resultsList, referenceDict, tolerance):
+    numRegressions = 0
+    for results in resultsList:
+        key = (results['scenario'], results['mode'])
+        if key not in referenceDict:
+            logger.warn('No reference for scenario %s (%s mode).' % key)
+            continue
+        for (figureName, largerIsBetter) in BENCHMARK_FIGURES.items():
+            if figureName not in referenceDict[key]:
+                continue
+            reference = referenceDict[key][figureName]
+            value = results[figureName]
+            if largerIsBetter:
+                regression = value < reference*(1 - tolerance)
+            else:
+                regression = value > reference*(1 + tolerance)
+            if regression:
+                logger.error('Scenario %s: %s = %s (reference %s).' %\
+                             (results['scenario'], figureName, value,\
+                              reference))
+                numRegressions += 1
+    return numRegressions
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options]')
+    parser.add_option('-n', '--num-events', dest = 'n', type = 'int',
+                      default = 10000, help = 'number of events per scenario')
+    parser.add_option('-s', '--scenario', dest = 's', action = 'append',
+                      default = None, help = 'scenario to run (%s)' %\
+                      ', '.join(sorted(BENCHMARK_SCENARIOS.keys())))
+    parser.add_option('-c', '--config-file', dest = 'c', default = None,
+                      help = 'path to the xml configuration file')
+    parser.add_option('-e', '--errors', dest = 'e', type = 'float',
+                      default = 0.01, help = 'fraction of events with errors')
+    parser.add_option('--seed', dest = 'seed', type = 'int', default = 0,
+                      help = 'seed of the random number generator')
+    parser.add_option('-o', '--output-file', dest = 'o', default = None,
+                      help = 'path to the output xml file')
+    parser.add_option('-r', '--reference', dest = 'r', default = None,
+                      help = 'path to the reference xml file')
+    parser.add_option('-t', '--tolerance', dest = 't', type = 'float',
+                      default = BENCHMARK_TOLERANCE,
+                      help = 'relative tolerance for the comparison')
+    parser.add_option('-d', '--work-dir', dest = 'd', default = None,
+                      help = 'directory for the files (kept)')
+    parser.add_option('--framing-only', dest = 'framing',
+                      action = 'store_true', default = False,
+                      help = 'only measure the framing even if LDF is '\
+                      'available')
+    (options, args) = parser.parse_args()
+    scenarios = options.s or ['nominal']
+    for scenario in scenarios:
+        if scenario not in BENCHMARK_SCENARIOS:
+            parser.error('unknown scenario %s.' % scenario)
+    if options.d is None:
+        workDirPath = tempfile.mkdtemp(prefix = 'pBenchmark')
+    else:
+        workDirPath = options.d
+        if not os.path.exists(workDirPath):
+            os.makedirs(workDirPath)
+    resultsList = []
+    try:
+        for scenario in scenarios:
+            results = runScenarioProcess((scenario, options.n, options.e,\
+                                          options.seed, options.c,\
+                                          workDirPath, options.framing))
+            logResults(results)
+            resultsList.append(results)
+    finally:
+        if options.d is None:
+            shutil.rmtree(workDirPath)
+    if options.o is not None:
+        writeResults(resultsList, options.o)
+    if options.r is not None:
+        numRegressions = compareResults(resultsList, readResults(options.r),\
+                                        options.t)
+        if numRegressions:
+            sys.exit('%d benchmark regression(s) found.' % numRegressions)
+        logger.info('No regression with respect to %s.' % options.r)
@@ -5,10 +5,65 @@ import LDF
 
 from copy import copy
 
+## @brief The number of towers.
+
+NUM_CAL_TOWERS  = 16
+
+## @brief The number of CAL layers per tower.
+
+NUM_CAL_LAYERS  = 8
+
+## @brief The number of CAL columns per layer.
+
+NUM_CAL_COLUMNS = 12
+
 ## @brief Base Class for the CAL contribution iterator
 
 class pCALcontributionIteratorBase(LDF.CALcontributionIterator):
 
+    ## @var FusedFunctions
+    ## @brief Implementations of the per-log variable functions, inlined by
+    #  the code generator into the log() method of the generated iterator
+    #  (see pTKRcontributionIteratorBase.FusedFunctions for the format).
+    #  The arguments are the ones of log(), i.e. tower (the tower id),
+    #  layer (the CAL layer id) and calLog (the CAL log object), plus the
+    #  column local (see FusedGuards).
+
+    FusedFunctions = {
+        # Logs hit per column per layer for each tower of the LAT.
+        'CalXHit_TowerCalLayerCalColumn__log__':
+        (None, ['CalXHit_TowerCalLayerCalColumnArray'
+                '[tower, layer, column] = 1']),
+        # Ranges of the log ends with a signal, per column per layer for
+        # each tower of the LAT.
+        'CalLogEndRangeHit__log__':
+        (None, ['calLogEnd = calLog.negative()',
+                'if calLogEnd.value() > 0:',
+                '    CalLogEndRangeHitArray'
+                '[tower, layer, column, 0, calLogEnd.range()] = 1',
+                'calLogEnd = calLog.positive()',
+                'if calLogEnd.value() > 0:',
+                '    CalLogEndRangeHitArray'
+                '[tower, layer, column, 1, calLogEnd.range()] = 1'])
+        }
+
+    ## @var FusedGuards
+    ## @brief The range check of the fused block of log() (see
+    #  pTKRcontributionIteratorBase.FusedGuards). The log ranges are 2-bit
+    #  fields and need no check.
+
+    FusedGuards = {
+        'log': (['column = calLog.column()'],
+                'tower < NUM_CAL_TOWERS and layer < NUM_CAL_LAYERS and '
+                'column < NUM_CAL_COLUMNS')
+        }
+
+    ## @var NoOpFunctions
+    ## @brief The iterator methods whose implementation below does nothing
+    #  (see pTKRcontributionIteratorBase.NoOpFunctions).
+
+    NoOpFunctions = ['log']
+
     ## @brief Constructor.
     ## @param self
     #  The class instance.
@@ -98,24 +153,6 @@ class pCALcontributionIteratorBase(LDF.CALcontributionIterator):
     #def CalXHit_TowerCalLayer__log__(self, tower, layer, calLog):
     #    self.TreeMaker.getVariable("CalXHit_TowerCalLayer")[tower][layer] += 1
 
-    ## @brief Fill CalXHit_TowerCalLayerCalColumn tree branch
-    ## Number of logs hit per column per layer for each tower of the LAT
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The tower id.
-    ## @param layer
-    #  The CAL layer id.
-    ## @param calLog
-    #  The CAL log object.
-
-    def CalXHit_TowerCalLayerCalColumn__log__(self, tower, layer, calLog):
-        try:
-            self.TreeMaker.getVariable("CalXHit_TowerCalLayerCalColumn")\
-             [tower][layer][calLog.column()] = 1
-        except IndexError:
-            pass
-        
     ## @brief Fill CalTowerCount tree branch
     ## Number of calorimeters with at least one log hit
     ## @param self
@@ -125,19 +162,3 @@ class pCALcontributionIteratorBase(LDF.CALcontributionIterator):
         if self.contribution().numLogAccepts() > 0:
 	    self.TreeMaker.getVariable("CalTowerCount")[0] += 1
 
-
-    def CalLogEndRangeHit__log__(self, tower, layer, calLog):
-        calLogEnd = calLog.negative()
-        if calLogEnd.value() > 0:
-            try:
-                self.TreeMaker.getVariable('CalLogEndRangeHit')\
-                 [tower][layer][calLog.column()][0][calLogEnd.range()] = 1
-            except IndexError:
-                pass
-        calLogEnd = calLog.positive()
-        if calLogEnd.value() > 0:
-            try:
-                self.TreeMaker.getVariable('CalLogEndRangeHit')\
-                 [tower][layer][calLog.column()][1][calLogEnd.range()] = 1   
-            except IndexError:
-                pass
@@ -1,14 +1,35 @@
 ## @package pCodeGenerator
 ## @brief Module containing useful functions for dinamically writing python
 #  code (used in iterator writers and contribution writers).
+#
+#  The generated modules are cached in $FASTMON_DIR under a file name
+#  containing a hash of everything they depend on (see
+#  pCodeGenerator.getCachedFileName()), so that they are only written when
+#  something changes. They are written atomically and loaded under their
+#  nominal module name, so that several jobs can share the same install.
+#  Whenever a new version of a module is written, the cached versions
+#  which have not been modified for CACHE_PRUNE_AGE seconds are removed.
 
 import os
+import re
 import time
 import sys
+import imp
+import hashlib
 
 from pGlobals     import *
 from pAsciiWriter import pAsciiWriter
 
+## @brief Regular expression matching the name of a cache file (i.e. the
+#  module name followed by the configuration hash).
+
+CACHE_FILE_PATTERN = re.compile('^(\w+)_[0-9a-f]{16}\.py$')
+
+## @brief The minimum age (in seconds) of the stale cache files to be
+#  removed (so that the files just written by concurrent jobs are kept).
+
+CACHE_PRUNE_AGE    = 3600.
+
 
 ## @brief Implementation of the code generator.
 
@@ -21,24 +42,132 @@ class pCodeGenerator(pAsciiWriter):
     def __init__(self, outputFilePath = None):
         pAsciiWriter.__init__(self, outputFilePath)
 
-    ## @brief Open the output file.
+    ## @brief Return the full path to a file in $FASTMON_DIR.
     ## @param self
     #  The class instance.
-    ## @param filePath
-    #  The path to the file to be created.
+    ## @param outputFileName
+    #  The file name.
 
-    def openFile(self, outputFileName):
+    def getOutputFilePath(self, outputFileName):
         if FASTMON_DIR_VAR_NAME in os.environ:
-            outputFilePath = os.path.join(os.environ[FASTMON_DIR_VAR_NAME],\
-                                          outputFileName)
+            return os.path.join(os.environ[FASTMON_DIR_VAR_NAME],\
+                                outputFileName)
         else:
             sys.exit('Environmental variable %s not found. Exiting...' %\
                      FASTMON_DIR_VAR_NAME)
-        pAsciiWriter.openFile(self, outputFilePath, 'w')
+
+    ## @brief Open the output file.
+    #
+    #  The file is actually written under a temporary name and renamed
+    #  when the closeFile() method is called.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the file to be created.
+
+    def openFile(self, outputFileName):
+
+        ## @var TargetFilePath
+        ## @brief The path to the output file.
+
+        ## @var TmpFilePath
+        ## @brief The path to the temporary file being written.
+
+        self.TargetFilePath = self.getOutputFilePath(outputFileName)
+        self.TmpFilePath    = '%s.%d.tmp' % (self.TargetFilePath, os.getpid())
+        pAsciiWriter.openFile(self, self.TmpFilePath, 'w')
         self.writeComment('Written by pCodeGenerator on %s' % time.asctime())
         self.writeComment('Any change to this file will be lost.')
         self.newLine()
 
+    ## @brief Close the output file and move it to its final location.
+    ## @param self
+    #  The class instance.
+
+    def closeFile(self):
+        pAsciiWriter.closeFile(self)
+        os.rename(self.TmpFilePath, self.TargetFilePath)
+        self.pruneCachedFiles(self.TargetFilePath)
+
+    ## @brief Remove the stale versions of a cache file (i.e. the ones of
+    #  the same module with a different hash, not modified for
+    #  CACHE_PRUNE_AGE seconds), along with the corresponding byte code.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the cache file just written.
+
+    def pruneCachedFiles(self, filePath):
+        (dirPath, fileName) = os.path.split(filePath)
+        match = CACHE_FILE_PATTERN.match(fileName)
+        if match is None:
+            return
+        moduleName = match.group(1)
+        now = time.time()
+        for otherFileName in os.listdir(dirPath or '.'):
+            otherMatch = CACHE_FILE_PATTERN.match(otherFileName)
+            if otherFileName == fileName or otherMatch is None or\
+                   otherMatch.group(1) != moduleName:
+                continue
+            otherFilePath = os.path.join(dirPath, otherFileName)
+            try:
+                if now - os.path.getmtime(otherFilePath) < CACHE_PRUNE_AGE:
+                    continue
+                for path in [otherFilePath, '%sc' % otherFilePath]:
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError:
+                pass
+
+    ## @brief Return the name of the cache file for a generated module.
+    #
+    #  The name contains a hash of the key items (e.g. the list of the
+    #  enabled variables) and of the source code of the modules on which
+    #  the generated code depends (e.g. the base class and the writer).
+    ## @param self
+    #  The class instance.
+    ## @param moduleName
+    #  The nominal name of the generated module.
+    ## @param keyItems
+    #  The list of key items.
+    ## @param sourceModules
+    #  The list of the names of the modules the generated code depends on.
+
+    def getCachedFileName(self, moduleName, keyItems, sourceModules):
+        digest = hashlib.md5()
+        for item in keyItems:
+            digest.update('%s\n' % item)
+        for module in sourceModules:
+            filePath = sys.modules[module].__file__
+            sourceFilePath = '%s.py' % os.path.splitext(filePath)[0]
+            if os.path.exists(sourceFilePath):
+                filePath = sourceFilePath
+            digest.update(file(filePath, 'rb').read())
+        return '%s_%s.py' % (moduleName, digest.hexdigest()[:16])
+
+    ## @brief Return True if a file exists in $FASTMON_DIR.
+    ## @param self
+    #  The class instance.
+    ## @param outputFileName
+    #  The file name.
+
+    def isCached(self, outputFileName):
+        return os.path.exists(self.getOutputFilePath(outputFileName))
+
+    ## @brief Load a generated module from $FASTMON_DIR, registering it
+    #  under its nominal name (so that any subsequent import statement
+    #  will retrieve it).
+    ## @param self
+    #  The class instance.
+    ## @param moduleName
+    #  The nominal module name.
+    ## @param outputFileName
+    #  The name of the file the module is defined in.
+
+    def loadModule(self, moduleName, outputFileName):
+        return imp.load_source(moduleName,\
+                               self.getOutputFilePath(outputFileName))
+
     ## @brief Write a comment in the output file.
     ## @param self
     #  The class instance.
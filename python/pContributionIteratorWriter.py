@@ -23,6 +23,18 @@ CONSTRUCTOR_PARAMETERS = '(self, event, contribution, treeMaker, errorCounter)'
 #  (in the TKR case it will be called pTKRcontributionIterator.py) defining
 #  a subclass (e.g. pTKRcontributionIterator) in which *only* the functions
 #  corresponding to the variables in the xml input list are called.
+#
+#  The per-hit functions (e.g. strip() and TOT() for the TKR) are fused:
+#  the statements filling the enabled variables are inlined from the
+#  FusedFunctions dictionary of the base class into a single block, so
+#  that the cost per hit does not include one method call and one variable
+#  lookup per enabled variable. The target numpy arrays (bound in the
+#  constructor) are copied into locals at the beginning of the method and
+#  the block is wrapped in the single range check defined in the
+#  FusedGuards dictionary of the base class. Variables with no inline
+#  implementation are filled through the corresponding base class method,
+#  as before. The base class implementation of the per-hit functions is
+#  not called if listed in the NoOpFunctions list of the base class.
 
 class pContributionIteratorWriter(pCodeGenerator):
 
@@ -47,7 +59,9 @@ class pContributionIteratorWriter(pCodeGenerator):
         #  pTKRcontributionIteratorBase for the TKR etc).
 
         ## @var FileName
-        ## @brief The name of the file in which the iterator is defined.
+        ## @brief The name of the file in which the iterator is defined
+        #  (the class name followed by the hash of the configuration, see
+        #  pCodeGenerator.getCachedFileName()).
 
         ## @var Variables
         ## @brief The variables which need to be filled by the iterator, as
@@ -58,19 +72,41 @@ class pContributionIteratorWriter(pCodeGenerator):
         ## @brief Dictionary of parameters for the specific subsystem
         #  iterator functions (i.e. strip() and TOT() for the TKR, log() for
         #  the CAL etc).
+
+        ## @var BaseClass
+        ## @brief The base class object.
+
+        ## @var FusedFunctions
+        ## @brief The inline implementations of the per-hit functions,
+        #  defined by the base class.
+
+        ## @var FusedGuards
+        ## @brief The local bindings and range checks of the fused blocks,
+        #  defined by the base class.
+
+        ## @var NoOpFunctions
+        ## @brief The subsystem-specific functions whose base class
+        #  implementation does nothing, as declared by the base class.
         
         pCodeGenerator.__init__(self)
         self.ClassName     = className
         self.BaseClassName = '%sBase' % self.ClassName 
-        self.FileName      = '%s.py'  % self.ClassName
-        self.openFile(self.FileName)
         self.Variables     = xmlParser.getEnabledVariablesByGroup(groupName)
         exec('from %s import %s'            % (self.BaseClassName,\
                                                self.BaseClassName))
         exec('self.BaseFunctions = dir(%s)' % (self.BaseClassName))
+        exec('self.BaseClass     = %s'      % (self.BaseClassName))
+        self.FusedFunctions = getattr(self.BaseClass, 'FusedFunctions', {})
+        self.FusedGuards    = getattr(self.BaseClass, 'FusedGuards', {})
+        self.NoOpFunctions  = getattr(self.BaseClass, 'NoOpFunctions', [])
         self.Parameters    = {}
+        keyItems = [variable.getName() for variable in self.Variables]
+        self.FileName      = self.getCachedFileName(self.ClassName, keyItems,\
+                             [self.BaseClassName, self.__module__,\
+                              pCodeGenerator.__module__])
 
-    ## @brief Write the iterator class to file.
+    ## @brief Write the iterator class to file (unless an up-to-date copy is
+    #  already cached) and load the corresponding module.
     #
     #  Implements both the fillEventContribution() method and the
     #  subsystem-specific functions.
@@ -78,18 +114,25 @@ class pContributionIteratorWriter(pCodeGenerator):
     #  The class instance.
 
     def writeIterator(self):
-        logger.info('Writing %s...' % self.FileName)
-        startTime = time.time()
-        self.writeImportStatement(self.BaseClassName, '*')
-        self.writeClassDefinition(self.ClassName, self.BaseClassName)
-        self.writeConstructorDefinition(CONSTRUCTOR_PARAMETERS)
-        self.writeLine('%s.__init__%s' % (self.BaseClassName,\
-                                          CONSTRUCTOR_PARAMETERS))
-        self.backup()
-        self.implementIterator()
-        self.implementFunctions()
-        self.backup()
-        logger.info('Done in %.4f s.\n' % (time.time() - startTime))
+        if self.isCached(self.FileName):
+            logger.info('Using cached %s.' % self.FileName)
+        else:
+            logger.info('Writing %s...' % self.FileName)
+            startTime = time.time()
+            self.openFile(self.FileName)
+            self.writeImportStatement(self.BaseClassName, '*')
+            self.writeClassDefinition(self.ClassName, self.BaseClassName)
+            self.writeConstructorDefinition(CONSTRUCTOR_PARAMETERS)
+            self.writeLine('%s.__init__%s' % (self.BaseClassName,\
+                                              CONSTRUCTOR_PARAMETERS))
+            self.bindArrays()
+            self.backup()
+            self.implementIterator()
+            self.implementFunctions()
+            self.backup()
+            self.closeFile()
+            logger.info('Done in %.4f s.\n' % (time.time() - startTime))
+        self.loadModule(self.ClassName, self.FileName)
 
     ## @brief Write to file the implementation of the fillEventContribution()
     #  method of the iterator (which is the main function, called whenever
@@ -109,6 +152,50 @@ class pContributionIteratorWriter(pCodeGenerator):
         if not somethingDone:
             self.writeLine('pass')
 
+    ## @brief Return the names of the base class methods filling the
+    #  enabled variables in a subsystem-specific function (e.g. strip() for
+    #  the TKR), as a list of (variable name, method name) tuples.
+    ## @param self
+    #  The class instance.
+    ## @param functionName
+    #  The name of the function.
+
+    def getHitFunctions(self, functionName):
+        hitFunctions = []
+        for variable in self.Variables:
+            function = '%s__%s__' % (variable.getName(), functionName)
+            if function in self.BaseFunctions or\
+                   function in self.FusedFunctions:
+                hitFunctions.append((variable.getName(), function))
+        return hitFunctions
+
+    ## @brief Write to file the constructor lines binding the numpy arrays
+    #  of the variables filled by the fused per-hit functions.
+    ## @param self
+    #  The class instance.
+
+    def bindArrays(self):
+        variableNames = []
+        for functionName in self.Parameters.keys():
+            for (variableName, function) in\
+                    self.getHitFunctions(functionName):
+                if function in self.FusedFunctions and\
+                       variableName not in variableNames:
+                    variableNames.append(variableName)
+        for variableName in variableNames:
+            self.writeLine("self.%sArray = treeMaker.getVariable('%s')" %\
+                           (variableName, variableName))
+
+    ## @brief Return True if the base class implementation of a function
+    #  is declared to do nothing (in which case it is not called).
+    ## @param self
+    #  The class instance.
+    ## @param functionName
+    #  The name of the function.
+
+    def isNoOp(self, functionName):
+        return functionName in self.NoOpFunctions
+
     ## @brief Implement a subsystem-specific function (e.g. strip() for
     #  the TKR), based on the function name.
     ## @param self
@@ -120,16 +207,60 @@ class pContributionIteratorWriter(pCodeGenerator):
         parameters = self.Parameters[functionName]
         self.backup()
         self.writeMethodDefinition(functionName, parameters)
-        self.writeLine('%s.%s%s' % (self.BaseClassName, functionName,\
-                                    parameters))
-        if len(self.Variables):
-            for variable in self.Variables:
-                for function in self.BaseFunctions:
-                    if ('%s__%s__' % (variable.getName(), functionName)) ==\
-                           function:
-                        self.writeLine('self.%s%s' %\
-                                       (function,\
-                                        parameters.replace('self, ', '')))
+        somethingDone = False
+        if not self.isNoOp(functionName):
+            self.writeLine('%s.%s%s' % (self.BaseClassName, functionName,\
+                                        parameters))
+            somethingDone = True
+        fusedFunctions = []
+        for (variableName, function) in self.getHitFunctions(functionName):
+            if function in self.FusedFunctions:
+                fusedFunctions.append((variableName,\
+                                       self.FusedFunctions[function]))
+            else:
+                self.writeLine('self.%s%s' %\
+                               (function, parameters.replace('self, ', '')))
+            somethingDone = True
+        if fusedFunctions:
+            self.implementFusedBlock(functionName, fusedFunctions)
+        if not somethingDone:
+            self.writeLine('pass')
+
+    ## @brief Write to file the fused block of a subsystem-specific
+    #  function.
+    #
+    #  The locals of the FusedGuards entry and the numpy arrays are bound
+    #  once, then the statements of all the fused functions (each with its
+    #  own guard, if any) are written inside the range check of the
+    #  FusedGuards entry.
+    ## @param self
+    #  The class instance.
+    ## @param functionName
+    #  The name of the function.
+    ## @param fusedFunctions
+    #  The list of (variable name, (guard, lines)) tuples to be written (see
+    #  pTKRcontributionIteratorBase.FusedFunctions).
+
+    def implementFusedBlock(self, functionName, fusedFunctions):
+        (bindings, condition) = self.FusedGuards.get(functionName, ([], None))
+        for line in bindings:
+            self.writeLine(line)
+        for (variableName, fusedFunction) in fusedFunctions:
+            self.writeLine('%sArray = self.%sArray' %\
+                           (variableName, variableName))
+        if condition is not None:
+            self.writeLine('if %s:' % condition)
+            self.indent()
+        for (variableName, (guard, lines)) in fusedFunctions:
+            if guard is not None:
+                self.writeLine('if %s:' % guard)
+                self.indent()
+            for line in lines:
+                self.writeLine(line)
+            if guard is not None:
+                self.backup()
+        if condition is not None:
+            self.backup()
 
     ## @brief Implement all the subsystem-specific functions of the iterator,
     #  based on the key of the @ref Parameters variable.
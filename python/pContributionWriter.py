@@ -40,31 +40,39 @@ class pContributionWriter(pCodeGenerator):
         ## @var FileName
         ## @brief The file name in which the class declaration is written.
         #
-        #  It is the class name with a ".py" postpended.
+        #  It is the class name followed by the hash of the configuration
+        #  (see pCodeGenerator.getCachedFileName()) and set by the
+        #  sub-classes.
         
         pCodeGenerator.__init__(self)
         self.ClassName     = className
         self.BaseClassName = '%sBase' % self.ClassName 
-        self.FileName      = '%s.py'  % self.ClassName
-        self.openFile(self.FileName)
+        self.FileName      = None
 
-    ## @brief Write the actual component to file.
+    ## @brief Write the actual component to file (unless an up-to-date copy
+    #  is already cached) and load the corresponding module.
     ## @param self
     #  The class instance.    
 
     def writeComponent(self):
-        logger.info('Writing %s...' % self.FileName)
-        startTime = time.time()
-        self.writeImportStatement(self.BaseClassName, '*')
-        self.writeClassDefinition(self.ClassName, self.BaseClassName)
-        self.writeConstructorDefinition(self.__CONSTRUCTOR_PARAMETERS)
-        self.writeLine('%s.__init__%s' % (self.BaseClassName,\
-                                          self.__CONSTRUCTOR_PARAMETERS))
-        self.backup()
-        self.writeMethodDefinition('fillEventContribution')
-        self.implementComponent()
-        self.backup()
-        logger.info('Done in %.4f s.\n' % (time.time() - startTime))
+        if self.isCached(self.FileName):
+            logger.info('Using cached %s.' % self.FileName)
+        else:
+            logger.info('Writing %s...' % self.FileName)
+            startTime = time.time()
+            self.openFile(self.FileName)
+            self.writeImportStatement(self.BaseClassName, '*')
+            self.writeClassDefinition(self.ClassName, self.BaseClassName)
+            self.writeConstructorDefinition(self.__CONSTRUCTOR_PARAMETERS)
+            self.writeLine('%s.__init__%s' % (self.BaseClassName,\
+                                              self.__CONSTRUCTOR_PARAMETERS))
+            self.backup()
+            self.writeMethodDefinition('fillEventContribution')
+            self.implementComponent()
+            self.backup()
+            self.closeFile()
+            logger.info('Done in %.4f s.\n' % (time.time() - startTime))
+        self.loadModule(self.ClassName, self.FileName)
 
     ## @brief Implement the component according to the xml configuration
     #  file.
@@ -104,6 +112,10 @@ class pGEMcontributionWriter(pContributionWriter):
         baseClassName    = '%sBase'         % (self.__CLASS_NAME)
         exec('from %s import %s'            % (baseClassName, baseClassName))
         exec('self.BaseFunctions = dir(%s)' % (baseClassName))
+        keyItems = [variable.Name for variable in self.__Variables]
+        self.FileName    = self.getCachedFileName(self.__CLASS_NAME, keyItems,\
+                           [baseClassName, self.__module__,\
+                            pCodeGenerator.__module__])
 
     ## @brief Implement the component according to the xml configuration
     #  file.
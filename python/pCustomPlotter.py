@@ -8,32 +8,42 @@ logger = pSafeLogger.getLogger('pCustomPlotter')
 import time
 import numpy
 import pUtils
-import os
 
 from pGlobals  import *
 from pSafeROOT import ROOT
-import random
+from pTreeColumnReader import pTreeColumnReader
 from math import sqrt
+from itertools import izip
 
 class pCustomPlotter:
 
     def __init__(self, rootFilePath, rootTree):
+
+        ## @var Reader
+        ## @brief The pTreeColumnReader object for the tree.
+
+        ## @var Cut
+        ## @brief The cut of the plot being created.
+
+        ## @var Selection
+        ## @brief The boolean numpy array flagging the entries passing the
+        #  current cut (None if there's no cut).
+
+        ## @var SelectionsPool
+        ## @brief The selections already evaluated, indexed by cut.
+
         self.ObjectsPool = {}
         self.RootFilePath = rootFilePath
-        self.RootTree = rootTree.CloneTree()
-        self.TmpRootTree = None
+        self.RootTree = rootTree
+        self.Reader = pTreeColumnReader(rootTree)
+        self.Cut = ''
+        self.Selection = None
+        self.SelectionsPool = {}
         self.StartTime = None
-        self.TmpFilePath = os.path.join(os.path.dirname(rootFilePath),\
-                                        'tmp_%s.root' %\
-                                        (random.randint(0,100000)))
-        if os.path.exists(self.TmpFilePath):
-            self.TmpFilePath = self.TmpFilePath.replace('.root', '_1.root')
-        logger.debug('Using temp file %s.' % (self.TmpFilePath))
 
     def cleanup(self):
-        logger.info('Removing temp root file...')
-        os.system('rm -f %s' % self.TmpFilePath)
-        logger.info('Done.')
+        self.ObjectsPool = {}
+        self.SelectionsPool = {}
 
     def __startTimer(self):
         self.StartTime = time.time()
@@ -42,54 +52,111 @@ class pCustomPlotter:
         logger.debug('%s done in %.2f s.' %\
                      (plotRep.getName(), time.time() - self.StartTime))
 
-    def __openTmpRootFile(self):
-        self.TmpRootFile = ROOT.TFile(self.TmpFilePath, 'RECREATE')
-        
-    def __closeTmpRootFile(self):
-        self.TmpRootFile.Close()
-        ROOT.gROOT.cd('%s:/' % self.RootFilePath)
-
-    def __createTmpRootTree(self, varList, cut):
-        self.__openTmpRootFile()
-        self.RootTree.SetBranchStatus('*', 0)
-        for varName in varList + pUtils.getCutVariables(cut):
+    ## @brief Select the entries passing a given cut for the plot being
+    #  created.
+    #
+    #  The selection is evaluated once for each distinct cut and cached, so
+    #  that no copy of the tree is needed.
+    ## @param self
+    #  The class instance.
+    ## @param varList
+    #  The list of the variables used by the plot.
+    ## @param cut
+    #  The cut.
+
+    def __selectEntries(self, varList, cut):
+        cutVariables = pUtils.getCutVariables(cut)
+        for varName in varList + cutVariables:
             if self.RootTree.GetLeaf(varName) is None:
                 logger.error('Could not find %s.' % varName)
-            self.RootTree.SetBranchStatus(varName, 1)
-        # Always copy the tree... safer for some not understood reason 
-	self.TmpRootTree = self.RootTree.CopyTree(cut)
-
-    def __createNumpyArray(self, varName, shape, type):
-        numpyArray = numpy.zeros(shape, type)
-        self.TmpRootTree.SetBranchAddress(varName, numpyArray)
-        return numpyArray
-
-    def __deleteTmpRootTree(self):
-        self.__closeTmpRootFile()
-	self.TmpRootTree = None
-        self.RootTree.SetBranchStatus('*', 1)
-        
+        self.Cut = cut.strip()
+        if not self.Cut:
+            self.Selection = None
+        elif self.Cut in self.SelectionsPool:
+            self.Selection = self.SelectionsPool[self.Cut]
+        else:
+            size = 1
+            for varName in cutVariables:
+                shape = self.Reader.getLeafShape(varName)
+                if shape is not None:
+                    size = max(size, int(numpy.prod(shape)))
+            self.Selection = self.Reader.getSelection(self.Cut, size)
+            self.SelectionsPool[self.Cut] = self.Selection
+
+    ## @brief Iterate over the values of a variable for the selected
+    #  entries, in chunks of consecutive entries (see
+    #  pTreeColumnReader.iterateColumn()).
+    ## @param self
+    #  The class instance.
+    ## @param varName
+    #  The variable name.
+    ## @param shape
+    #  The shape of the variable (as a tuple).
+    ## @param type
+    #  The numpy type of the returned arrays.
+
+    def __iterateColumn(self, varName, shape, type):
+        return self.Reader.iterateColumn(varName, shape, type, self.Selection)
+
+    ## @brief Return the sum over all the entries of a tree variable.
+    ## @param self
+    #  The class instance.
+    ## @param varName
+    #  The variable name.
+    ## @param shape
+    #  The shape of the variable (as a tuple).
+
+    def __sumColumn(self, varName, shape):
+        integral = numpy.zeros(shape, 'int64')
+        for values in self.__iterateColumn(varName, shape, 'int64'):
+            integral += values.sum(axis = 0)
+        return integral
+
+    ## @brief Set the bin contents of a 1-d or 2-d histogram from a numpy
+    #  array (element [i][j] going into the bin (i + 1, j + 1)) and set the
+    #  number of entries.
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The histogram.
+    ## @param contents
+    #  The numpy array of the bin contents.
+    ## @param numEntries
+    #  The number of entries.
+
+    def __setBinContents(self, histogram, contents, numEntries):
+        if contents.ndim == 1:
+            for i in xrange(contents.shape[0]):
+                histogram.SetBinContent(i + 1, float(contents[i]))
+        else:
+            for i in xrange(contents.shape[0]):
+                for j in xrange(contents.shape[1]):
+                    histogram.SetBinContent(i + 1, j + 1,\
+                                            float(contents[i][j]))
+        histogram.SetEntries(float(numEntries))
+
+    def __clearSelection(self):
+        self.Cut = ''
+        self.Selection = None
+
     def ToT_0_WhenTkrHitsExist_TowerPlane(self, plotRep):
-        # Note: Histogram Entries seems correct
         self.__startTimer()
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title,16, -0.5, 15.5,\
                               36, -0.5, 35.5)
-        self.__createTmpRootTree(['TkrHitsTowerPlane', 'ToT_con0_TowerPlane',\
+        self.__selectEntries(['TkrHitsTowerPlane', 'ToT_con0_TowerPlane',\
                                   'ToT_con1_TowerPlane'], plotRep.Cut)
-        nHits = self.__createNumpyArray('TkrHitsTowerPlane', (16, 36), 'int32')
-        tot0 = self.__createNumpyArray('ToT_con0_TowerPlane', (16, 36), 'int32')
-        tot1 = self.__createNumpyArray('ToT_con1_TowerPlane', (16, 36), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in range(16):
-                # This is for optimizing speed---we gain a factor of 2.
-                if nHits[tower].sum():
-                    for layer in range(36):
-                        if nHits[tower][layer] > 0 and tot0[tower][layer] == 0\
-                               and tot1[tower][layer] == 0:
-                            histogram.Fill(tower, layer)
+        counts = numpy.zeros((16, 36), 'int64')
+        columns = izip(self.__iterateColumn('TkrHitsTowerPlane', (16, 36),\
+                                           'int32'),
+                      self.__iterateColumn('ToT_con0_TowerPlane', (16, 36),\
+                                           'int32'),
+                      self.__iterateColumn('ToT_con1_TowerPlane', (16, 36),\
+                                           'int32'))
+        for (nHits, tot0, tot1) in columns:
+            counts += ((nHits > 0) & (tot0 == 0) & (tot1 == 0)).sum(axis = 0)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
 
     ## @brief Create an acd tile map.
@@ -101,20 +168,17 @@ class pCustomPlotter:
     #  The custom plot representation from the pXmlParser object.
 
     def AcdGemVeto_AcdTile(self, plotRep):
-        # Note: Histogram Entries seems correct
         self.__startTimer()
         histogram = ROOT.TH1F(plotRep.Name, plotRep.Title, NUM_ACD_VETOES,\
                               -0.5, NUM_ACD_VETOES -0.5)
-        self.__createTmpRootTree(['AcdGemVeto_AcdTile'], plotRep.Cut)
-        acdVeto = self.__createNumpyArray('AcdGemVeto_AcdTile',\
-                                          (NUM_ACD_VETOES), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tile in xrange(NUM_ACD_VETOES):
-                if acdVeto[tile]:
-                    histogram.Fill(tile)
+        self.__selectEntries(['AcdGemVeto_AcdTile'], plotRep.Cut)
+        counts = numpy.zeros((NUM_ACD_VETOES), 'int64')
+        for acdVeto in self.__iterateColumn('AcdGemVeto_AcdTile',\
+                                            (NUM_ACD_VETOES,), 'int32'):
+            counts += (acdVeto != 0).sum(axis = 0)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
     
     ## @brief Method mapping the content of a gem 16 bit register to the
@@ -125,20 +189,31 @@ class pCustomPlotter:
     #  The custom plot representation from the pXmlParser object.
 
     def gem_vector_map(self, plotRep):
-        # Note: Histogram Entries seems correct
         self.__startTimer()
         histogram = ROOT.TH1F(plotRep.Name, plotRep.Title, 16, -0.5, 16-0.5)
-        self.__createTmpRootTree([plotRep.Expression], plotRep.Cut)
-        towerVec = self.__createNumpyArray(plotRep.Expression, (1), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in xrange(16):
-                if towerVec & (0x1 << tower):
-                    histogram.Fill(tower)
+        self.__selectEntries([plotRep.Expression], plotRep.Cut)
+        counts = self.__countBits(plotRep.Expression, 16)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
 
+    ## @brief Return a numpy array with the number of entries for which each
+    #  of the lowest numBits bits of a (scalar) tree variable is set.
+    ## @param self
+    #  The class instance.
+    ## @param varName
+    #  The variable name.
+    ## @param numBits
+    #  The number of bits.
+
+    def __countBits(self, varName, numBits):
+        counts = numpy.zeros((numBits), 'int64')
+        bits = numpy.arange(numBits)
+        for values in self.__iterateColumn(varName, (1,), 'int64'):
+            counts += ((values >> bits) & 0x1).sum(axis = 0)
+        return counts
+
     ## @brief Return a ROOT TH1F object: the distribution of the number of
     #  planes hit in a tower.
     #
@@ -151,33 +226,34 @@ class pCustomPlotter:
     #  The Tracker tower under analysis
 
     def TkrPlanesHit(self, plotRep):
-        # Note: Histogram Entries seems correct
         self.__startTimer()
         histograms = []
         for tower in range(16):
             histograms.append(ROOT.TH1F(plotRep.getExpandedName(tower),\
                                         plotRep.getExpandedTitle(tower),
                                         38, -0.5, 38 - 0.5))
-        self.__createTmpRootTree(['TkrHitsTowerPlane'], plotRep.Cut)
-        tkrHits = self.__createNumpyArray('TkrHitsTowerPlane', (16, 36), 'int32')
-        noHits = numpy.zeros((36), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
+        self.__selectEntries(['TkrHitsTowerPlane'], plotRep.Cut)
+        counts = numpy.zeros((16, 38), 'int64')
+        for tkrHits in self.__iterateColumn('TkrHitsTowerPlane', (16, 36),\
+                                            'int32'):
+            planesHit = (tkrHits != 0).sum(axis = 2)
             for tower in range(16):
-                histograms[tower].Fill((tkrHits[tower] != noHits).sum())
+                distribution = numpy.bincount(planesHit[:, tower])
+                counts[tower][:len(distribution)] += distribution
+        for tower in range(16):
+            self.__setBinContents(histograms[tower], counts[tower],\
+                                  counts[tower].sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return histograms
 
-    def __getTkrIntegralHits(self, tkrHits):
-        if 'tkrIntegralHits' in self.ObjectsPool.keys():
-            return self.ObjectsPool['tkrIntegralHits']
-        tkrIntegralHits = numpy.zeros((16, 36, 24), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            tkrIntegralHits += tkrHits
-        self.ObjectsPool['tkrIntegralHits'] = tkrIntegralHits
-        return self.ObjectsPool['tkrIntegralHits']
+    def __getTkrIntegralHits(self):
+        key = ('tkrIntegralHits', self.Cut)
+        if key in self.ObjectsPool.keys():
+            return self.ObjectsPool[key]
+        tkrIntegralHits = self.__sumColumn('TkrHitsGTFE', (16, 36, 24))
+        self.ObjectsPool[key] = tkrIntegralHits
+        return self.ObjectsPool[key]
 
     def TkrHitsCounter_PlaneGTFE(self, plotRep):
         self.__startTimer()
@@ -186,19 +262,14 @@ class pCustomPlotter:
             histograms.append(ROOT.TH2F(plotRep.getExpandedName(tower),\
                                         plotRep.getExpandedTitle(tower),
                                         24, -0.5, 23.5, 36, -0.5, 35.5))
-        self.__createTmpRootTree(['TkrHitsGTFE'], plotRep.Cut)
-        tkrHits = self.__createNumpyArray('TkrHitsGTFE', (16, 36, 24), 'int32')
-        tkrIntegralHits = self.__getTkrIntegralHits(tkrHits)
+        self.__selectEntries(['TkrHitsGTFE'], plotRep.Cut)
+        tkrIntegralHits = self.__getTkrIntegralHits()
         for tower in range(16):
-            for layer in range(36):
-                for gtfe in range(24):
-                    histograms[tower].Fill(gtfe, layer,\
-                                           tkrIntegralHits[tower][layer][gtfe])
+            self.__setBinContents(histograms[tower],\
+                                  tkrIntegralHits[tower].transpose(),\
+                                  tkrIntegralHits[tower].sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
-        # Note: Histogram Entries need to be set by hand
-        for tower in range(16):
-            histograms[tower].SetEntries(tkrIntegralHits[tower].sum())
+        self.__clearSelection()
         return histograms
 
     def TkrHitsCounter_Plane(self, plotRep):
@@ -208,18 +279,14 @@ class pCustomPlotter:
             histograms.append(ROOT.TH1F(plotRep.getExpandedName(tower),\
                                         plotRep.getExpandedTitle(tower),
                                         36, -0.5, 35.5))
-        self.__createTmpRootTree(['TkrHitsGTFE'], plotRep.Cut)
-        tkrHits = self.__createNumpyArray('TkrHitsGTFE', (16, 36, 24), 'int32')
-        tkrIntegralHits = self.__getTkrIntegralHits(tkrHits)
+        self.__selectEntries(['TkrHitsGTFE'], plotRep.Cut)
+        tkrIntegralHits = self.__getTkrIntegralHits()
         for tower in range(16):
-            for layer in range(36):   
-                histograms[tower].Fill(layer,\
-                                       tkrIntegralHits[tower][layer].sum())
+            self.__setBinContents(histograms[tower],\
+                                  tkrIntegralHits[tower].sum(axis = 1),\
+                                  tkrIntegralHits[tower].sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
-        # Note: Histogram Entries need to be set by hand
-        for tower in range(16):
-            histograms[tower].SetEntries(tkrIntegralHits[tower].sum())
+        self.__clearSelection()
         return histograms
                                        
     ## @brief 
@@ -229,19 +296,14 @@ class pCustomPlotter:
     #  The custom plot representation from the pXmlParser object.
 
     def gem_acd_cable_map(self, plotRep):
-        # Note: Histogram Entries seems correct
         self.__startTimer()
         histogram = ROOT.TH1F(plotRep.Name, plotRep.Title, NUM_ACD_CABLES,\
                               -0.5 , NUM_ACD_CABLES -0.5)
-        self.__createTmpRootTree([plotRep.Expression], plotRep.Cut)
-        varArray = self.__createNumpyArray(plotRep.Expression, (1), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for board in xrange(NUM_ACD_CABLES):
-                if varArray & (0x1 << board):
-                    histogram.Fill(board)
+        self.__selectEntries([plotRep.Expression], plotRep.Cut)
+        counts = self.__countBits(plotRep.Expression, NUM_ACD_CABLES)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
 
     def CalLogEndRangeHitCounter(self, plotRep):
@@ -249,28 +311,18 @@ class pCustomPlotter:
         histograms = []
         for tower in range(16):
             histograms.append(ROOT.TH2F(plotRep.getExpandedName(tower), plotRep.getExpandedTitle(tower),\
-	                                24, -0.5, 11.5, 8, -0.5, 7.5))
-        self.__createTmpRootTree(['CalLogEndRangeHit'], plotRep.Cut)
-        calHits = self.__createNumpyArray('CalLogEndRangeHit',\
-                                          (16, 8, 12, 2, 4), 'bool_')
-        calIntegralHits = numpy.zeros((16, 8, 12, 2, 4), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            calIntegralHits += calHits
-	calRange = int(plotRep.Expression[-1])
+                                        24, -0.5, 11.5, 8, -0.5, 7.5))
+        self.__selectEntries(['CalLogEndRangeHit'], plotRep.Cut)
+        calIntegralHits = self.__sumColumn('CalLogEndRangeHit',\
+                                           (16, 8, 12, 2, 4))
+        calRange = int(plotRep.Expression[-1])
         for tower in range(16):
-	    numEntries = 0
-            for layer in range(8):
-                for column in range(12):
-                    for side in range(2):
-                        x = column + side/2. - 0.5
-                        y = layer
-			n = calIntegralHits[tower][layer][column][side][calRange]
-                        histograms[tower].Fill(x, y, n)
-			numEntries += n
-            histograms[tower].SetEntries(numEntries)
+            # The x bins are (column, side) pairs: bin 2*column + side + 1.
+            counts = calIntegralHits[tower, :, :, :, calRange]
+            counts = counts.reshape((8, 24)).transpose()
+            self.__setBinContents(histograms[tower], counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return histograms
 
     ## @brief Return a summed hit map of the calorimeter.
@@ -292,19 +344,20 @@ class pCustomPlotter:
         xbins     = NUM_TOWERS
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title, xbins, xmin, xmax,
                           ybins, ymin, ymax)
-        self.__createTmpRootTree(['CalXHit_TowerCalLayerCalColumn'],\
+        self.__selectEntries(['CalXHit_TowerCalLayerCalColumn'],\
                                  plotRep.Cut)
-        calHits = self.__createNumpyArray('CalXHit_TowerCalLayerCalColumn',\
-                                          (16, 8, 12), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in range(NUM_TOWERS):
-                # This is for optimizing speed---we gain a factor of 5.
-                if calHits[tower].sum():
-                    for layer in range(NUM_CAL_LAYERS_PER_TOWER):
-                        histogram.Fill(tower,layer,calHits[tower][layer].sum())
+        counts = numpy.zeros((NUM_TOWERS, NUM_CAL_LAYERS_PER_TOWER), 'int64')
+        numEntries = 0
+        for calHits in self.__iterateColumn('CalXHit_TowerCalLayerCalColumn',\
+                                            (16, 8, 12), 'int32'):
+            layerHits = calHits.sum(axis = 3)
+            counts += layerHits.sum(axis = 0)
+            # Each tower with at least one hit used to fill all the layers.
+            numEntries += (layerHits.sum(axis = 2) > 0).sum()*\
+                          NUM_CAL_LAYERS_PER_TOWER
+        self.__setBinContents(histogram, counts, numEntries)
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
     
     ## @brief Return a map of the number of time there was no hit in a layer.
@@ -326,23 +379,15 @@ class pCustomPlotter:
         xbins     = NUM_TOWERS
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title, xbins, xmin, xmax,
                           ybins, ymin, ymax)
-        self.__createTmpRootTree(['CalXHit_TowerCalLayerCalColumn'],\
+        self.__selectEntries(['CalXHit_TowerCalLayerCalColumn'],\
                                  plotRep.Cut)
-        calHits = self.__createNumpyArray('CalXHit_TowerCalLayerCalColumn',\
-                                          (16, 8, 12), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in range(NUM_TOWERS):
-                # This is for optimizing speed---we gain a factor of 3.
-                if calHits[tower].sum() == 0:
-                    for layer in range(NUM_CAL_LAYERS_PER_TOWER):
-                        histogram.Fill(tower, layer)
-                else:
-                    for layer in range(NUM_CAL_LAYERS_PER_TOWER):
-                        if calHits[tower][layer].sum() == 0:
-                            histogram.Fill(tower, layer)
+        counts = numpy.zeros((NUM_TOWERS, NUM_CAL_LAYERS_PER_TOWER), 'int64')
+        for calHits in self.__iterateColumn('CalXHit_TowerCalLayerCalColumn',\
+                                            (16, 8, 12), 'int32'):
+            counts += (calHits.sum(axis = 3) == 0).sum(axis = 0)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram] 
 
     ## @brief  Return a ROOT TH2F object: Tower number vs Plane
@@ -355,16 +400,14 @@ class pCustomPlotter:
         self.__startTimer()
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title, 16, -0.5, 15.5,
                               36, -0.5, 35.5)
-        self.__createTmpRootTree(['TkrHitsTowerPlane'], plotRep.Cut)
-        tkrHits = self.__createNumpyArray('TkrHitsTowerPlane', (16, 36), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in range(16):
-                for layer in range(36):
-                    if tkrHits[tower][layer] == 0:
-                        histogram.Fill(tower, layer)
+        self.__selectEntries(['TkrHitsTowerPlane'], plotRep.Cut)
+        counts = numpy.zeros((16, 36), 'int64')
+        for tkrHits in self.__iterateColumn('TkrHitsTowerPlane', (16, 36),\
+                                            'int32'):
+            counts += (tkrHits == 0).sum(axis = 0)
+        self.__setBinContents(histogram, counts, counts.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
 
     ## @brief  Return a ROOT TH2F object: Tower number vs Plane
@@ -377,16 +420,17 @@ class pCustomPlotter:
         self.__startTimer()
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title, 16, -0.5, 15.5,
                               36, -0.5, 35.5)
-        self.__createTmpRootTree(['TkrHitsTowerPlane'], plotRep.Cut)
-        tkrHits = self.__createNumpyArray('TkrHitsTowerPlane', (16, 36), 'int32')
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            for tower in range(16):
-                if tkrHits[tower].sum() > 0 :
-                    for layer in range(36):
-                        histogram.Fill(tower, layer, tkrHits[tower][layer])
+        self.__selectEntries(['TkrHitsTowerPlane'], plotRep.Cut)
+        counts = numpy.zeros((16, 36), 'int64')
+        numEntries = 0
+        for tkrHits in self.__iterateColumn('TkrHitsTowerPlane', (16, 36),\
+                                            'int32'):
+            counts += tkrHits.sum(axis = 0)
+            # Each tower with at least one hit used to fill all the layers.
+            numEntries += (tkrHits.sum(axis = 2) > 0).sum()*36
+        self.__setBinContents(histogram, counts, numEntries)
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
+        self.__clearSelection()
         return [histogram]
 
     ## @brief  Return a ROOT TH1F object with rates
@@ -589,22 +633,10 @@ class pCustomPlotter:
     def AcdHitMap_GafeGarc(self, plotRep):
         self.__startTimer()
         histogram = ROOT.TH2F(plotRep.Name, plotRep.Title, 18, -0.5, 17.5, 12, -0.5, 11.5)
-        self.__createTmpRootTree(['AcdHitChannel'], plotRep.Cut)
-	
-        acdHits = self.__createNumpyArray('AcdHitChannel', (12, 18), 'int32')	        
-        AcdHitSum = numpy.zeros((12, 18), 'int32')
-	
-        for i in xrange(self.TmpRootTree.GetEntriesFast()):
-            self.TmpRootTree.GetEntry(i)
-            AcdHitSum += acdHits
-	    
-        for cable in range(12):
-            for channel in range(18):
-                histogram.Fill(channel, cable, AcdHitSum[cable][channel])
-	
+        self.__selectEntries(['AcdHitChannel'], plotRep.Cut)
+        AcdHitSum = self.__sumColumn('AcdHitChannel', (12, 18))
+        self.__setBinContents(histogram, AcdHitSum.transpose(),\
+                              AcdHitSum.sum())
         self.__stopTimer(plotRep)
-        self.__deleteTmpRootTree()
-        # Note: Histogram Entries need to be set by hand
-        histogram.SetEntries(AcdHitSum.sum())
+        self.__clearSelection()
         return [histogram]
-
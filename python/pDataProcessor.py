@@ -14,7 +14,7 @@ import struct
 
 from copy 			      import copy
 from LICOS_Scripts.analysis.LsfMerger import LsfMerger
-from eventFile			      import LSEReader, LSE_Info
+from eventFile			      import LSEReader
 from pFastMonTreeMaker                import pFastMonTreeMaker
 from pLATdatagramIterator             import pLATdatagramIterator
 from pLATcontributionIterator         import pLATcontributionIterator
@@ -27,9 +27,17 @@ from pContributionIteratorWriter      import pAEMcontributionIteratorWriter
 from pContributionWriter              import pGEMcontributionWriter
 from pMetaEventProcessor	      import pMetaEventProcessor
 from pEvtMetaContextProcessor	      import pEvtMetaContextProcessor
+from pEvtMetaContextProcessor	      import getEvtMeta
 from pErrorHandler                    import pErrorHandler
+from pErrorStore                      import getErrorStoreFilePath
 from pFastMonTreeProcessor            import pFastMonTreeProcessor
 from pFastMonReportGenerator          import pFastMonReportGenerator
+from pParallelProcessor               import pParallelProcessor
+from pParallelProcessor               import PARALLEL_FILE_TYPES
+from pEventIndex                      import pEventIndex
+from pEventIndex                      import INDEXED_FILE_TYPES
+from pLDFReader                       import pLDFReader
+from pStreamingHistogrammer           import pStreamingHistogrammer
 from pSafeROOT                        import ROOT
 
 ## @brief The data processor implementation.
@@ -53,11 +61,15 @@ class pDataProcessor:
     #  Flag to overwrite existing files without asking the user.
     ## @param verbose
     #  Print additional informations.
+    ## @param updateIterators
+    #  Flag to (re)write the generated contribution iterators. The workers
+    #  of a parallel run set this to False, since the iterators have
+    #  already been written by the parent process.
 
     def __init__(self, inputFilePath, configFilePath = None,
                  outputFilePath = None, outputProcessedFilePath = None,
                  outputErrorFilePath = None, inputMagic7FilePath = None,
-                 saaDefinitionFile = None):
+                 saaDefinitionFile = None, updateIterators = True):
 
         ## @var XmlParser
         ## @brief The xml parser object (pXmlParser instance).
@@ -104,7 +116,8 @@ class pDataProcessor:
         ## @brief The EvtReader object created by calling LSEReader(filename)
 
         ## @var LdfFile
-        ## @brief The ldf file object (relevant for ldf data only). 
+        ## @brief The memory-mapped pLDFReader object (relevant for ldf data
+        #  only).
 
         ## @var StartTime
         ## @brief The data processor start time.
@@ -115,11 +128,101 @@ class pDataProcessor:
         ## @var PrevTimestamp
         ## @brief The time stamp of the previous event, initialized to 0.
 
+        ## @var FirstEvent
+        ## @brief The index (in the input file) of the first event to be
+        #  processed, initialized to 0.
+        #
+        #  This is set to a non-zero value by the workers of a parallel run
+        #  (see @ref pParallelProcessor), which only process a slice of the
+        #  input file.
+
+        ## @var PrimingEvent
+        ## @brief Flag set while the event preceding FirstEvent is being
+        #  processed.
+        #
+        #  The priming event is run through the whole iterator chain (so that
+        #  the counters which are not reset between events, like
+        #  DiscardedDelta or DeadZoneDelta, are correctly initialized), but
+        #  it is not written in the output tree and its errors are discarded.
+
+        ## @var EventIndex
+        ## @brief The pEventIndex object for the input file (None if the
+        #  index is not available), used to seek directly to FirstEvent.
+
+        ## @var EventIndexBuilder
+        ## @brief The pEventIndex object filled on the fly when no index is
+        #  available for the input file (and the file is processed from the
+        #  beginning); the index is written at the end of the event loop if
+        #  the end of file has been reached.
+
+        ## @var CurrentEventOffset
+        ## @brief The offset (in the input file) of the event being processed
+        #  (only tracked while the event index is being built).
+
+        ## @var CurrentEventLength
+        ## @brief The length of the event being processed (only tracked while
+        #  the event index is being built).
+
+        ## @var EndOfFile
+        ## @brief Flag set when the end of the input file is reached.
+
+        ## @var StreamHistograms
+        ## @brief Flag to fill the output-list histograms event by event
+        #  (see @ref pStreamingHistogrammer), initialized to False.
+        #
+        #  Only relevant when the processed (histogram) output file is
+        #  requested.
+
+        ## @var SkipTree
+        ## @brief Flag not to fill the output ROOT tree, initialized to False.
+        #
+        #  Only relevant in the streaming mode; the plots which can't be
+        #  filled event by event are not produced.
+
+        ## @var M7RefreshInterval
+        ## @brief The minimum time (in seconds of event time) between two
+        #  updates of the space craft position and geomagnetic variables,
+        #  initialized to 5 (0 means every event with a new time stamp).
+
+        ## @var M7Interpolation
+        ## @brief The interpolation method for the space craft position (see
+        #  pM7Parser.INTERPOLATION_METHODS), initialized to None (i.e. the
+        #  nearest ORB record is used).
+
+        ## @var ErrorStore
+        ## @brief Flag to write all the errors to the binary error store
+        #  (see @ref pErrorStore) next to the xml error file, initialized
+        #  to False.
+
+        ## @var StreamErrors
+        ## @brief Flag to stream all the error events to the xml error file
+        #  while processing (see @ref pErrorStream), initialized to False.
+        #
+        #  By default only a sample of (at most) MAX_ERROR_EVENTS error
+        #  events is kept in memory and reported (see @ref pErrorHandler).
+
+        ## @var StreamingHistogrammer
+        ## @brief The pStreamingHistogrammer object (None unless the
+        #  streaming mode is enabled).
+
+        ## @var Profiler
+        ## @brief The pStageProfiler object accounting for the time spent in
+        #  the stages of the event loop (see @ref pStageProfiler), None (i.e.
+        #  no profiling) by default.
+
+        ## @var OrbitTimeline
+        ## @brief The pOrbitTimeline object (see @ref pOrbitTimeline) used
+        #  instead of the pM7Parser when an up-to-date timeline is available
+        #  for the magic7 file (None otherwise).
+
         logger.info('Starting Data Processor.')
 	logger.info('Using LDF Version : %s - %s - %s', LDF.LDF_VERSION_STR,
                     LDF.LDF_VERSION, LDF.__file__)
         
         self.InputFilePath = inputFilePath
+        self.ConfigFilePath = configFilePath
+        self.InputMagic7FilePath = inputMagic7FilePath
+        self.SaaDefinitionFile = saaDefinitionFile
         if outputFilePath is None:
             logger.info('Output file path not specified.')
             logger.info('All output files will be saved in the input folder.')
@@ -145,14 +248,19 @@ class pDataProcessor:
                                self.OutputProcessedFilePath)
         self.M7Parser = None
         self.GeomagProcessor = None
+        self.OrbitTimeline = None
         if inputMagic7FilePath is not None:
+            from pOrbitTimeline     import openOrbitTimeline
+            self.OrbitTimeline = openOrbitTimeline(inputMagic7FilePath,\
+                                                   saaDefinitionFile)
+        if inputMagic7FilePath is not None and self.OrbitTimeline is None:
             from pGeomagProcessor   import pGeomagProcessor
             from pM7Parser          import pM7Parser
             from IGRF               import IGRF
             logger.info('Using magic7 file : %s' % inputMagic7FilePath)
             self.M7Parser = pM7Parser(inputMagic7FilePath, saaDefinitionFile)
             self.GeomagProcessor = pGeomagProcessor(self.TreeMaker)
-        if self.M7Parser is None:
+        if self.M7Parser is None and self.OrbitTimeline is None:
             logger.error('pDataProcessor started without magic7 information.')
             logger.error('Are you sure?')
         if self.OutputProcessedFilePath is not None:
@@ -161,8 +269,9 @@ class pDataProcessor:
 	self.EvtMetaContextProcessor =\
                                      pEvtMetaContextProcessor(self.TreeMaker,\
                                                              self.ErrorHandler)
-        self.__updateContributionIterators()
-        self.__updateContributions()
+        if updateIterators:
+            self.__updateContributionIterators()
+            self.__updateContributions()
         from pLATcomponentIterator    import pLATcomponentIterator
         self.LatCompIter    = pLATcomponentIterator(self.TreeMaker,\
                                                     self.ErrorHandler)
@@ -177,6 +286,21 @@ class pDataProcessor:
         self.StartTime      = None
         self.StopTime       = None
 	self.PrevTimestamp  = 0
+        self.FirstEvent     = 0
+        self.PrimingEvent   = False
+        self.EventIndex     = None
+        self.EventIndexBuilder  = None
+        self.CurrentEventOffset = 0
+        self.CurrentEventLength = 0
+        self.EndOfFile      = False
+        self.StreamHistograms = False
+        self.SkipTree       = False
+        self.ErrorStore     = False
+        self.StreamErrors   = False
+        self.M7RefreshInterval = 5
+        self.M7Interpolation   = None
+        self.StreamingHistogrammer = None
+        self.Profiler       = None
 
     ## @brief Update the event contribution iterators, based on the xml
     #  configuration file.
@@ -200,11 +324,57 @@ class pDataProcessor:
         writer = pGEMcontributionWriter(self.XmlParser)
         writer.writeComponent()
 
-    def startProcessing(self, maxNumEvents = -1):
+    ## @brief Return the input file type (i.e. the file extension).
+    ## @param self
+    #  The class instance.
+
+    def getInputFileType(self):
+        return self.InputFilePath.split('.')[-1]
+
+    ## @brief Start the data processing.
+    ## @param self
+    #  The class instance.
+    ## @param maxNumEvents
+    #  The maximum number of events to be processed (-1 means all).
+    ## @param numWorkers
+    #  The number of worker processes. If larger than 1, the input file is
+    #  split into event-range shards processed in parallel by
+    #  @ref pParallelProcessor (for the file types supporting it).
+
+    def startProcessing(self, maxNumEvents = -1, numWorkers = 1):
         logger.info('Opening data file %s...' % self.InputFilePath)
         if not os.path.exists(self.InputFilePath):
             sys.exit('Input data file not found. Abort.')
-        fileType = self.InputFilePath.split('.')[-1]
+        fileType = self.getInputFileType()
+        if numWorkers > 1:
+            if fileType in PARALLEL_FILE_TYPES:
+                if self.StreamHistograms:
+                    logger.warn('Streaming histograms not supported in '+\
+                                'parallel processing.')
+                if self.ErrorStore:
+                    logger.warn('Binary error store not supported in '+\
+                                'parallel processing.')
+                if self.Profiler is not None:
+                    logger.warn('Profiling not supported in parallel '+\
+                                'processing.')
+                parallelProcessor = pParallelProcessor(self, numWorkers)
+                parallelProcessor.run(maxNumEvents)
+                return
+            logger.warn('Parallel processing not supported for %s files.' %\
+                        fileType)
+            logger.warn('Falling back to serial processing.')
+        if fileType in INDEXED_FILE_TYPES:
+            self.__openEventIndex()
+        if self.StreamErrors:
+            self.ErrorHandler.openXmlStream(self.OutputErrorFilePath)
+        if not self.OutputErrorFilePath.endswith('.pickle'):
+            if self.ErrorStore:
+                self.ErrorHandler.openErrorStore(\
+                    getErrorStoreFilePath(self.OutputErrorFilePath))
+        if self.StreamHistograms and self.OutputProcessedFilePath is not None:
+            self.__openStreamingHistogrammer()
+        if self.Profiler is not None:
+            self.__instrumentStages()
         logger.info('Processing started on %s.' % time.asctime())
         self.NumEvents = 0
         self.StartTime = time.time()
@@ -215,12 +385,152 @@ class pDataProcessor:
             self.EvtReader = LSEReader(self.InputFilePath)
             self.startEvtProcessing(maxNumEvents)
         elif fileType == 'ldf':
-            self.LdfFile   = file(self.InputFilePath, 'rb')
+            self.LdfFile   = pLDFReader(self.InputFilePath)
             self.startLDFProcessing(maxNumEvents)
         else:
             sys.exit('Unknown file type (%s).' % fileType)
         logger.info('Data processing complete.')
 
+    ## @brief Hand the methods implementing the stages of the event loop
+    #  over to the profiler.
+    ## @param self
+    #  The class instance.
+
+    def __instrumentStages(self):
+        for (obj, methodName, stageName) in\
+                [(self.LatDataBufIter, 'iterate', 'event_iteration'),
+                 (self.EbfEventIter, 'iterate', 'event_iteration'),
+                 (self.LatDatagrIter, 'process', 'datagram'),
+                 (self.LatCompIter, 'GEMcomponent', 'gem_component'),
+                 (self.LatCompIter, 'TKRcomponent', 'tkr_component'),
+                 (self.LatCompIter, 'CALcomponent', 'cal_component'),
+                 (self.LatCompIter, 'ACDcomponent', 'acd_component'),
+                 (self.LatCompIter, 'error', 'err_component'),
+                 (self.MetaEventProcessor, 'process', 'meta_context'),
+                 (self.EvtMetaContextProcessor, 'process', 'meta_context'),
+                 (self.OrbitTimeline, 'fillVariables', 'geomag_refresh'),
+                 (self.M7Parser, 'getSCPosition', 'geomag_refresh'),
+                 (self.GeomagProcessor, 'process', 'geomag_refresh'),
+                 (self.ErrorHandler, 'flushErrorsBuffer', 'error_flush'),
+                 (self.StreamingHistogrammer, 'processEvent',
+                  'stream_histograms'),
+                 (self.TreeMaker, 'fillTree', 'fill_tree')]:
+            self.Profiler.instrument(obj, methodName, stageName)
+
+    ## @brief Read the event index of the input file or, if not available,
+    #  prepare for building it on the fly.
+    ## @param self
+    #  The class instance.
+
+    def __openEventIndex(self):
+        eventIndex = pEventIndex(self.InputFilePath)
+        if eventIndex.read():
+            self.EventIndex = eventIndex
+        elif self.FirstEvent == 0:
+            self.EventIndexBuilder = eventIndex
+
+    ## @brief Create the streaming histogrammer and hand it over to the
+    #  tree processor.
+    ## @param self
+    #  The class instance.
+
+    def __openStreamingHistogrammer(self):
+        self.StreamingHistogrammer = pStreamingHistogrammer(self.XmlParser,\
+                                                            self.TreeMaker)
+        self.TreeProcessor.StreamingHistogrammer = self.StreamingHistogrammer
+        self.TreeProcessor.SkipTree = self.SkipTree
+        if self.SkipTree:
+            logger.info('The ROOT tree will not be filled.')
+
+    ## @brief Skip the events preceding FirstEvent in the input file.
+    #
+    #  The last event before FirstEvent is not skipped: it is flagged as the
+    #  priming event and processed by the event loop (see the documentation
+    #  of the PrimingEvent class member).
+    #
+    #  If the event index is available the priming event is reached with a
+    #  single seek, otherwise the events are skipped one by one.
+    ## @param self
+    #  The class instance.
+    ## @param skipEvent
+    #  The function skipping one event in the input file (returning False
+    #  when the end of file is reached).
+    ## @param seekEvent
+    #  The function moving to a given offset in the input file (None if the
+    #  file type does not support random access).
+
+    def __skipToFirstEvent(self, skipEvent, seekEvent = None):
+        if self.FirstEvent == 0:
+            return
+        if self.EventIndex is not None and seekEvent is not None:
+            if self.FirstEvent > self.EventIndex.getNumEvents():
+                sys.exit('End of file reached while skipping events. Abort.')
+            logger.info('Seeking event %d...' % (self.FirstEvent - 1))
+            seekEvent(self.EventIndex.getOffset(self.FirstEvent - 1))
+        else:
+            logger.info('Skipping %d event(s)...' % (self.FirstEvent - 1))
+            for i in xrange(self.FirstEvent - 1):
+                if not skipEvent():
+                    sys.exit('End of file reached while skipping events. '+\
+                             'Abort.')
+        self.PrimingEvent = True
+
+    ## @brief Skip one event in a lsf file.
+    ## @param self
+    #  The class instance.
+
+    def __skipLSFEvent(self):
+        try:
+            (meta, event) = self.LsfMerger.getUncompressedEvent()
+        except TypeError:
+            return False
+        return True
+
+    ## @brief Skip one event in a evt file.
+    ## @param self
+    #  The class instance.
+
+    def __skipEvtEvent(self):
+        return not self.EvtReader.nextEvent().isNull()
+
+    ## @brief Move to a given offset in a evt file.
+    ## @param self
+    #  The class instance.
+    ## @param offset
+    #  The offset.
+
+    def __seekEvtEvent(self, offset):
+        self.EvtReader.seek(offset)
+
+    ## @brief Move to a given offset in a ldf file.
+    ## @param self
+    #  The class instance.
+    ## @param offset
+    #  The offset.
+
+    def __seekLDFEvent(self, offset):
+        self.LdfFile.seek(offset)
+
+    ## @brief Skip one event in a ldf file (only the event header is read).
+    ## @param self
+    #  The class instance.
+
+    def __skipLDFEvent(self):
+        return self.LdfFile.skipEvent()
+
+    ## @brief Read the next event from a ldf file.
+    #
+    #  Return None when the end of file is reached.
+    ## @param self
+    #  The class instance.
+
+    def __readLDFEvent(self):
+        self.CurrentEventOffset = self.LdfFile.tell()
+        event = self.LdfFile.readEvent()
+        if event is not None:
+            self.CurrentEventLength = len(event)
+        return event
+
     ## @brief Start the event loop for lsf files.
     ## @param self
     #  The class instance.
@@ -228,6 +538,7 @@ class pDataProcessor:
     #  The maximum number of events.
     
     def startLSFProcessing(self, maxEvents):
+        self.__skipToFirstEvent(self.__skipLSFEvent)
         while (self.NumEvents != maxEvents):
             try:
                 (meta, event) = self.LsfMerger.getUncompressedEvent()
@@ -247,21 +558,19 @@ class pDataProcessor:
     
     def startEvtProcessing(self, maxEvents):
         self.EvtMetaContextProcessor.setEvtReader(self.EvtReader)
+        self.__skipToFirstEvent(self.__skipEvtEvent, self.__seekEvtEvent)
         while (self.NumEvents != maxEvents):
+            if self.EventIndexBuilder is not None:
+                self.CurrentEventOffset = self.EvtReader.tell()
             evt = self.EvtReader.nextEvent()
             if evt.isNull():
                 logger.info("End of File reached.")
+                self.EndOfFile = True
                 break
-            if evt.infotype() == LSE_Info.LPA:
-                meta = evt.pinfo()
-            elif evt.infotype() == LSE_Info.LCI_ACD:
-            	meta = evt.ainfo()
-            elif evt.infotype() == LSE_Info.LCI_CAL:
-            	meta = evt.cinfo()
-            elif evt.infotype() == LSE_Info.LCI_TKR:
-            	meta = evt.tinfo()	      
-            else:
-                meta = None
+            if self.EventIndexBuilder is not None:
+                self.CurrentEventLength = self.EvtReader.tell() -\
+                                          self.CurrentEventOffset
+            meta = getEvtMeta(evt)
 	    context = evt.ctx()
 	    buff = evt.ebf().copyData()
 	    self.processEvt(meta, context, buff)
@@ -274,19 +583,19 @@ class pDataProcessor:
     #  The maximum number of events.
     
     def startLDFProcessing(self, maxEvents):
+        self.__skipToFirstEvent(self.__skipLDFEvent, self.__seekLDFEvent)
         while (self.NumEvents != maxEvents):
-    	    event = self.LdfFile.read(8)
-    	    if len(event) < 8:
-    	      logger.info("End of File reached.")
-              break
-    	    else:
-    	      (identity, length) = struct.unpack('!LL', event)
-    	      event += self.LdfFile.read(length - 8)
-              self.__preEvent()
-              self.LatDataBufIter.iterate(event, len(event))
-              self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0] = self.NumEvents
-              self.__postEvent()
-              #self.processEvent(event)
+            event = self.__readLDFEvent()
+            if event is None:
+                logger.info("End of File reached.")
+                self.EndOfFile = True
+                break
+            self.__preEvent()
+            self.LatDataBufIter.iterate(event, len(event))
+            self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0] =\
+                self.getEventNumber()
+            self.__postEvent(event)
+        self.LdfFile.close()
         self.finalize()
 
     ## @brief Process an event.
@@ -300,7 +609,7 @@ class pDataProcessor:
     def processEvent(self, event):
         self.__preEvent()
 	self.LatDataBufIter.iterate(event, len(event))
-        self.__postEvent()
+        self.__postEvent(event)
 
     ## @brief Special event processing for evt files.
     ## @param self
@@ -313,25 +622,40 @@ class pDataProcessor:
     #  The buff object of type LDF.EBFeventIterator
     #
     # If a magic7 file is provided, the space craft position and the
-    # corresponding geomagnetic quantities are updated every 5 seconds
+    # corresponding geomagnetic quantities are updated every
+    # M7RefreshInterval seconds (5 by default)
+    # (read from the orbit timeline, if available)
     
     def processEvt(self, meta, context, buff):
         self.__preEvent()
         self.EvtMetaContextProcessor.process(meta, context)
 	self.EbfEventIter.iterate(buff, len(buff), False)
         timestamp = self.TreeMaker.getVariable('event_timestamp')
-        if self.M7Parser is not None and self.M7Parser.HasData:
-	    if (timestamp - self.PrevTimestamp) > 5:
-                position = self.M7Parser.getSCPosition((timestamp, 0))
+        if self.OrbitTimeline is not None and self.OrbitTimeline.HasData:
+            if (timestamp - self.PrevTimestamp) > self.M7RefreshInterval:
+                self.OrbitTimeline.fillVariables(self.TreeMaker, timestamp)
+                self.PrevTimestamp = copy(timestamp)
+        elif self.M7Parser is not None and self.M7Parser.HasData:
+            if (timestamp - self.PrevTimestamp) > self.M7RefreshInterval:
+                position = self.M7Parser.getSCPosition((timestamp, 0),\
+                                                       self.M7Interpolation)
                 self.GeomagProcessor.process(position)
 	        # Need to copy the value, not to let python use a reference !
 		self.PrevTimestamp = copy(timestamp)
         self.__postEvent(buff)
 
+    ## @brief Return the index (in the input file) of the event being
+    #  processed.
+    ## @param self
+    #  The class instance.
+
+    def getEventNumber(self):
+        return self.FirstEvent + self.NumEvents - int(self.PrimingEvent)
+
     def __preEvent(self):
         self.TreeMaker.resetVariables()
 	self.TreeMaker.VariablesDictionary['processor_event_number'][0] =\
-                       self.NumEvents
+                       self.getEventNumber()
 
     ## @brief Post event processing 
     #
@@ -347,6 +671,10 @@ class pDataProcessor:
     #  Use for debugging purpose only.
     
     def __postEvent(self, buff):        
+        if self.PrimingEvent:
+            self.ErrorHandler.discardErrorsBuffer()
+            self.PrimingEvent = False
+            return
         # Try/Except in case the variable is not even defined for backward
         # compatibility
 	try:
@@ -360,7 +688,16 @@ class pDataProcessor:
              self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0])
 	self.TreeMaker.getVariable('error_summary')[0]=error_summary
 	
-        self.TreeMaker.fillTree()
+        if self.StreamingHistogrammer is not None:
+            self.StreamingHistogrammer.processEvent()
+            if not self.SkipTree:
+                self.TreeMaker.fillTree()
+        else:
+            self.TreeMaker.fillTree()
+        if self.EventIndexBuilder is not None:
+            self.EventIndexBuilder.addEvent(self.CurrentEventOffset,
+                self.CurrentEventLength,
+                self.TreeMaker.getVariable('event_timestamp')[0])
 	self.NumEvents += 1
 	if not self.NumEvents % 100:
             elapsedTime = time.time() - self.StartTime
@@ -368,6 +705,7 @@ class pDataProcessor:
             print '\r%s events processed in %.2f s (average rate %.2f Hz).' %\
                   (self.NumEvents, elapsedTime, averageRate),
             sys.stdout.flush()
+            self.ErrorHandler.checkpoint(self.NumEvents)
       
     ## @brief Finalize the data processing.
     #
@@ -383,19 +721,51 @@ class pDataProcessor:
 
 	# For the ErrorHandler get the number of seconds elapsed, assuming
         # counters are fine... 
-	tmin = self.TreeMaker.RootTree.GetMinimum("event_timestamp")
-	tmax = self.TreeMaker.RootTree.GetMaximum("event_timestamp")
-	delta_time = int(tmax-tmin)
+        if self.StreamingHistogrammer is not None and self.SkipTree:
+            delta_time = self.StreamingHistogrammer.getTimeSpan()
+        else:
+            tmin = self.TreeMaker.RootTree.GetMinimum("event_timestamp")
+            tmax = self.TreeMaker.RootTree.GetMaximum("event_timestamp")
+            delta_time = int(tmax-tmin)
 	#Now closing the TTree
 	self.TreeMaker.close()
 
         logger.info('Processing stopped on %s.' % time.asctime())
         logger.info('%d events processed in %.2f s (%.2f Hz).\n' %\
                     (self.NumEvents, elapsedTime, averageRate))
+        if self.Profiler is not None:
+            logger.info('Time spent in the event loop stages:\n%s' %\
+                        self.Profiler)
 	
         self.ErrorHandler.NumProcessedEvents = self.NumEvents
         self.ErrorHandler.SecondsElapsed     = delta_time
-        self.ErrorHandler.writeXmlOutput(self.OutputErrorFilePath)
+        self.writeErrorOutput()
+        if self.EventIndexBuilder is not None and self.EndOfFile:
+            self.EventIndexBuilder.write()
+
+    ## @brief Write the error handler output file.
+    #
+    #  If the output error file path ends with ".pickle" the full state of
+    #  the error handler is pickled and the error events streamed so far
+    #  (if any) are left in the side file of the error stream (this is what
+    #  the workers of a parallel run do), otherwise the standard xml error
+    #  file is written (closing the error stream, if opened at the beginning
+    #  of the run). The binary error store, if requested, is closed as well.
+    ## @param self
+    #  The class instance.
+
+    def writeErrorOutput(self):
+        if self.OutputErrorFilePath.endswith('.pickle'):
+            if self.ErrorHandler.ErrorStream is not None:
+                self.ErrorHandler.detachXmlStream()
+            self.ErrorHandler.dump(self.OutputErrorFilePath)
+        elif self.ErrorHandler.ErrorStream is not None:
+            self.ErrorHandler.closeXmlStream()
+        else:
+            self.ErrorHandler.writeXmlOutput(self.OutputErrorFilePath)
+        if self.ErrorHandler.ErrorStore is not None:
+            self.ErrorHandler.closeErrorStore()
+
 
     ## @brief Dump an event buffer to a file
     #
@@ -421,6 +791,8 @@ class pDataProcessor:
 
     ## @brief Write an xml summary file with run statistics
     #
+    #  If the profiler is enabled, the time spent in each stage of the event
+    #  loop is written as well.
     ## @param self
     #  The class instance.
     ## @param xmlFilePath
@@ -439,6 +811,8 @@ class pDataProcessor:
         writer.writeTag('elapsed_time', {}, elapsedTime)
         writer.writeTag('average_rate', {}, averageRate)
         #writer.writeTag('current_time', {}, time.asctime())
+        if self.Profiler is not None:
+            self.Profiler.writeXml(writer, elapsedTime)
         writer.backup()
         writer.closeTag('pDataProcessorSummary')
         writer.closeFile()
@@ -446,7 +820,9 @@ class pDataProcessor:
 
     
 if __name__ == '__main__':
-    from pOptionParser import pOptionParser
+    from pOptionParser   import pOptionParser
+    from pFastMonOptions import pFastMonOptions
+    fastMonOptions = pFastMonOptions()
     optparser = pOptionParser('cnorvVpems', 1, 1, False)
     if optparser.Options.o == None:
         optparser.error('the -o option is mandatory. Exiting...')
@@ -459,7 +835,49 @@ if __name__ == '__main__':
                                    optparser.Options.o, optparser.Options.p,\
                                    optparser.Options.e, optparser.Options.m,
                                    optparser.Options.s)
-    dataProcessor.startProcessing(optparser.Options.n)
+    if fastMonOptions.SkipTree and not fastMonOptions.StreamHistograms:
+        optparser.error('cannot use the --skip-tree option without '+\
+                        '--stream-histograms')
+    if fastMonOptions.NumWorkers > 1 and\
+           dataProcessor.getInputFileType() in PARALLEL_FILE_TYPES:
+        if fastMonOptions.StreamHistograms:
+            optparser.error('cannot use the --stream-histograms option '+\
+                            'with -j')
+        if fastMonOptions.ErrorStore:
+            optparser.error('cannot use the --error-store option with -j')
+        if fastMonOptions.Profile is not None:
+            optparser.error('cannot use the --profile option with -j')
+    dataProcessor.FirstEvent = fastMonOptions.FirstEvent
+    dataProcessor.StreamHistograms = fastMonOptions.StreamHistograms
+    dataProcessor.SkipTree = fastMonOptions.SkipTree
+    dataProcessor.ErrorStore = fastMonOptions.ErrorStore
+    dataProcessor.StreamErrors = fastMonOptions.StreamErrors
+    dataProcessor.M7RefreshInterval = fastMonOptions.M7RefreshInterval
+    if fastMonOptions.M7Interpolation not in ['none', 'linear', 'hermite']:
+        optparser.error('the --m7-interpolation option must be one of '+\
+                        'none, linear or hermite')
+    if fastMonOptions.M7Interpolation != 'none':
+        dataProcessor.M7Interpolation = fastMonOptions.M7Interpolation
+    if dataProcessor.OrbitTimeline is not None and\
+           (fastMonOptions.M7Interpolation != 'none' or\
+            fastMonOptions.SAAGrid or fastMonOptions.GeomagTimeline):
+        logger.warn('Using the orbit timeline, the --m7-interpolation, '+\
+                    '--saa-grid and --geomag-timeline options are ignored.')
+    if fastMonOptions.SAAGrid and dataProcessor.M7Parser is not None and\
+           dataProcessor.M7Parser.SAAPolygon is not None:
+        dataProcessor.M7Parser.SAAPolygon.useDistanceGrid()
+    if fastMonOptions.GeomagTimeline and dataProcessor.M7Parser is not None and\
+           dataProcessor.M7Parser.HasData:
+        dataProcessor.GeomagProcessor.computeTimeline(dataProcessor.M7Parser,\
+                                             dataProcessor.M7Interpolation)
+    if fastMonOptions.Profile is not None:
+        from pStageProfiler import pStageProfiler
+        dataProcessor.Profiler = pStageProfiler()
+    dataProcessor.startProcessing(optparser.Options.n,\
+                                  fastMonOptions.NumWorkers)
+    if fastMonOptions.Profile is not None and\
+           dataProcessor.StopTime is not None:
+        dataProcessor.writeXmlSummary(fastMonOptions.Profile)
     if optparser.Options.p != None:
         dataProcessor.TreeProcessor.run()
     if optparser.Options.r:
@@ -1,6 +1,8 @@
 ## @package pError
 ## @brief Package describing an error.
 
+from array import array
+
 
 ERROR_DETAIL_LABELS_DICT = {
     'TIMETONE_INCOMPLETE'         : ['timeSecs'],
@@ -75,9 +77,34 @@ def getRemerks(errorCode):
 
 
 
+## @brief Return a compact (immutable) representation of a list of error
+#  details.
+#
+#  Lists of integers are stored into fixed-width arrays, while mixed lists
+#  are stored into tuples (with the strings interned, since the same error
+#  names are repeated over and over).
+## @param details
+#  The list of error details.
+
+def packDetails(details):
+    try:
+        return array('l', details)
+    except (TypeError, OverflowError):
+        packedDetails = []
+        for detail in details:
+            if isinstance(detail, str):
+                detail = intern(detail)
+            packedDetails.append(detail)
+        return tuple(packedDetails)
+
+
 ## @brief Class describing a generic error.
+#
+#  Many errors can be stored during a run, hence the class uses slots.
+
+class pError(object):
 
-class pError:
+    __slots__ = ('ErrorCode', 'Details')
 
     ## @brief Basic constructor.
     ## @param self
@@ -97,11 +124,11 @@ class pError:
         ## @brief The error details (like wich tower, layer, etc...
         #  caused the error).
         
-        self.ErrorCode   = errorCode
-        self.Details     = details
+        self.ErrorCode   = intern(errorCode)
+        self.Details     = packDetails(details)
 
     def hasDetails(self):
-        return self.Details != []
+        return len(self.Details) > 0
 
     def getXmlLine(self):
         return '<error code="%s" %s/>' %\
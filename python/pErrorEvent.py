@@ -35,6 +35,7 @@ ERROR_BITS_DICT = {
     }
 
 UNKNOWN_ERROR_BIT = 31
+NUM_ERROR_BITS    = 32
 
 def getBitNumber(errorCode):
     try:
@@ -45,7 +46,13 @@ def getBitNumber(errorCode):
 GTCC_FIFO_ERROR_BIT = getBitNumber('GTCC_FIFO_ERROR')
 
 
-class pErrorEvent:
+## @brief Class describing an event with errors.
+#
+#  Many error events can be stored during a run, hence the class uses slots.
+
+class pErrorEvent(object):
+
+    __slots__ = ('EventNumber', 'ErrorsList', 'ErrorSummary')
 
     def __init__(self, eventNumber):
         self.EventNumber = eventNumber
@@ -5,22 +5,80 @@ logger = pSafeLogger.getLogger('pErrorHandler')
 
 import time
 import sys
+import random
 import cPickle
 import pUtils
 
 from pError      import pError
 from pErrorEvent import pErrorEvent
+from pErrorEvent import getBitNumber
+from pErrorEvent import NUM_ERROR_BITS
+from pErrorStream import pErrorStream
+from pErrorStream import writeXmlErrorEvent
+from pErrorStore  import pErrorStoreWriter
 
 MAX_ERROR_EVENTS = 500
 
+## @brief The seed of the random generator used for the sampling of the
+#  error events (fixed, so that the output is reproducible).
+
+ERROR_EVENTS_SEED = 313
+
+
+## @brief The error handler.
+#
+#  The number of errors and the number of events with errors are counted
+#  exactly (by error code), while only a sample of (at most)
+#  MAX_ERROR_EVENTS error events is kept in memory with all the error
+#  details. The sample is a uniform random sample (reservoir sampling) of
+#  the error events to be reported in detail (i.e. the ones not containing
+#  only GTCC FIFO errors), unless these are streamed to disk (see
+#  openXmlStream()), in which case all of them are reported.
+
 class pErrorHandler:
 
     def __init__(self):
+
+        ## @var ErrorCountsDict
+        ## @brief The number of errors, indexed by error code.
+
+        ## @var ErrorEventBitCounts
+        ## @brief The number of events with errors, indexed by bit of the
+        #  error summary (see pErrorEvent.ERROR_BITS_DICT).
+
+        ## @var NumErrorEvents
+        ## @brief The total number of events with errors.
+
+        ## @var NumSampledEvents
+        ## @brief The number of error events the ErrorEventsList sample is
+        #  drawn from.
+
+        ## @var ErrorEventsList
+        ## @brief The sample of the error events to be reported in detail.
+
+        ## @var Random
+        ## @brief The random generator for the sampling.
+
+        ## @var ErrorStream
+        ## @brief The pErrorStream object the error events are written to
+        #  as soon as they are flushed (None if the xml error file is
+        #  written at the end).
+
+        ## @var ErrorStore
+        ## @brief The pErrorStoreWriter object all the errors are written to
+        #  (None if the binary error store is not requested).
+
         self.NumProcessedEvents = 'n/a'
         self.SecondsElapsed     = 'n/a'
         self.ErrorCountsDict = {}
+        self.ErrorEventBitCounts = [0]*NUM_ERROR_BITS
+        self.NumErrorEvents = 0
+        self.NumSampledEvents = 0
         self.ErrorEventsList = []
         self.ErrorsBuffer = []
+        self.Random = random.Random(ERROR_EVENTS_SEED)
+        self.ErrorStream = None
+        self.ErrorStore = None
 
     ## @brief Fill the summary dictionary (indexed by error code)
     #  and the error buffer, with which the error event will be filled
@@ -49,42 +107,252 @@ class pErrorHandler:
             if errorEvent.hasUnusualErrors():
 	        logger.info('Unsual errors found, probably just a phase error.')
 		logger.info(errorEvent.getAsText())
-	    self.ErrorEventsList.append(errorEvent)
+            self.__countErrorEvent(errorEvent)
+            if self.ErrorStore is not None:
+                self.ErrorStore.addErrorEvent(errorEvent)
+            if not errorEvent.hasOnlyGTCCFIFOErrors():
+                if self.ErrorStream is not None:
+                    self.ErrorStream.writeErrorEvent(errorEvent)
+                else:
+                    self.__sampleErrorEvent(errorEvent)
             self.ErrorsBuffer = []
             return errorEvent.ErrorSummary
         return 0
 
+    ## @brief Update the counts of the events with errors (from the bits
+    #  set in the error summary of the event).
+
+    def __countErrorEvent(self, errorEvent):
+        self.NumErrorEvents += 1
+        errorSummary = errorEvent.ErrorSummary
+        bit = 0
+        while errorSummary:
+            if errorSummary & 0x1:
+                self.ErrorEventBitCounts[bit] += 1
+            errorSummary >>= 1
+            bit += 1
+
+    ## @brief Return the number of events with a given error.
+    #
+    #  The error codes sharing the same bit of the error summary share the
+    #  same counter, too.
+
+    def getNumEventsWithError(self, errorCode):
+        return self.ErrorEventBitCounts[getBitNumber(errorCode)]
+
+    ## @brief Add an error event to the sample (reservoir sampling).
+
+    def __sampleErrorEvent(self, errorEvent):
+        self.NumSampledEvents += 1
+        if len(self.ErrorEventsList) < MAX_ERROR_EVENTS:
+            self.ErrorEventsList.append(errorEvent)
+        else:
+            index = self.Random.randint(0, self.NumSampledEvents - 1)
+            if index < MAX_ERROR_EVENTS:
+                self.ErrorEventsList[index] = errorEvent
+
+    ## @brief Return True if there are more than MAX_ERROR_EVENTS events
+    #  with errors.
+    #
+    #  This is the meaning of the truncated attribute of the eventSummary in
+    #  the xml error file. It only depends on the counters, so it is the
+    #  same whether the error events are sampled (in which case it also
+    #  signals that some of them may have been left out of the sample) or
+    #  streamed.
+
+    def isTruncated(self):
+        return self.getNumErrorEvents() > MAX_ERROR_EVENTS
+
+    ## @brief Method to be called instead of flushErrorsBuffer() when the
+    #  errors found in the current event must be ignored (e.g. for the
+    #  priming event of a parallel run).
+    #
+    #  The errors in the buffer are removed from the summary dictionary, too.
+
+    def discardErrorsBuffer(self):
+        for error in self.ErrorsBuffer:
+            self.ErrorCountsDict[error.ErrorCode] -= 1
+            if not self.ErrorCountsDict[error.ErrorCode]:
+                del self.ErrorCountsDict[error.ErrorCode]
+        self.ErrorsBuffer = []
+
+    ## @brief Merge the content of another error handler into this one.
+    #
+    #  The counts are summed, while the two samples of error events are
+    #  merged into a uniform random sample of the union.
+
+    def merge(self, other):
+        for (errorCode, numErrors) in other.ErrorCountsDict.items():
+            try:
+                self.ErrorCountsDict[errorCode] += numErrors
+            except KeyError:
+                self.ErrorCountsDict[errorCode] = numErrors
+        for (bit, numEvents) in enumerate(other.ErrorEventBitCounts):
+            self.ErrorEventBitCounts[bit] += numEvents
+        self.NumErrorEvents += other.NumErrorEvents
+        errorEvents = self.ErrorEventsList + other.ErrorEventsList
+        if len(errorEvents) > MAX_ERROR_EVENTS:
+            # Draw how many of the sampled events come from each handler.
+            (numSelf, numOther) = (self.NumSampledEvents,\
+                                   other.NumSampledEvents)
+            numFromSelf = 0
+            for i in xrange(MAX_ERROR_EVENTS):
+                if self.Random.random()*(numSelf + numOther) < numSelf:
+                    numFromSelf += 1
+                    numSelf -= 1
+                else:
+                    numOther -= 1
+            numFromSelf = min(numFromSelf, len(self.ErrorEventsList))
+            numFromSelf = max(numFromSelf, MAX_ERROR_EVENTS -\
+                              len(other.ErrorEventsList))
+            errorEvents = self.Random.sample(self.ErrorEventsList,\
+                                             numFromSelf) +\
+                          self.Random.sample(other.ErrorEventsList,\
+                                             MAX_ERROR_EVENTS - numFromSelf)
+        self.ErrorEventsList = errorEvents
+        self.NumSampledEvents += other.NumSampledEvents
+
+    ## @brief Return the error handler content as a dictionary.
+
+    def getState(self):
+        return {'NumProcessedEvents'  : self.NumProcessedEvents,
+                'SecondsElapsed'      : self.SecondsElapsed,
+                'ErrorCountsDict'     : self.ErrorCountsDict,
+                'ErrorEventBitCounts' : self.ErrorEventBitCounts,
+                'NumErrorEvents'      : self.NumErrorEvents,
+                'NumSampledEvents'    : self.NumSampledEvents,
+                'ErrorEventsList'     : self.ErrorEventsList}
+
+    ## @brief Set the error handler content from a dictionary returned by
+    #  getState().
+
+    def setState(self, content):
+        self.NumProcessedEvents = content['NumProcessedEvents']
+        self.SecondsElapsed     = content['SecondsElapsed']
+        self.ErrorCountsDict    = content['ErrorCountsDict']
+        self.ErrorEventBitCounts = content['ErrorEventBitCounts']
+        self.NumErrorEvents     = content['NumErrorEvents']
+        self.NumSampledEvents   = content['NumSampledEvents']
+        self.ErrorEventsList    = content['ErrorEventsList']
+        self.ErrorsBuffer       = []
+
+    ## @brief Pickle the error handler content to file.
+
+    def dump(self, filePath):
+        logger.info('Writing error handler pickle file %s...' % filePath)
+        outputFile = file(filePath, 'wb')
+        cPickle.dump(self.getState(), outputFile, cPickle.HIGHEST_PROTOCOL)
+        outputFile.close()
+
+    ## @brief Load the error handler content from a file written by dump().
+
+    def load(self, filePath):
+        inputFile = file(filePath, 'rb')
+        content = cPickle.load(inputFile)
+        inputFile.close()
+        self.setState(content)
+
+    ## @brief Start writing the error events to the xml error file as soon
+    #  as they are flushed (see @ref pErrorStream).
+
+    def openXmlStream(self, filePath):
+        self.ErrorStream = pErrorStream(filePath)
+
+    ## @brief Save a checkpoint of the xml error stream (if any).
+    #
+    #  The checkpoint is actually saved only if enough time has elapsed
+    #  since the previous one.
+
+    def checkpoint(self, numProcessedEvents):
+        if self.ErrorStream is not None:
+            self.ErrorStream.checkpoint(self, numProcessedEvents)
+
+    ## @brief Close the xml error stream, writing the final xml error file.
+
+    def closeXmlStream(self):
+        self.ErrorStream.close(self)
+        self.ErrorStream = None
+
+    ## @brief Stop streaming the error events, leaving them in the side file
+    #  of the stream (see pErrorStream.detach()).
+
+    def detachXmlStream(self):
+        self.ErrorStream.detach()
+        self.ErrorStream = None
+
+    ## @brief Start writing all the errors to the binary error store (see
+    #  @ref pErrorStore).
+
+    def openErrorStore(self, filePath):
+        self.ErrorStore = pErrorStoreWriter(filePath)
+
+    ## @brief Close the binary error store.
+
+    def closeErrorStore(self):
+        self.ErrorStore.close(self.NumProcessedEvents, self.SecondsElapsed)
+        self.ErrorStore = None
+
     def getNumErrors(self):
         return sum(self.ErrorCountsDict.values())
 
     def getNumErrorEvents(self):
-        return len(self.ErrorEventsList)
+        return self.NumErrorEvents
  
-    def writeXmlOutput(self, filename):
-        try:
-            from pXmlWriter import pXmlWriter
-        except:
-            logger.error("Can not find pXmlWriter module. Exit.")
-            return None
-        truncated = self.getNumErrorEvents() > MAX_ERROR_EVENTS
-        xmlWriter  = pXmlWriter(filename)
-        xmlWriter.openTag('errorContribution')
-        xmlWriter.indent()
-        xmlWriter.newLine()
+    ## @brief Write the summary by error code.
+    #
+    #  This only uses the counters updated in flushErrorsBuffer(), so it
+    #  takes a time proportional to the number of error codes.
+
+    def writeXmlErrorSummary(self, xmlWriter):
         xmlWriter.writeComment('Summary by error code')
         xmlWriter.openTag('errorSummary')
         xmlWriter.indent()
         for (errorCode, numErrors) in self.ErrorCountsDict.items():
-            numEvents = 0
-            for errorEvent in self.ErrorEventsList:
-                if errorEvent.hasError(errorCode):
-                    numEvents += 1
+            numEvents = self.getNumEventsWithError(errorCode)
             xmlWriter.writeTag('errorType', {'code':errorCode,
                                              'quantity': numErrors,
                                              'events': numEvents
                                              })
         xmlWriter.backup()
         xmlWriter.closeTag('errorSummary')
+
+    ## @brief Write a single error event.
+
+    def writeXmlErrorEvent(self, xmlWriter, errorEvent):
+        writeXmlErrorEvent(xmlWriter, errorEvent)
+
+    ## @brief Copy the error events streamed to a file into the xml error
+    #  file.
+
+    def __copyXmlErrorEvents(self, xmlWriter, eventsFilePath, eventsFileSize):
+        eventsFile = file(eventsFilePath)
+        numBytes = 0
+        for line in eventsFile:
+            numBytes += len(line)
+            if eventsFileSize is not None and numBytes > eventsFileSize:
+                break
+            xmlWriter.writeLine(line.rstrip('\n'))
+        eventsFile.close()
+
+    ## @brief Write the xml error file.
+    #
+    #  The error events are either the ones in memory or, if eventsFilePath
+    #  is not None, the ones previously streamed to that file (up to
+    #  eventsFileSize bytes, if specified).
+
+    def writeXmlOutput(self, filename, eventsFilePath = None,
+                       eventsFileSize = None):
+        try:
+            from pXmlWriter import pXmlWriter
+        except:
+            logger.error("Can not find pXmlWriter module. Exit.")
+            return None
+        truncated = self.isTruncated()
+        xmlWriter  = pXmlWriter(filename)
+        xmlWriter.openTag('errorContribution')
+        xmlWriter.indent()
+        xmlWriter.newLine()
+        self.writeXmlErrorSummary(xmlWriter)
         xmlWriter.newLine()
         xmlWriter.writeComment('Summary by event number')
         xmlWriter.openTag('eventSummary',\
@@ -93,15 +361,15 @@ class pErrorHandler:
                            'seconds_elapsed'       : self.SecondsElapsed,
                            'truncated'             : truncated})
         xmlWriter.indent()
-        for errorEvent in self.ErrorEventsList:
-            if not errorEvent.hasOnlyGTCCFIFOErrors():
-                xmlWriter.openTag('errorEvent',\
-                                      {'eventNumber': errorEvent.EventNumber})
-                xmlWriter.indent()
-                for error in errorEvent.ErrorsList:
-                    xmlWriter.writeLine(error.getXmlLine())
-                xmlWriter.backup()
-                xmlWriter.closeTag('errorEvent')
+        if eventsFilePath is not None:
+            self.__copyXmlErrorEvents(xmlWriter, eventsFilePath,\
+                                      eventsFileSize)
+        else:
+            errorEvents = sorted(self.ErrorEventsList, key = lambda\
+                                 errorEvent: errorEvent.EventNumber)
+            for errorEvent in errorEvents:
+                if not errorEvent.hasOnlyGTCCFIFOErrors():
+                    self.writeXmlErrorEvent(xmlWriter, errorEvent)
         xmlWriter.backup()
         xmlWriter.closeTag('eventSummary')
         xmlWriter.backup()
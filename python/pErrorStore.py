@@ -0,0 +1,442 @@
+#! /bin/env python
+
+## @package pErrorStore
+## @brief Compact binary (columnar) store of the errors.
+#
+#  All the errors found during the data processing are written, one row per
+#  error, into a numpy structured array saved in the standard .npy format
+#  (so that it can be memory-mapped with numpy.load(filePath, mmap_mode =
+#  'r')). The columns are the event number, the error code id, the tower
+#  (-1 if the error is not tower-related), the number of details, a bit mask
+#  flagging the details which are strings and the details themselves.
+#
+#  The error codes and the string details are stored as ids into two tables
+#  which are pickled, along with the run information, into a small metadata
+#  file next to the store.
+#
+#  The store can be converted back into the standard xml error file by
+#  running this module:
+#
+#  python pErrorStore.py -o <xml error file> <error store>
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pErrorStore')
+
+import os
+import sys
+import shutil
+import cPickle
+import numpy
+
+from pError      import pError
+from pError      import ERROR_DETAIL_LABELS_DICT
+from pErrorEvent import pErrorEvent
+from pErrorEvent import getBitNumber
+from pErrorEvent import GTCC_FIFO_ERROR_BIT
+
+ERROR_STORE_SUFFIX      = '.npy'
+ERROR_STORE_META_SUFFIX = '.meta'
+
+## @brief The maximum number of details stored for each error (the others
+#  are dropped).
+
+MAX_ERROR_DETAILS = 6
+
+## @brief The number of rows buffered in memory before being written.
+
+ERROR_STORE_CHUNK_SIZE = 65536
+
+ERROR_STORE_DTYPE = numpy.dtype([('event_number', 'int64'),
+                                 ('code'        , 'int16'),
+                                 ('tower'       , 'int16'),
+                                 ('num_details' , 'int8'),
+                                 ('string_mask' , 'uint8'),
+                                 ('details'     , 'int64',\
+                                  (MAX_ERROR_DETAILS,))])
+
+
+## @brief Return the path to the error store for a given xml error file.
+## @param errorFilePath
+#  The path to the xml error file.
+
+def getErrorStoreFilePath(errorFilePath):
+    if errorFilePath.endswith('.xml'):
+        errorFilePath = errorFilePath[:-4]
+    return '%s%s' % (errorFilePath, ERROR_STORE_SUFFIX)
+
+## @brief Return the position of the tower in the details of a given error
+#  code (None if the error is not tower-related).
+## @param errorCode
+#  The error code.
+
+def getTowerIndex(errorCode):
+    try:
+        return ERROR_DETAIL_LABELS_DICT[errorCode].index('Tower')
+    except (KeyError, ValueError):
+        return None
+
+
+## @brief Class writing the error store.
+
+class pErrorStoreWriter:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the error store.
+
+    def __init__(self, filePath):
+
+        ## @var FilePath
+        ## @brief The path to the error store.
+
+        ## @var PartFilePath
+        ## @brief The path to the file the rows are written to during the
+        #  data processing.
+
+        ## @var PartFile
+        ## @brief The file object for the rows.
+
+        ## @var Rows
+        ## @brief The list of the rows not yet written.
+
+        ## @var NumRows
+        ## @brief The number of rows written so far.
+
+        ## @var CodeIdsDict
+        ## @brief The ids of the error codes, indexed by error code.
+
+        ## @var StringIdsDict
+        ## @brief The ids of the string details, indexed by string.
+
+        ## @var TowerIndexDict
+        ## @brief The position of the tower in the details, indexed by error
+        #  code (cached).
+
+        self.FilePath       = filePath
+        self.PartFilePath   = '%s.part' % filePath
+        self.PartFile       = file(self.PartFilePath, 'wb')
+        self.Rows           = []
+        self.NumRows        = 0
+        self.CodeIdsDict    = {}
+        self.StringIdsDict  = {}
+        self.TowerIndexDict = {}
+        logger.info('Writing errors to %s...' % filePath)
+
+    ## @brief Return the id of an entry of a table, adding the entry if
+    #  needed.
+    ## @param self
+    #  The class instance.
+    ## @param idsDict
+    #  The dictionary of the ids.
+    ## @param key
+    #  The entry.
+
+    def __getId(self, idsDict, key):
+        try:
+            return idsDict[key]
+        except KeyError:
+            idsDict[key] = len(idsDict)
+            return idsDict[key]
+
+    ## @brief Return the list of the entries of a table, ordered by id.
+    ## @param self
+    #  The class instance.
+    ## @param idsDict
+    #  The dictionary of the ids.
+
+    def __getTable(self, idsDict):
+        table = [None]*len(idsDict)
+        for (key, id) in idsDict.items():
+            table[id] = key
+        return table
+
+    ## @brief Add the errors of an event.
+    ## @param self
+    #  The class instance.
+    ## @param errorEvent
+    #  The pErrorEvent object.
+
+    def addErrorEvent(self, errorEvent):
+        for error in errorEvent.ErrorsList:
+            self.addError(errorEvent.EventNumber, error)
+        if len(self.Rows) >= ERROR_STORE_CHUNK_SIZE:
+            self.flush()
+
+    ## @brief Add a single error.
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event number.
+    ## @param error
+    #  The pError object.
+
+    def addError(self, eventNumber, error):
+        errorCode = error.ErrorCode
+        try:
+            towerIndex = self.TowerIndexDict[errorCode]
+        except KeyError:
+            towerIndex = getTowerIndex(errorCode)
+            self.TowerIndexDict[errorCode] = towerIndex
+        details = list(error.Details[:MAX_ERROR_DETAILS])
+        if len(error.Details) > MAX_ERROR_DETAILS:
+            logger.warn('Too many details for %s (%d), dropping the last %d.'\
+                        % (errorCode, len(error.Details),\
+                           len(error.Details) - MAX_ERROR_DETAILS))
+        stringMask = 0
+        for (i, detail) in enumerate(details):
+            if not isinstance(detail, (int, long)):
+                details[i] = self.__getId(self.StringIdsDict, str(detail))
+                stringMask |= (1 << i)
+        tower = -1
+        if towerIndex is not None and towerIndex < len(details) and\
+               not (stringMask >> towerIndex) & 0x1:
+            tower = details[towerIndex]
+        numDetails = len(details)
+        details += [0]*(MAX_ERROR_DETAILS - numDetails)
+        self.Rows.append((eventNumber,\
+                          self.__getId(self.CodeIdsDict, errorCode), tower,\
+                          numDetails, stringMask, tuple(details)))
+
+    ## @brief Write the buffered rows.
+    ## @param self
+    #  The class instance.
+
+    def flush(self):
+        if len(self.Rows):
+            numpy.array(self.Rows, ERROR_STORE_DTYPE).tofile(self.PartFile)
+            self.NumRows += len(self.Rows)
+            self.Rows = []
+
+    ## @brief Write the final error store and the metadata file.
+    ## @param self
+    #  The class instance.
+    ## @param numProcessedEvents
+    #  The number of processed events.
+    ## @param secondsElapsed
+    #  The time span of the data.
+
+    def close(self, numProcessedEvents, secondsElapsed):
+        self.flush()
+        self.PartFile.close()
+        header = {'descr'        : numpy.lib.format.dtype_to_descr(\
+                                       ERROR_STORE_DTYPE),
+                  'fortran_order': False,
+                  'shape'        : (self.NumRows,)}
+        tmpFilePath = '%s.%d.tmp' % (self.FilePath, os.getpid())
+        outputFile = file(tmpFilePath, 'wb')
+        numpy.lib.format.write_array_header_1_0(outputFile, header)
+        partFile = file(self.PartFilePath, 'rb')
+        shutil.copyfileobj(partFile, outputFile)
+        partFile.close()
+        outputFile.close()
+        os.rename(tmpFilePath, self.FilePath)
+        os.remove(self.PartFilePath)
+        outputFile = file('%s%s' % (self.FilePath, ERROR_STORE_META_SUFFIX),\
+                          'wb')
+        cPickle.dump({'Codes'             : self.__getTable(self.CodeIdsDict),
+                      'Strings'           : self.__getTable(self.StringIdsDict),
+                      'NumProcessedEvents': numProcessedEvents,
+                      'SecondsElapsed'    : secondsElapsed},
+                     outputFile, cPickle.HIGHEST_PROTOCOL)
+        outputFile.close()
+        logger.info('%d errors written to %s.' % (self.NumRows, self.FilePath))
+
+
+## @brief Class reading (and querying) the error store.
+
+class pErrorStore:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the error store.
+
+    def __init__(self, filePath):
+
+        ## @var FilePath
+        ## @brief The path to the error store.
+
+        ## @var Table
+        ## @brief The (memory-mapped) numpy structured array with the errors.
+
+        ## @var Codes
+        ## @brief The list of the error codes, indexed by code id.
+
+        ## @var Strings
+        ## @brief The list of the string details, indexed by string id.
+
+        ## @var NumProcessedEvents
+        ## @brief The number of processed events.
+
+        ## @var SecondsElapsed
+        ## @brief The time span of the data.
+
+        self.FilePath = filePath
+        self.Table    = numpy.load(filePath, mmap_mode = 'r')
+        inputFile = file('%s%s' % (filePath, ERROR_STORE_META_SUFFIX), 'rb')
+        content = cPickle.load(inputFile)
+        inputFile.close()
+        self.Codes              = content['Codes']
+        self.Strings            = content['Strings']
+        self.NumProcessedEvents = content['NumProcessedEvents']
+        self.SecondsElapsed     = content['SecondsElapsed']
+
+    ## @brief Return the number of errors in the store.
+    ## @param self
+    #  The class instance.
+
+    def getNumRows(self):
+        return len(self.Table)
+
+    ## @brief Return the id of an error code (None if the code is not in the
+    #  store).
+    ## @param self
+    #  The class instance.
+    ## @param errorCode
+    #  The error code.
+
+    def getCodeId(self, errorCode):
+        try:
+            return self.Codes.index(errorCode)
+        except ValueError:
+            return None
+
+    ## @brief Return a boolean numpy array selecting the errors with given
+    #  properties.
+    ## @param self
+    #  The class instance.
+    ## @param errorCode
+    #  The error code (None means any).
+    ## @param tower
+    #  The tower (None means any).
+    ## @param firstEvent
+    #  The first event number (None means no lower limit).
+    ## @param lastEvent
+    #  The last event number (None means no upper limit).
+
+    def select(self, errorCode = None, tower = None, firstEvent = None,\
+               lastEvent = None):
+        mask = numpy.ones((len(self.Table)), 'bool')
+        if errorCode is not None:
+            mask &= (self.Table['code'] == self.getCodeId(errorCode))
+        if tower is not None:
+            mask &= (self.Table['tower'] == tower)
+        if firstEvent is not None:
+            mask &= (self.Table['event_number'] >= firstEvent)
+        if lastEvent is not None:
+            mask &= (self.Table['event_number'] <= lastEvent)
+        return mask
+
+    ## @brief Return the number of errors with given properties (see
+    #  select()).
+    ## @param self
+    #  The class instance.
+
+    def getNumErrors(self, errorCode = None, tower = None, firstEvent = None,\
+                     lastEvent = None):
+        return int(self.select(errorCode, tower, firstEvent, lastEvent).sum())
+
+    ## @brief Return the number of errors, indexed by error code.
+    ## @param self
+    #  The class instance.
+
+    def getErrorCountsDict(self):
+        counts = numpy.bincount(self.Table['code'].astype('int64'))
+        return dict([(self.Codes[id], int(count)) for (id, count) in\
+                     enumerate(counts) if count])
+
+    ## @brief Return the event numbers and the error summaries (as
+    #  in pErrorEvent.ErrorSummary) of the events with errors.
+    ## @param self
+    #  The class instance.
+
+    def getErrorSummaries(self):
+        if not len(self.Table):
+            return (numpy.zeros((0), 'int64'), numpy.zeros((0), 'int64'))
+        codeBits = numpy.array([1 << getBitNumber(code) for code in\
+                                self.Codes], 'int64')
+        bits = codeBits[self.Table['code']]
+        eventNumbers = self.Table['event_number']
+        starts = numpy.concatenate(([0], numpy.flatnonzero(\
+                    eventNumbers[1:] != eventNumbers[:-1]) + 1))
+        return (numpy.array(eventNumbers[starts]),\
+                numpy.bitwise_or.reduceat(bits, starts))
+
+    ## @brief Return the pError object for a given row.
+    ## @param self
+    #  The class instance.
+    ## @param row
+    #  The row of the table.
+
+    def getError(self, row):
+        details = []
+        for i in range(row['num_details']):
+            detail = int(row['details'][i])
+            if (row['string_mask'] >> i) & 0x1:
+                detail = self.Strings[detail]
+            details.append(detail)
+        return pError(self.Codes[row['code']], details)
+
+    ## @brief Iterate over the error events (pErrorEvent objects), in the
+    #  order they have been written.
+    ## @param self
+    #  The class instance.
+
+    def iterErrorEvents(self):
+        errorEvent = None
+        for firstRow in xrange(0, len(self.Table), ERROR_STORE_CHUNK_SIZE):
+            for row in self.Table[firstRow:firstRow + ERROR_STORE_CHUNK_SIZE]:
+                eventNumber = int(row['event_number'])
+                if errorEvent is None or errorEvent.EventNumber != eventNumber:
+                    if errorEvent is not None:
+                        yield errorEvent
+                    errorEvent = pErrorEvent(eventNumber)
+                errorEvent.addError(self.getError(row))
+        if errorEvent is not None:
+            yield errorEvent
+
+    ## @brief Write the standard xml error file.
+    ## @param self
+    #  The class instance.
+    ## @param xmlFilePath
+    #  The path to the xml error file.
+
+    def writeXml(self, xmlFilePath):
+        from pErrorHandler import pErrorHandler
+        from pErrorStream  import pErrorStream
+        errorHandler = pErrorHandler()
+        errorHandler.NumProcessedEvents = self.NumProcessedEvents
+        errorHandler.SecondsElapsed     = self.SecondsElapsed
+        errorHandler.ErrorCountsDict    = self.getErrorCountsDict()
+        (eventNumbers, summaries) = self.getErrorSummaries()
+        errorHandler.NumErrorEvents = len(summaries)
+        for bit in range(len(errorHandler.ErrorEventBitCounts)):
+            errorHandler.ErrorEventBitCounts[bit] =\
+                int(((summaries >> bit) & 0x1).sum())
+        errorStream = pErrorStream(xmlFilePath)
+        for errorEvent in self.iterErrorEvents():
+            if errorEvent.ErrorSummary != (0x1 << GTCC_FIFO_ERROR_BIT):
+                errorStream.writeErrorEvent(errorEvent)
+        errorStream.close(errorHandler)
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options] error_store')
+    parser.add_option('-o', '--output-file', dest = 'o', default = None,
+                      help = 'path to the output xml error file')
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.print_help()
+        parser.error('incorrect number of arguments')
+    errorStore = pErrorStore(args[0])
+    outputFilePath = options.o
+    if outputFilePath is None:
+        outputFilePath = '%s.xml' % args[0][:-len(ERROR_STORE_SUFFIX)]
+    logger.info('Converting %d errors to %s...' % (errorStore.getNumRows(),\
+                                                  outputFilePath))
+    errorStore.writeXml(outputFilePath)
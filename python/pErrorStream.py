@@ -0,0 +1,238 @@
+## @package pErrorStream
+## @brief Incremental writing of the xml error file.
+#
+#  When requested (see the --stream-errors option), all the error events
+#  to be reported in detail are appended to a side file
+#  (<error file>.events.part) as soon as they are flushed by the error
+#  handler, instead of being sampled in memory until the end of the run.
+#  They are written through a pXmlWriter, so that the final xml error file
+#  has the same formatting in both cases.
+#  Periodically the side file is synced to disk and the counters of the
+#  error handler (along with the size of the side file at that moment) are
+#  atomically saved in a checkpoint file (<error file>.checkpoint).
+#
+#  When the stream is closed the final xml error file is written (summary
+#  first, then the error events copied from the side file) and the side
+#  files are removed. The workers of a parallel run stream their error
+#  events in the same way, and the parent process concatenates their side
+#  files (in event order) into its own stream, so that the xml error file
+#  is the same that a serial run would write. If the run crashes, the xml
+#  error file can be rebuilt from the last checkpoint by running this
+#  module:
+#
+#  python pErrorStream.py <error file>
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pErrorStream')
+
+import os
+import sys
+import time
+import shutil
+import cPickle
+
+from pXmlWriter import pXmlWriter
+
+## @brief The minimum time (in seconds) between two checkpoints.
+
+ERROR_CHECKPOINT_INTERVAL = 30.0
+
+EVENTS_FILE_SUFFIX     = '.events.part'
+CHECKPOINT_FILE_SUFFIX = '.checkpoint'
+
+
+## @brief Return the path to the side file with the error events.
+## @param filePath
+#  The path to the xml error file.
+
+def getEventsFilePath(filePath):
+    return '%s%s' % (filePath, EVENTS_FILE_SUFFIX)
+
+## @brief Return the path to the checkpoint file.
+## @param filePath
+#  The path to the xml error file.
+
+def getCheckpointFilePath(filePath):
+    return '%s%s' % (filePath, CHECKPOINT_FILE_SUFFIX)
+
+
+## @brief Write a single error event through a pXmlWriter object.
+#
+#  This is used both for the side file and for the xml error file written
+#  at the end of a run that is not streaming, so the formatting is the same.
+## @param xmlWriter
+#  The pXmlWriter object.
+## @param errorEvent
+#  The pErrorEvent object.
+
+def writeXmlErrorEvent(xmlWriter, errorEvent):
+    xmlWriter.openTag('errorEvent', {'eventNumber': errorEvent.EventNumber})
+    xmlWriter.indent()
+    for error in errorEvent.ErrorsList:
+        xmlWriter.writeLine(error.getXmlLine())
+    xmlWriter.backup()
+    xmlWriter.closeTag('errorEvent')
+
+
+## @brief The error stream implementation.
+
+class pErrorStream:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the xml error file.
+
+    def __init__(self, filePath):
+
+        ## @var FilePath
+        ## @brief The path to the xml error file.
+
+        ## @var EventsFilePath
+        ## @brief The path to the side file with the error events.
+
+        ## @var CheckpointFilePath
+        ## @brief The path to the checkpoint file.
+
+        ## @var XmlWriter
+        ## @brief The pXmlWriter object writing the side file.
+
+        ## @var LastCheckpointTime
+        ## @brief The time of the last checkpoint.
+
+        self.FilePath           = filePath
+        self.EventsFilePath     = getEventsFilePath(filePath)
+        self.CheckpointFilePath = getCheckpointFilePath(filePath)
+        self.XmlWriter          = pXmlWriter()
+        self.XmlWriter.openFile(self.EventsFilePath, 'w')
+        self.LastCheckpointTime = time.time()
+        logger.info('Streaming error events to %s...' % self.EventsFilePath)
+
+    ## @brief Append an error event to the side file.
+    ## @param self
+    #  The class instance.
+    ## @param errorEvent
+    #  The pErrorEvent object.
+
+    def writeErrorEvent(self, errorEvent):
+        writeXmlErrorEvent(self.XmlWriter, errorEvent)
+
+    ## @brief Append the content of the side file of another stream (e.g.
+    #  the one of a worker of a parallel run) to the side file.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the xml error file of the other stream.
+
+    def appendEvents(self, filePath):
+        self.XmlWriter.closeFile()
+        inputFile = file(getEventsFilePath(filePath), 'r')
+        outputFile = file(self.EventsFilePath, 'a')
+        shutil.copyfileobj(inputFile, outputFile)
+        outputFile.close()
+        inputFile.close()
+        self.XmlWriter.openFile(self.EventsFilePath, 'a')
+
+    ## @brief Sync the side file to disk and save the error handler counters
+    #  to the checkpoint file.
+    #
+    #  Nothing is done if the last checkpoint is more recent than
+    #  ERROR_CHECKPOINT_INTERVAL, unless force is True. The side file is
+    #  closed (i.e. flushed) and reopened in append mode around the sync.
+    ## @param self
+    #  The class instance.
+    ## @param errorHandler
+    #  The pErrorHandler object.
+    ## @param numProcessedEvents
+    #  The number of events processed so far.
+    ## @param force
+    #  Flag to force the checkpoint.
+
+    def checkpoint(self, errorHandler, numProcessedEvents, force = False):
+        if not force and\
+               (time.time() - self.LastCheckpointTime) < ERROR_CHECKPOINT_INTERVAL:
+            return
+        self.XmlWriter.closeFile()
+        descriptor = os.open(self.EventsFilePath, os.O_RDONLY)
+        os.fsync(descriptor)
+        os.close(descriptor)
+        self.XmlWriter.openFile(self.EventsFilePath, 'a')
+        content = errorHandler.getState()
+        content['NumProcessedEvents'] = numProcessedEvents
+        content['EventsFileSize'] = os.path.getsize(self.EventsFilePath)
+        tmpFilePath = '%s.%d.tmp' % (self.CheckpointFilePath, os.getpid())
+        outputFile = file(tmpFilePath, 'wb')
+        cPickle.dump(content, outputFile, cPickle.HIGHEST_PROTOCOL)
+        outputFile.flush()
+        os.fsync(outputFile.fileno())
+        outputFile.close()
+        os.rename(tmpFilePath, self.CheckpointFilePath)
+        self.LastCheckpointTime = time.time()
+
+    ## @brief Close the stream, write the xml error file and remove the side
+    #  files.
+    ## @param self
+    #  The class instance.
+    ## @param errorHandler
+    #  The pErrorHandler object.
+
+    def close(self, errorHandler):
+        self.XmlWriter.closeFile()
+        errorHandler.writeXmlOutput(self.FilePath, self.EventsFilePath)
+        removeSideFiles(self.FilePath)
+
+    ## @brief Close the side file without writing the xml error file.
+    #
+    #  The side file is kept (to be appended to another stream, see
+    #  appendEvents()), while the checkpoint file is removed.
+    ## @param self
+    #  The class instance.
+
+    def detach(self):
+        self.XmlWriter.closeFile()
+        if os.path.exists(self.CheckpointFilePath):
+            os.remove(self.CheckpointFilePath)
+
+
+## @brief Remove the side files of a given xml error file.
+## @param filePath
+#  The path to the xml error file.
+
+def removeSideFiles(filePath):
+    for sideFilePath in [getEventsFilePath(filePath),\
+                         getCheckpointFilePath(filePath)]:
+        if os.path.exists(sideFilePath):
+            os.remove(sideFilePath)
+
+## @brief Rebuild the xml error file from the last checkpoint of a
+#  crashed run.
+## @param filePath
+#  The path to the xml error file.
+
+def recover(filePath):
+    from pErrorHandler import pErrorHandler
+    checkpointFilePath = getCheckpointFilePath(filePath)
+    if not os.path.exists(checkpointFilePath):
+        sys.exit('Could not find %s. Abort.' % checkpointFilePath)
+    inputFile = file(checkpointFilePath, 'rb')
+    content = cPickle.load(inputFile)
+    inputFile.close()
+    errorHandler = pErrorHandler()
+    errorHandler.setState(content)
+    logger.info('Recovering %d processed events from %s...' %\
+                (errorHandler.NumProcessedEvents, checkpointFilePath))
+    errorHandler.writeXmlOutput(filePath, getEventsFilePath(filePath),\
+                                content['EventsFileSize'])
+    removeSideFiles(filePath)
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog error_file')
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.print_help()
+        parser.error('incorrect number of arguments')
+    recover(args[0])
@@ -0,0 +1,449 @@
+#! /bin/env python
+
+## @package pEventGenerator
+## @brief Synthetic EBF event generator writing ldf files.
+#
+#  The generator produces LAT events with a configurable occupancy of the
+#  sub-systems (TKR layer ends, CAL logs and ACD channels) and a
+#  configurable rate of injected errors, and writes them into an ldf file
+#  which can be processed by the pDataProcessor like any real run. It is
+#  meant to feed the benchmarks (see @ref pBenchmark), so that the
+#  throughput can be measured on the same, reproducible (i.e. seeded)
+#  input across different versions of the code.
+#
+#  Each event is written with the same nesting the LDF iterators used by
+#  the pDataProcessor walk through:
+#  - a LAT datagram (identity, length and datagram words);
+#  - a LAT contribution holding the EBF data (identity and length words);
+#  - an EBF event (LATp cell header, length, event summary and padding
+#    words), wrapping
+#  - one EBF contribution per source (the GEM, the 16 TEMs with the CAL and
+#    TKR data, the AEM), each one with the same four header words and
+#    padded to the EBF cell size.
+#
+#  All the identities and bit fields are defined by the constants at the
+#  top of this module. testEventGenerator.py decodes a generated file with
+#  the LDF bindings and checks the number of hits and errors against the
+#  ones written.
+#
+#  python pEventGenerator.py [options] -n <num events> -o <ldf file>
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pEventGenerator')
+
+import sys
+import time
+import struct
+import random
+
+## @brief The identities of the LAT datagram (first word of each event)
+#  and of the LAT contribution holding the EBF data.
+
+LAT_DATAGRAM_IDENTITY   = 0x00f10000
+EBF_IDENTITY            = 0x00f00000
+
+## @brief The datagram word fields (open and close reasons, sequence).
+
+DATAGRAM_OPEN_SHIFT     = 28
+DATAGRAM_CLOSE_SHIFT    = 24
+DATAGRAM_OPEN_START     = 0x1
+DATAGRAM_CLOSE_FULL     = 0x1
+DATAGRAM_SEQUENCE_MASK  = 0x00ffffff
+
+## @brief The size (in bytes) of the EBF cells the contributions are padded
+#  to, and of the EBF event and contribution headers.
+
+EBF_CELL_SIZE           = 32
+EBF_HEADER_SIZE         = 16
+
+## @brief The LATp cell header fields (the packet error codes are the ones
+#  of the LDF EBFcontribution class).
+
+LATP_SOURCE_SHIFT       = 8
+LATP_ERROR_SHIFT        = 0
+LATP_TRUNCATED          = 0x2
+
+## @brief The contribution sources (EBF_SOURCE is the source of the EBF
+#  event header).
+
+TEM_SOURCES             = range(16)
+GEM_SOURCE              = 16
+AEM_SOURCE              = 17
+EBF_SOURCE              = 31
+
+## @brief The event summary fields.
+
+SUMMARY_SEQUENCE_MASK   = 0x00007fff
+
+## @brief The detector geometry.
+
+NUM_TKR_LAYER_ENDS      = 36
+NUM_TKR_STRIPS          = 1536
+NUM_CAL_LAYERS          = 8
+NUM_CAL_COLUMNS         = 12
+NUM_ACD_CABLES          = 12
+NUM_ACD_CHANNELS        = 18
+
+## @brief The bit widths of the TKR hit list fields.
+
+TKR_NUM_HITS_BITS       = 6
+TKR_STRIP_BITS          = 12
+TKR_TOT_BITS            = 8
+
+## @brief The ACD header and PHA fields.
+
+ACD_HEADER_START_FLAG   = 0x80000000
+ACD_HEADER_PARITY_SHIFT = 18
+ACD_PHA_PARITY_SHIFT    = 14
+ACD_PHA_RANGE_SHIFT     = 12
+ACD_PHA_MORE_FLAG       = 0x8000
+
+## @brief The error types which can be injected.
+
+INJECTED_ERRORS = ['acd_header_parity', 'acd_pha_parity',
+                   'acd_pha_inconsistency', 'truncated_contribution']
+
+## @brief The number of GEM clock ticks between two events (on average).
+
+GEM_TICKS_PER_EVENT     = 10000
+
+
+## @brief Return the parity bit making the total number of set bits odd.
+## @param value
+#  The value.
+
+def getOddParity(value):
+    numBits = 0
+    while value:
+        numBits += value & 0x1
+        value >>= 1
+    return int(numBits % 2 == 0)
+
+## @brief Pack a list of (value, number of bits) fields (most significant
+#  bit first) into a big-endian string, padded to the next 32-bit word.
+## @param fields
+#  The list of fields.
+
+def packBits(fields):
+    words = []
+    current = 0
+    numBits = 0
+    for (value, width) in fields:
+        current = (current << width) | (value & ((1 << width) - 1))
+        numBits += width
+        while numBits >= 32:
+            numBits -= 32
+            words.append((current >> numBits) & 0xffffffff)
+            current &= (1 << numBits) - 1
+    if numBits:
+        words.append((current << (32 - numBits)) & 0xffffffff)
+    return struct.pack('!%dL' % len(words), *words)
+
+
+## @brief The synthetic event generator implementation.
+
+class pEventGenerator:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param tkrOccupancy
+    #  The probability for a TKR layer end to be read out.
+    ## @param calOccupancy
+    #  The probability for a CAL log to be read out.
+    ## @param acdOccupancy
+    #  The probability for an ACD channel to be read out.
+    ## @param errorRate
+    #  The fraction of events with one injected error.
+    ## @param seed
+    #  The seed of the random number generator.
+
+    def __init__(self, tkrOccupancy = 0.05, calOccupancy = 0.02,
+                 acdOccupancy = 0.05, errorRate = 0.0, seed = 0):
+
+        ## @var TkrOccupancy
+        ## @brief The probability for a TKR layer end to be read out.
+
+        ## @var TkrMeanHits
+        ## @brief The average number of strips per TKR layer end read out.
+
+        ## @var CalOccupancy
+        ## @brief The probability for a CAL log to be read out.
+
+        ## @var AcdOccupancy
+        ## @brief The probability for an ACD channel to be read out.
+
+        ## @var ErrorRate
+        ## @brief The fraction of events with one injected error.
+
+        ## @var Random
+        ## @brief The random number generator.
+
+        ## @var GemTime
+        ## @brief The GEM clock counter (incremented event by event).
+
+        ## @var InjectedErrorsDict
+        ## @brief The dictionary of the number of injected errors, indexed
+        #  by error type (see INJECTED_ERRORS).
+
+        ## @var NumTkrStrips
+        ## @brief The number of TKR strips written.
+
+        ## @var NumCalLogs
+        ## @brief The number of CAL logs written.
+
+        ## @var NumAcdPhas
+        ## @brief The number of ACD PHA values written.
+
+        self.TkrOccupancy = tkrOccupancy
+        self.TkrMeanHits  = 3.0
+        self.CalOccupancy = calOccupancy
+        self.AcdOccupancy = acdOccupancy
+        self.ErrorRate    = errorRate
+        self.Random       = random.Random(seed)
+        self.GemTime      = 0
+        self.InjectedErrorsDict = dict([(error, 0) for error in\
+                                        INJECTED_ERRORS])
+        self.NumTkrStrips = 0
+        self.NumCalLogs   = 0
+        self.NumAcdPhas   = 0
+
+    ## @brief Return the next event (as a string).
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event (sequence) number.
+
+    def getEvent(self, eventNumber):
+        if self.Random.random() < self.ErrorRate:
+            error = self.Random.choice(INJECTED_ERRORS)
+            self.InjectedErrorsDict[error] += 1
+        else:
+            error = None
+        self.GemTime += int(self.Random.expovariate(1.0/GEM_TICKS_PER_EVENT))
+        temContributions = []
+        tkrVector = 0
+        calVector = 0
+        for source in TEM_SOURCES:
+            (calData, numLogs) = self.__getCALData()
+            (tkrData, numLayerEnds) = self.__getTKRData()
+            if numLayerEnds >= 6:
+                tkrVector |= (1 << source)
+            if numLogs:
+                calVector |= (1 << source)
+            temContributions.append(self.__getContribution(source,\
+                eventNumber, calData + tkrData))
+        (aemData, tileList) = self.__getAEMData(error)
+        contributions = [self.__getContribution(GEM_SOURCE, eventNumber,\
+            self.__getGEMData(tkrVector, calVector, tileList))]
+        contributions += temContributions
+        contributions.append(self.__getContribution(AEM_SOURCE, eventNumber,\
+                                                    aemData))
+        if error == 'truncated_contribution':
+            index = self.Random.randrange(len(contributions))
+            contribution = contributions[index]
+            (header, ) = struct.unpack('!L', contribution[:4])
+            contributions[index] = struct.pack('!L', header |\
+                (LATP_TRUNCATED << LATP_ERROR_SHIFT)) + contribution[4:]
+        ebfEvent = self.__getContribution(EBF_SOURCE, eventNumber,\
+                                          ''.join(contributions))
+        ebfData = struct.pack('!LL', EBF_IDENTITY, len(ebfEvent) + 8) +\
+                  ebfEvent
+        datagramWord = (DATAGRAM_OPEN_START << DATAGRAM_OPEN_SHIFT) |\
+                       (DATAGRAM_CLOSE_FULL << DATAGRAM_CLOSE_SHIFT) |\
+                       (eventNumber & DATAGRAM_SEQUENCE_MASK)
+        return struct.pack('!LLL', LAT_DATAGRAM_IDENTITY, len(ebfData) + 12,\
+                           datagramWord) + ebfData
+
+    ## @brief Return an EBF contribution (header, length, summary and
+    #  padding words followed by the payload, padded to the cell size).
+    #
+    #  The EBF event wrapping the contributions has the same layout.
+    ## @param self
+    #  The class instance.
+    ## @param source
+    #  The contribution source.
+    ## @param eventNumber
+    #  The event (sequence) number.
+    ## @param payload
+    #  The payload string.
+
+    def __getContribution(self, source, eventNumber, payload):
+        length = EBF_HEADER_SIZE + len(payload)
+        padding = (-length) % EBF_CELL_SIZE
+        summary = (eventNumber & SUMMARY_SEQUENCE_MASK)
+        return struct.pack('!LLLL', (source << LATP_SOURCE_SHIFT),\
+                           length + padding, summary, 0) + payload +\
+                           '\x00'*padding
+
+    ## @brief Return the GEM payload.
+    ## @param self
+    #  The class instance.
+    ## @param tkrVector
+    #  The TKR trigger vector (one bit per tower).
+    ## @param calVector
+    #  The CAL low energy trigger vector (one bit per tower).
+    ## @param tileList
+    #  The list of the (cable, channel) ACD hits.
+
+    def __getGEMData(self, tkrVector, calVector, tileList):
+        tiles = [0, 0, 0, 0]
+        for (cable, channel) in tileList:
+            tiles[cable % 4] |= (1 << ((cable*NUM_ACD_CHANNELS + channel) % 32))
+        roiVector = tkrVector & calVector
+        conditionSummary = int(tkrVector != 0) | (int(calVector != 0) << 1) |\
+                           (int(roiVector != 0) << 3)
+        ticks = self.GemTime & 0x01ffffff
+        words = tiles + [(tkrVector << 16) | roiVector,
+                         (calVector << 16),
+                         (conditionSummary << 16),
+                         0,
+                         self.GemTime & 0xffffffff,
+                         0,
+                         0,
+                         0,
+                         0,
+                         ticks,
+                         ticks & 0xffff0000,
+                         GEM_TICKS_PER_EVENT & 0xffff]
+        return struct.pack('!%dL' % len(words), *words)
+
+    ## @brief Return a (CAL payload, number of logs) tuple for one tower.
+    ## @param self
+    #  The class instance.
+
+    def __getCALData(self):
+        masks = []
+        logs = []
+        for layer in range(NUM_CAL_LAYERS):
+            mask = 0
+            for column in range(NUM_CAL_COLUMNS):
+                if self.Random.random() < self.CalOccupancy:
+                    mask |= (1 << column)
+                    faces = []
+                    for face in range(2):
+                        calRange = self.Random.randrange(4)
+                        adc = self.Random.randrange(4096)
+                        faces.append((calRange << 12) | adc)
+                    logs.append((column << 28) | (faces[0] << 14) | faces[1])
+            masks.append(mask)
+        words = [(masks[i] << 16) | masks[i + 1] for i in\
+                 range(0, NUM_CAL_LAYERS, 2)] + logs
+        self.NumCalLogs += len(logs)
+        return (struct.pack('!%dL' % len(words), *words), len(logs))
+
+    ## @brief Return a (TKR payload, number of layer ends) tuple for one
+    #  tower.
+    ## @param self
+    #  The class instance.
+
+    def __getTKRData(self):
+        accept = 0
+        hitLists = []
+        for layerEnd in range(NUM_TKR_LAYER_ENDS):
+            if self.Random.random() < self.TkrOccupancy:
+                accept |= (1 << layerEnd)
+                numHits = min(1 + int(self.Random.expovariate(\
+                    1.0/self.TkrMeanHits)), (1 << TKR_NUM_HITS_BITS) - 1)
+                first = self.Random.randrange(NUM_TKR_STRIPS - numHits)
+                hitLists.append(range(first, first + numHits))
+        fields = [(accept >> 32, 32), (accept & 0xffffffff, 32)]
+        for hits in hitLists:
+            fields.append((len(hits), TKR_NUM_HITS_BITS))
+            fields += [(hit, TKR_STRIP_BITS) for hit in hits]
+        for hits in hitLists:
+            fields.append((self.Random.randrange(1 << TKR_TOT_BITS),\
+                           TKR_TOT_BITS))
+            self.NumTkrStrips += len(hits)
+        return (packBits(fields), len(hitLists))
+
+    ## @brief Return a (AEM payload, list of (cable, channel) hits) tuple.
+    ## @param self
+    #  The class instance.
+    ## @param error
+    #  The error to be injected (None if no error).
+
+    def __getAEMData(self, error):
+        data = ''
+        tileList = []
+        for cable in range(NUM_ACD_CABLES):
+            channels = [channel for channel in range(NUM_ACD_CHANNELS) if\
+                        self.Random.random() < self.AcdOccupancy]
+            if error in ['acd_pha_parity', 'acd_pha_inconsistency'] and\
+                   cable == 0 and not channels:
+                channels = [0]
+            acceptMap = 0
+            for channel in channels:
+                acceptMap |= (1 << (NUM_ACD_CHANNELS - 1 - channel))
+                tileList.append((cable, channel))
+            header = ACD_HEADER_START_FLAG | acceptMap
+            header |= getOddParity(header) << ACD_HEADER_PARITY_SHIFT
+            if error == 'acd_header_parity' and cable == 0:
+                header ^= (1 << ACD_HEADER_PARITY_SHIFT)
+            if error == 'acd_pha_inconsistency' and cable == 0 and\
+                   len(channels) < NUM_ACD_CHANNELS:
+                channels.append([channel for channel in\
+                                 range(NUM_ACD_CHANNELS) if channel not in\
+                                 channels][0])
+            phas = []
+            for channel in channels:
+                pha = (self.Random.randrange(2) << ACD_PHA_RANGE_SHIFT) |\
+                      self.Random.randrange(4096)
+                pha |= getOddParity(pha) << ACD_PHA_PARITY_SHIFT
+                phas.append(pha)
+            if error == 'acd_pha_parity' and cable == 0:
+                phas[0] ^= (1 << ACD_PHA_PARITY_SHIFT)
+            for i in range(len(phas) - 1):
+                phas[i] |= ACD_PHA_MORE_FLAG
+            self.NumAcdPhas += len(phas)
+            data += struct.pack('!L', header)
+            if phas:
+                data += struct.pack('!%dH' % len(phas), *phas)
+        data += '\x00'*((-len(data)) % 4)
+        return (data, tileList)
+
+    ## @brief Write a given number of events into an ldf file.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the output file.
+    ## @param numEvents
+    #  The number of events.
+
+    def writeFile(self, filePath, numEvents):
+        logger.info('Writing %d synthetic events to %s...' %\
+                    (numEvents, filePath))
+        startTime = time.time()
+        outputFile = file(filePath, 'wb')
+        for eventNumber in xrange(numEvents):
+            outputFile.write(self.getEvent(eventNumber))
+        outputFile.close()
+        logger.info('Done in %.2f s (%d injected errors).' %\
+                    (time.time() - startTime,\
+                     sum(self.InjectedErrorsDict.values())))
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options]')
+    parser.add_option('-n', '--num-events', dest = 'n', type = 'int',
+                      default = 10000, help = 'number of events')
+    parser.add_option('-o', '--output-file', dest = 'o', default = None,
+                      help = 'path to the output ldf file')
+    parser.add_option('--tkr', dest = 'tkr', type = 'float', default = 0.05,
+                      help = 'TKR layer end occupancy')
+    parser.add_option('--cal', dest = 'cal', type = 'float', default = 0.02,
+                      help = 'CAL log occupancy')
+    parser.add_option('--acd', dest = 'acd', type = 'float', default = 0.05,
+                      help = 'ACD channel occupancy')
+    parser.add_option('--errors', dest = 'errors', type = 'float',
+                      default = 0.0, help = 'fraction of events with errors')
+    parser.add_option('--seed', dest = 'seed', type = 'int', default = 0,
+                      help = 'seed of the random number generator')
+    (options, args) = parser.parse_args()
+    if options.o is None:
+        parser.error('the -o option is mandatory.')
+    generator = pEventGenerator(options.tkr, options.cal, options.acd,
+                                options.errors, options.seed)
+    generator.writeFile(options.o, options.n)
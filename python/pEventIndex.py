@@ -0,0 +1,339 @@
+#! /bin/env python
+
+## @package pEventIndex
+## @brief Byte-offset event index for ldf and evt files.
+#
+#  The index maps the event number (i.e. the position of the event in the
+#  input file) onto the file offset, the length and the time stamp of the
+#  event. It is persisted in a sidecar file next to the data file, so that
+#  the events can be accessed randomly (e.g. for sharding the input file,
+#  jumping to a given event or bisecting a bad event) without a full
+#  sequential scan.
+#
+#  The sidecar file also stores the size and the modification time of the
+#  data file and is automatically invalidated when the latter changes.
+#
+#  The index is built either by the pDataProcessor on the first full pass
+#  over the data file or by running this module as a standalone script.
+#  In both cases the time stamps are the event_timestamp values filled in
+#  the FastMon tree: for evt files the standalone scan evaluates them with
+#  the same pEvtMetaContextProcessor code the pDataProcessor runs, while
+#  ldf files carry no time stamp and the index stores 0 for all the events.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pEventIndex')
+
+import os
+import sys
+import time
+import numpy
+
+from pLDFReader import pLDFReader
+
+INDEX_FILE_SUFFIX      = '.index.npz'
+INDEXED_FILE_TYPES     = ['ldf', 'evt']
+TIMESTAMPED_FILE_TYPES = ['evt']
+
+
+## @brief Implementation of the event index.
+
+class pEventIndex:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param dataFilePath
+    #  The path to the (ldf or evt) data file.
+
+    def __init__(self, dataFilePath):
+
+        ## @var DataFilePath
+        ## @brief The path to the data file.
+
+        ## @var IndexFilePath
+        ## @brief The path to the sidecar index file.
+
+        ## @var FileType
+        ## @brief The data file type (i.e. the file extension).
+
+        ## @var Offsets
+        ## @brief The numpy array of the event offsets (in bytes).
+
+        ## @var Lengths
+        ## @brief The numpy array of the event lengths (in bytes).
+
+        ## @var Timestamps
+        ## @brief The numpy array of the event time stamps.
+        #
+        #  The time stamps are the event_timestamp values, no matter how the
+        #  index is built; they are not available (i.e. set to 0) for the
+        #  file types not in TIMESTAMPED_FILE_TYPES.
+
+        self.DataFilePath  = dataFilePath
+        self.IndexFilePath = '%s%s' % (dataFilePath, INDEX_FILE_SUFFIX)
+        self.FileType      = dataFilePath.split('.')[-1]
+        self.reset()
+
+    ## @brief Reset the index (and prepare it for being filled through the
+    #  addEvent() method).
+    ## @param self
+    #  The class instance.
+
+    def reset(self):
+        self.Offsets    = None
+        self.Lengths    = None
+        self.Timestamps = None
+        self.__OffsetsList    = []
+        self.__LengthsList    = []
+        self.__TimestampsList = []
+
+    ## @brief Add an event to the index.
+    #
+    #  Events must be added in order and the index is not usable until the
+    #  commit() method is called.
+    ## @param self
+    #  The class instance.
+    ## @param offset
+    #  The event offset in the data file.
+    ## @param length
+    #  The event length.
+    ## @param timestamp
+    #  The event time stamp (i.e. the event_timestamp value, ignored for
+    #  the file types without time stamps).
+
+    def addEvent(self, offset, length, timestamp):
+        if not self.hasTimestamps():
+            timestamp = 0
+        self.__OffsetsList.append(offset)
+        self.__LengthsList.append(length)
+        self.__TimestampsList.append(timestamp)
+
+    ## @brief Convert the lists filled by addEvent() into numpy arrays.
+    ## @param self
+    #  The class instance.
+
+    def commit(self):
+        self.Offsets    = numpy.array(self.__OffsetsList, 'int64')
+        self.Lengths    = numpy.array(self.__LengthsList, 'int64')
+        self.Timestamps = numpy.array(self.__TimestampsList, 'float64')
+        self.__OffsetsList    = []
+        self.__LengthsList    = []
+        self.__TimestampsList = []
+
+    ## @brief Return True if the event time stamps are available for the
+    #  data file type.
+    ## @param self
+    #  The class instance.
+
+    def hasTimestamps(self):
+        return self.FileType in TIMESTAMPED_FILE_TYPES
+
+    ## @brief Return True if the index is filled.
+    ## @param self
+    #  The class instance.
+
+    def isFilled(self):
+        return self.Offsets is not None
+
+    ## @brief Return a numpy array (file size, modification time) identifying
+    #  the current version of the data file.
+    ## @param self
+    #  The class instance.
+
+    def getDataFileSignature(self):
+        stat = os.stat(self.DataFilePath)
+        return numpy.array([stat.st_size, int(stat.st_mtime)], 'int64')
+
+    ## @brief Read the index from the sidecar file.
+    #
+    #  Return False if the sidecar file does not exist or if it's out of
+    #  date with respect to the data file.
+    ## @param self
+    #  The class instance.
+
+    def read(self):
+        if not os.path.exists(self.IndexFilePath):
+            return False
+        indexFile = numpy.load(self.IndexFilePath)
+        signature = indexFile['signature']
+        if not (signature == self.getDataFileSignature()).all():
+            indexFile.close()
+            logger.info('Event index %s out of date.' % self.IndexFilePath)
+            return False
+        self.Offsets    = indexFile['offsets']
+        self.Lengths    = indexFile['lengths']
+        self.Timestamps = indexFile['timestamps']
+        indexFile.close()
+        logger.info('Event index read from %s (%d events).' %\
+                    (self.IndexFilePath, self.getNumEvents()))
+        return True
+
+    ## @brief Write the index to the sidecar file.
+    #
+    #  The file is written under a temporary name and then renamed, so that
+    #  concurrent jobs never see a partially written index.
+    ## @param self
+    #  The class instance.
+
+    def write(self):
+        if not self.isFilled():
+            self.commit()
+        logger.info('Writing event index %s (%d events)...' %\
+                    (self.IndexFilePath, self.getNumEvents()))
+        tmpFilePath = '%s.%d.tmp' % (self.IndexFilePath, os.getpid())
+        try:
+            tmpFile = file(tmpFilePath, 'wb')
+            numpy.savez(tmpFile, signature = self.getDataFileSignature(),
+                        offsets = self.Offsets, lengths = self.Lengths,
+                        timestamps = self.Timestamps)
+            tmpFile.close()
+            os.rename(tmpFilePath, self.IndexFilePath)
+        except (IOError, OSError), e:
+            logger.warn('Could not write event index (%s).' % e)
+
+    ## @brief Build the index by scanning the data file.
+    ## @param self
+    #  The class instance.
+
+    def build(self):
+        logger.info('Building event index for %s...' % self.DataFilePath)
+        startTime = time.time()
+        self.reset()
+        if self.FileType == 'ldf':
+            self.__scanLDFFile()
+        elif self.FileType == 'evt':
+            self.__scanEvtFile()
+        else:
+            sys.exit('Cannot index %s files.' % self.FileType)
+        self.commit()
+        logger.info('%d events indexed in %.2f s.' %\
+                    (self.getNumEvents(), time.time() - startTime))
+
+    ## @brief Scan a ldf file (only the event headers are decoded).
+    ## @param self
+    #  The class instance.
+
+    def __scanLDFFile(self):
+        ldfReader = pLDFReader(self.DataFilePath)
+        offset = ldfReader.tell()
+        while ldfReader.skipEvent():
+            self.addEvent(offset, ldfReader.tell() - offset, 0)
+            offset = ldfReader.tell()
+        ldfReader.close()
+
+    ## @brief Scan an evt file.
+    #
+    #  The time stamps are calculated by a pEvtMetaContextProcessor (that
+    #  does not fill any tree) exactly as in the pDataProcessor event loop.
+    ## @param self
+    #  The class instance.
+
+    def __scanEvtFile(self):
+        from eventFile import LSEReader
+        from pEvtMetaContextProcessor import pEvtMetaContextProcessor
+        from pEvtMetaContextProcessor import getEvtMeta
+        metaProcessor = pEvtMetaContextProcessor(None, None)
+        evtReader = LSEReader(self.DataFilePath)
+        offset = evtReader.tell()
+        evt = evtReader.nextEvent()
+        while not evt.isNull():
+            nextOffset = evtReader.tell()
+            self.addEvent(offset, nextOffset - offset,
+                          metaProcessor.calculateTimeStamp(getEvtMeta(evt),
+                                                           evt.ctx()))
+            offset = nextOffset
+            evt = evtReader.nextEvent()
+
+    ## @brief Read the index from the sidecar file or, if not available,
+    #  build it and write it to the sidecar file.
+    ## @param self
+    #  The class instance.
+
+    def load(self):
+        if not self.read():
+            self.build()
+            self.write()
+
+    ## @brief Return the number of events in the index.
+    ## @param self
+    #  The class instance.
+
+    def getNumEvents(self):
+        return len(self.Offsets)
+
+    ## @brief Return the offset of a given event.
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event number.
+
+    def getOffset(self, eventNumber):
+        return int(self.Offsets[eventNumber])
+
+    ## @brief Return the length of a given event.
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event number.
+
+    def getLength(self, eventNumber):
+        return int(self.Lengths[eventNumber])
+
+    ## @brief Return the time stamp of a given event.
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event number.
+
+    def getTimestamp(self, eventNumber):
+        return float(self.Timestamps[eventNumber])
+
+    ## @brief Return the number of the first event whose time stamp is
+    #  larger than or equal to a given time stamp.
+    ## @param self
+    #  The class instance.
+    ## @param timestamp
+    #  The time stamp.
+
+    def getEventNumber(self, timestamp):
+        if not self.hasTimestamps():
+            sys.exit('No time stamps in the index of %s files. Abort.' %\
+                     self.FileType)
+        return int(numpy.searchsorted(self.Timestamps, timestamp))
+
+    ## @brief Return the raw data of a given event (ldf files only).
+    ## @param self
+    #  The class instance.
+    ## @param eventNumber
+    #  The event number.
+
+    def readEvent(self, eventNumber):
+        ldfReader = pLDFReader(self.DataFilePath)
+        ldfReader.seek(self.getOffset(eventNumber))
+        event = ldfReader.readEvent()
+        ldfReader.close()
+        return event
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options] data_file(s)')
+    parser.add_option('-f', '--force', dest = 'f',
+                      default = False, action = 'store_true',
+                      help = 'rebuild the index even if up to date')
+    parser.add_option('-e', '--event', dest = 'e',
+                      default = None, type = int,
+                      help = 'print the index entry for a given event')
+    (opts, args) = parser.parse_args()
+    if not len(args):
+        parser.print_help()
+        parser.error('Please provide at least one input data file.')
+    for filePath in args:
+        index = pEventIndex(filePath)
+        if opts.f or not index.read():
+            index.build()
+            index.write()
+        if opts.e is not None:
+            print 'Event %d: offset = %d, length = %d, timestamp = %f' %\
+                  (opts.e, index.getOffset(opts.e), index.getLength(opts.e),
+                   index.getTimestamp(opts.e))
@@ -3,11 +3,29 @@
 
 from copy      import copy
 from pGlobals  import *
+from eventFile import LSE_Info
 import math
 
 #To run locally, needs the appropriate setup
 from ISOC.ProductUtils import ProductSpan
 
+## @brief Return the meta event of an evt event, according to its info type
+#  (None if the info type is unknown).
+## @param evt
+#  The evt event.
+
+def getEvtMeta(evt):
+    if evt.infotype() == LSE_Info.LPA:
+        return evt.pinfo()
+    elif evt.infotype() == LSE_Info.LCI_ACD:
+        return evt.ainfo()
+    elif evt.infotype() == LSE_Info.LCI_CAL:
+        return evt.cinfo()
+    elif evt.infotype() == LSE_Info.LCI_TKR:
+        return evt.tinfo()
+    return None
+
+
 ## @brief Class to handle the evt meta context event.
 #
 #  The meta event contains some usefull information about the context
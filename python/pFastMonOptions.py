@@ -0,0 +1,101 @@
+## @package pFastMonOptions
+## @brief Additional command line options for the FastMon scripts.
+#
+#  The standard command line options are handled by the pOptionParser class
+#  (in the Common package), which only supports a fixed set of single-letter
+#  switches. The FastMon-specific options defined here are stripped from
+#  the argument list before the latter is handed over to pOptionParser.
+
+import sys
+
+
+## @brief Dictionary of the additional options, indexed by name.
+#
+#  Each entry is a (short flag, long flag, type, default value) tuple.
+#  Options of type bool are switches not taking any value.
+
+FASTMON_OPTIONS_DICT = {
+    'NumWorkers': ('-j', '--jobs', int, 1),
+    'FirstEvent': ('-f', '--first-event', int, 0),
+    'StreamHistograms': ('-H', '--stream-histograms', bool, False),
+    'SkipTree': ('-T', '--skip-tree', bool, False),
+    'ErrorStore': ('-b', '--error-store', bool, False),
+    'StreamErrors': ('-E', '--stream-errors', bool, False),
+    'M7RefreshInterval': ('-R', '--m7-refresh', float, 5.0),
+    'M7Interpolation': ('-I', '--m7-interpolation', str, 'none'),
+    'SAAGrid': ('-G', '--saa-grid', bool, False),
+    'GeomagTimeline': ('-g', '--geomag-timeline', bool, False),
+    'Profile': ('-P', '--profile', str, None)
+    }
+
+
+## @brief Class parsing the additional command line options.
+#
+#  For each entry of FASTMON_OPTIONS_DICT a class member with the same name
+#  is created, holding the value of the option.
+
+class pFastMonOptions:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param argv
+    #  The argument list (modified in place).
+
+    def __init__(self, argv = sys.argv):
+        for (name, (shortFlag, longFlag, optionType, default)) in\
+                FASTMON_OPTIONS_DICT.items():
+            setattr(self, name, default)
+        i = 1
+        while i < len(argv):
+            option = self.__getOption(argv[i])
+            if option is None:
+                i += 1
+                continue
+            (name, optionType, value) = option
+            del argv[i]
+            if optionType is bool:
+                value = True
+            elif value is None:
+                if i == len(argv):
+                    sys.exit('Option %s requires an argument.' % name)
+                value = argv.pop(i)
+            try:
+                setattr(self, name, optionType(value))
+            except ValueError:
+                sys.exit('Invalid value "%s" for option %s.' % (value, name))
+
+    ## @brief Return the (name, type, value) tuple for a given command line
+    #  argument, or None if the argument is not one of the additional
+    #  options.
+    #
+    #  The value is None unless it is passed along with the flag in the
+    #  "--flag=value" form.
+    ## @param self
+    #  The class instance.
+    ## @param arg
+    #  The command line argument.
+
+    def __getOption(self, arg):
+        for (name, (shortFlag, longFlag, optionType, default)) in\
+                FASTMON_OPTIONS_DICT.items():
+            if arg in (shortFlag, longFlag):
+                return (name, optionType, None)
+            if arg.startswith('%s=' % longFlag):
+                return (name, optionType, arg.split('=', 1)[1])
+        return None
+
+    ## @brief Class representation.
+    ## @param self
+    #  The class instance.
+
+    def __str__(self):
+        text = ''
+        for name in FASTMON_OPTIONS_DICT.keys():
+            text += '%-16s: %s\n' % (name, getattr(self, name))
+        return text
+
+
+
+if __name__ == '__main__':
+    print pFastMonOptions(['test', '-j', '4', 'input.evt'])
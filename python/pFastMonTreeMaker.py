@@ -2,14 +2,74 @@
 import pSafeLogger
 logger = pSafeLogger.getLogger('pFastMonTreeMaker')
 
+import numpy
+
 from pBaseTreeMaker import pBaseTreeMaker
 
 
 FAST_MON_TREE_NAME = 'IsocDataTree'
 
+## @brief The alignment (in bytes) of the variables within the event record.
+
+RECORD_ALIGNMENT = 8
+
 class pFastMonTreeMaker(pBaseTreeMaker):
 
     def __init__(self, dataProcessor):
+
+        ## @var Record
+        ## @brief The contiguous buffer holding the values of all the tree
+        #  variables for the current event.
+        #
+        #  The numpy array of each pRootTreeVariable is a view into this
+        #  buffer, so that the tree branches and the iterators keep on
+        #  accessing the variables as before.
+
+        ## @var ResetRecord
+        ## @brief The leading slice of Record holding the variables which
+        #  are reset at each event.
+
+        self.__packVariables(dataProcessor.XmlParser.EnabledVariablesDict.\
+                             values())
         pBaseTreeMaker.__init__(self, dataProcessor.XmlParser,\
                                 dataProcessor.OutputFilePath ,\
                                 FAST_MON_TREE_NAME)
+
+    ## @brief Move the arrays of the tree variables into one contiguous
+    #  buffer.
+    #
+    #  This has to be done before the tree branches are created. The
+    #  variables to be reset at each event are packed at the beginning of
+    #  the buffer, so that they are all reset with a single call.
+    ## @param self
+    #  The class instance.
+    ## @param variables
+    #  The list of pRootTreeVariable objects.
+
+    def __packVariables(self, variables):
+        variables = sorted(variables, key = lambda var:\
+                           (not var.Reset, var.getName()))
+        offsets = []
+        size = 0
+        resetSize = 0
+        for variable in variables:
+            offsets.append(size)
+            size += variable.Array.nbytes
+            size += -size % RECORD_ALIGNMENT
+            if variable.Reset:
+                resetSize = size
+        self.Record = numpy.zeros(size, 'uint8')
+        self.ResetRecord = self.Record[:resetSize]
+        for (variable, offset) in zip(variables, offsets):
+            array = self.Record[offset:offset + variable.Array.nbytes]
+            variable.Array = array.view(variable.Array.dtype).\
+                             reshape(variable.Array.shape)
+        logger.debug('%d variables packed in a %d-byte record.' %\
+                     (len(variables), size))
+
+    ## @brief Reset the variables to be reset at each event.
+    ## @param self
+    #  The class instance.
+
+    def resetVariables(self):
+        self.ResetRecord.fill(0)
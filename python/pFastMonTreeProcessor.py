@@ -6,9 +6,11 @@ logger = pSafeLogger.getLogger('pFastMonTreeProcessor')
 from pBaseTreeProcessor   import pBaseTreeProcessor
 from pFastMonTreeMaker    import FAST_MON_TREE_NAME
 from pCustomPlotter       import pCustomPlotter
+from pHistogramPlanner    import pHistogramPlanner
 from pRootFileManager     import pRootFileManager
 from pBaseReportGenerator import pBaseReportGenerator
 from pXmlParser           import pXmlParser
+from pSafeROOT            import ROOT
 
 import time
 
@@ -16,10 +18,24 @@ import time
 class pFastMonTreeProcessor(pBaseTreeProcessor):
 
     def __init__(self, xmlParser, inputFilePath, outputFilePath = None):
+
+        ## @var StreamingHistogrammer
+        ## @brief The pStreamingHistogrammer object which filled (part of)
+        #  the plots during the event loop (None if the streaming mode is
+        #  not enabled).
+
+        ## @var SkipTree
+        ## @brief Flag set when the ROOT tree has not been filled.
+
         pBaseTreeProcessor.__init__(self, xmlParser, inputFilePath,\
                                     FAST_MON_TREE_NAME, outputFilePath)
+        self.StreamingHistogrammer = None
+        self.SkipTree = False
 
     def run(self):
+        if self.SkipTree:
+            self.writeStreamedObjects()
+            return
         logger.info('Processing the root tree and writing histograms...')
         startTime = time.time()
         self.open()
@@ -28,24 +44,77 @@ class pFastMonTreeProcessor(pBaseTreeProcessor):
         logger.info('Done in %.2f s.\n' % (time.time() - startTime))
         self.CustomPlotter.cleanup()
         self.close()
+
+    ## @brief Return True if the ROOT objects of a plot have already been
+    #  filled during the event loop.
+    ## @param self
+    #  The class instance.
+    ## @param key
+    #  The key of the plot in the pXmlParser EnabledPlotRepsDict.
+
+    def isStreamed(self, key):
+        return self.StreamingHistogrammer is not None and\
+               self.StreamingHistogrammer.isStreamed(key)
+
+    ## @brief Write the plots filled during the event loop when the ROOT
+    #  tree is not available.
+    #
+    #  The plots which can only be created from the ROOT tree are skipped.
+    ## @param self
+    #  The class instance.
+
+    def writeStreamedObjects(self):
+        logger.info('Writing histograms...')
+        startTime = time.time()
+        outputFile = ROOT.TFile(self.OutputFilePath, 'RECREATE')
+        keys = self.XmlParser.EnabledPlotRepsDict.keys()
+        keys.sort()
+        for key in keys:
+            rep = self.XmlParser.EnabledPlotRepsDict[key]
+            if not self.isStreamed(key):
+                logger.warn('%s skipped (the ROOT tree is not available).' %\
+                            rep.getName())
+                continue
+            for object in rep.RootObjects.values():
+                object.SetDirectory(outputFile)
+                object.Write()
+        outputFile.Close()
+        logger.info('Done in %.2f s.\n' % (time.time() - startTime))
     
     ## @brief Create the ROOT objects defined in the enabled output lists
     #  of the xml configuration file.
+    #
+    #  The plots supported by the pHistogramPlanner are all filled at the
+    #  end in a single pass over the tree, while the others are created
+    #  by the plot representations themselves. The plots already filled
+    #  during the event loop (see @ref pStreamingHistogrammer) are only
+    #  attached to the output file.
     ## @param self
     #  The class instance.
     #
     ## Sorting the keys before creating the plots
 
     def createObjects(self):
+        planner = pHistogramPlanner(self.RootTree)
         keys = self.XmlParser.EnabledPlotRepsDict.keys()
-	keys.sort()
-	for key in keys:
-	    rep = self.XmlParser.EnabledPlotRepsDict[key]
+        keys.sort()
+        for key in keys:
+            rep = self.XmlParser.EnabledPlotRepsDict[key]
+            if self.isStreamed(key):
+                for object in rep.RootObjects.values():
+                    object.SetDirectory(ROOT.gDirectory)
+                logger.debug('%s filled during the event loop.' %\
+                             rep.getName())
+                continue
             logger.debug('%s processing.' % rep.getName())
-	    if rep.__class__.__name__ == 'pCUSTOMXmlRep':
+            if rep.__class__.__name__ == 'pCUSTOMXmlRep':
                 rep.setPlotter(self.CustomPlotter)
-            rep.createRootObjects(self.RootTree)
-            logger.debug('%s done.' % rep.getName())
+            if planner.addPlotRep(rep):
+                logger.debug('%s planned.' % rep.getName())
+            else:
+                rep.createRootObjects(self.RootTree)
+                logger.debug('%s done.' % rep.getName())
+        planner.fill()
 
 
 
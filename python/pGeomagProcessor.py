@@ -6,6 +6,43 @@ from IGRF        import IGRF
 import pSafeLogger
 logger = pSafeLogger.getLogger('pGeomagProcessor')
 
+import numpy
+
+from pSCPosition import getEarthCoordinatesFromMET, EARTH_RADIUS
+
+## @brief The (tree variable, IGRF data member) pairs of the geomagnetic
+#  quantities.
+
+GEOMAG_VARIABLES = [('geomagnetic_cutoff'           , 'RigidityCutoff'),
+                    ('geomagnetic_bb0'              , 'BB0'),
+                    ('geomagnetic_InvariantLambda'  , 'InvariantLambda'),
+                    ('geomagnetic_InvariantLatitude', 'InvariantLatitude'),
+                    ('geomagnetic_InvariantRadius'  , 'InvariantRadius'),
+                    ('geomagnetic_McIlwainL'        , 'McIlwainL')]
+
+## @brief The tree variables filled by pGeomagProcessor.process().
+
+PROCESSED_VARIABLES = ['spacecraft_orbit_mode', 'spacecraft_orbit_inSAA',
+                       'spacecraft_latitude', 'spacecraft_longitude',
+                       'spacecraft_altitude', 'spacecraft_distance_to_saa',
+                       'spacecraft_pitch', 'spacecraft_roll',
+                       'spacecraft_yaw', 'spacecraft_rock',
+                       'spacecraft_xra', 'spacecraft_xdec',
+                       'spacecraft_yra', 'spacecraft_ydec',
+                       'spacecraft_zra', 'spacecraft_zdec',
+                       'spacecraft_zgalL', 'spacecraft_zgalB',
+                       'spacecraft_earthlimb', 'spacecraft_earthlimb_fov'] +\
+                      [varName for (varName, memberName) in GEOMAG_VARIABLES]
+
+## @brief The time step (in seconds) of the geomagnetic timeline.
+
+GEOMAG_TIMELINE_BUCKET = 5.
+
+## @brief The number of buckets of the geomagnetic timeline evaluated
+#  together when a bucket which has not been evaluated yet is needed.
+
+GEOMAG_TIMELINE_CHUNK  = 12
+
 ## @brief The data processor implementation.
 #
 # from IGRF documentation
@@ -41,8 +78,45 @@ class pGeomagProcessor:
         ## @var FieldModel
         ## @brief The GeoMagnetic Field Model created using the IGRF library
 
+        ## @var TimelineStart
+        ## @brief The MET of the first bucket of the geomagnetic timeline.
+
+        ## @var TimelineBucket
+        ## @brief The time step of the geomagnetic timeline.
+
+        ## @var Timeline
+        ## @brief The (num buckets, len(GEOMAG_VARIABLES)) numpy array with
+        #  the geomagnetic quantities evaluated at the beginning of each MET
+        #  bucket (None if the timeline is not used).
+
+        ## @var TimelineFilled
+        ## @brief The numpy array of the flags marking the buckets of the
+        #  timeline which have been evaluated.
+
+        ## @var TimelineM7Parser
+        ## @brief The pM7Parser object the timeline is evaluated from.
+
+        ## @var TimelineInterpolation
+        ## @brief The interpolation method for the space craft positions of
+        #  the timeline.
+
+        ## @var LastSCPosition
+        ## @brief The pSCPosition object of the last call to process().
+
+        ## @var LastValues
+        ## @brief The list of the (variable name, value) pairs filled in the
+        #  last call to process().
+
         self.TreeMaker = treeMaker
         self.FieldModel = IGRF()
+        self.TimelineStart  = None
+        self.TimelineBucket = None
+        self.Timeline       = None
+        self.TimelineFilled = None
+        self.TimelineM7Parser      = None
+        self.TimelineInterpolation = None
+        self.LastSCPosition = None
+        self.LastValues     = []
 
     ## @brief Return the tree branch corresponding to the variable name
     ## @param self
@@ -54,11 +128,19 @@ class pGeomagProcessor:
         return self.TreeMaker.getVariable(varName)
 
     ## @brief Process the geomagnetic quantities of the IGRF model given a space craft position
+    #
+    #  If the space craft position is the same object of the previous call
+    #  (see pM7Parser.getSCPosition()) the variables are filled with the
+    #  values of that call, without evaluating anything.
     ## @param self
     #  The class instance.
     ## @param sc
     #  A space craft position as an object of the @ref pSCPosition class
     def process(self, sc):
+        if sc is self.LastSCPosition:
+            for (varName, value) in self.LastValues:
+                self.getVariable(varName)[0] = value
+            return
         yearfloat  = sc.getYearFloat()
 	orbmode    = sc.getOrbMode()
 	orbinsaa   = sc.getOrbInSAA()
@@ -113,6 +195,12 @@ class pGeomagProcessor:
         self.getVariable('spacecraft_earthlimb_fov')[0] = limb
 	
 	# Geomagnetic field
+        if self.Timeline is not None:
+            values = self.getTimelineValues(sc.MetInSeconds + 1e-6*sc.MetMicroSeconds)
+            for ((varName, memberName), value) in zip(GEOMAG_VARIABLES, values):
+                self.getVariable(varName)[0] = value
+            self.saveValues(sc)
+            return
         self.FieldModel.compute(lat,lon,alt,yearfloat)
         self.getVariable('geomagnetic_cutoff')[0] = self.FieldModel.RigidityCutoff
         self.getVariable('geomagnetic_bb0')[0]    = self.FieldModel.BB0
@@ -120,3 +208,122 @@ class pGeomagProcessor:
         self.getVariable('geomagnetic_InvariantLatitude')[0] = self.FieldModel.InvariantLatitude
         self.getVariable('geomagnetic_InvariantRadius')[0]   = self.FieldModel.InvariantRadius
         self.getVariable('geomagnetic_McIlwainL')[0]         = self.FieldModel.McIlwainL
+        self.saveValues(sc)
+
+    ## @brief Save the values of the variables filled by process(), to be
+    #  reused if the same space craft position is processed again.
+    ## @param self
+    #  The class instance.
+    ## @param sc
+    #  The space craft position.
+
+    def saveValues(self, sc):
+        self.LastSCPosition = sc
+        self.LastValues = [(varName, self.getVariable(varName)[0]) for\
+                           varName in PROCESSED_VARIABLES]
+
+    ## @brief Evaluate the geomagnetic quantities at a set of positions
+    #  and return them as a (num positions, len(GEOMAG_VARIABLES)) numpy
+    #  array.
+    ## @param self
+    #  The class instance.
+    ## @param lats
+    #  The array of latitudes (degrees).
+    ## @param lons
+    #  The array of longitudes (degrees).
+    ## @param alts
+    #  The array of altitudes relative to the earth surface (km).
+    ## @param yearfloats
+    #  The array of year floats.
+
+    def computeBatch(self, lats, lons, alts, yearfloats):
+        values = numpy.zeros((len(lats), len(GEOMAG_VARIABLES)), 'float64')
+        for (i, args) in enumerate(zip(lats, lons, alts, yearfloats)):
+            self.FieldModel.compute(*[float(arg) for arg in args])
+            values[i] = [getattr(self.FieldModel, memberName) for\
+                         (varName, memberName) in GEOMAG_VARIABLES]
+        return values
+
+    ## @brief Set up the geomagnetic timeline for the time span of a magic7
+    #  file.
+    #
+    #  After this call process() takes the geomagnetic quantities from the
+    #  timeline (see getTimelineValues()) instead of evaluating the model.
+    #  The buckets of the timeline are only evaluated when they are needed,
+    #  GEOMAG_TIMELINE_CHUNK at a time (see fillTimeline()), so that only
+    #  the time span of the run is actually covered.
+    ## @param self
+    #  The class instance.
+    ## @param m7Parser
+    #  The pM7Parser object.
+    ## @param interpolation
+    #  The interpolation method for the space craft position (see
+    #  pM7Parser.interpolatePositions()). The nearest ORB record is not an
+    #  option here, since the position must be evaluated at the time of
+    #  the bucket: linear interpolation is used instead.
+    ## @param bucket
+    #  The time step of the timeline (in seconds).
+
+    def computeTimeline(self, m7Parser, interpolation = None,
+                        bucket = GEOMAG_TIMELINE_BUCKET):
+        firstBucket = numpy.floor(m7Parser.OrbTimes[0]/bucket)
+        lastBucket  = numpy.floor(m7Parser.OrbTimes[-1]/bucket) + 1
+        numBuckets  = int(lastBucket - firstBucket) + 1
+        self.Timeline = numpy.zeros((numBuckets, len(GEOMAG_VARIABLES)),\
+                                    'float64')
+        self.TimelineFilled = numpy.zeros((numBuckets), 'bool')
+        self.TimelineStart  = bucket*firstBucket
+        self.TimelineBucket = bucket
+        self.TimelineM7Parser      = m7Parser
+        self.TimelineInterpolation = interpolation or 'linear'
+        self.LastSCPosition = None
+        logger.info('Using a geomagnetic timeline with %d s buckets.' %\
+                    bucket)
+
+    ## @brief Evaluate the buckets of the timeline in a given range (the
+    #  ones already evaluated are skipped).
+    #
+    #  The space craft position, the sidereal time and the year float of
+    #  each bucket are all taken at the time of the bucket.
+    ## @param self
+    #  The class instance.
+    ## @param first
+    #  The first bucket.
+    ## @param last
+    #  The last bucket (excluded).
+
+    def fillTimeline(self, first, last):
+        indices = numpy.arange(first, last)
+        indices = indices[~self.TimelineFilled[first:last]]
+        if not len(indices):
+            return
+        m7Parser = self.TimelineM7Parser
+        mets = self.TimelineStart + self.TimelineBucket*indices
+        positions = m7Parser.interpolatePositions(mets,\
+                                                  self.TimelineInterpolation)
+        (lats, lons, alts) = getEarthCoordinatesFromMET(mets, positions)
+        rows = numpy.searchsorted(m7Parser.OrbTimes, mets, 'right') - 1
+        rows = numpy.clip(rows, 0, len(m7Parser.OrbTimes) - 1)
+        yearfloats = m7Parser.EphemerisTable['yearfloat'][rows]
+        # Same altitude as pSCPosition.getRelativeAltitude()/1000.
+        alts = (alts - EARTH_RADIUS)/1000.
+        self.Timeline[indices] = self.computeBatch(lats, lons, alts,\
+                                                   yearfloats)
+        self.TimelineFilled[indices] = True
+
+    ## @brief Return the geomagnetic quantities at a given MET, linearly
+    #  interpolated between the two closest buckets of the timeline.
+    ## @param self
+    #  The class instance.
+    ## @param met
+    #  The MET (in seconds).
+
+    def getTimelineValues(self, met):
+        x = (met - self.TimelineStart)/self.TimelineBucket
+        index = min(max(int(x), 0), len(self.Timeline) - 2)
+        if not (self.TimelineFilled[index] and self.TimelineFilled[index + 1]):
+            self.fillTimeline(index, min(index + GEOMAG_TIMELINE_CHUNK,\
+                                         len(self.Timeline)))
+        fraction = min(max(x - index, 0.), 1.)
+        return (1. - fraction)*self.Timeline[index] +\
+               fraction*self.Timeline[index + 1]
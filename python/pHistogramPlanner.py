@@ -0,0 +1,618 @@
+## @package pHistogramPlanner
+## @brief Single-pass filling of the histograms defined in the output lists.
+#
+#  Filling each TH1F, TH2F or strip chart plot (and each of its tower or
+#  layer expansions) through its own TTree::Project() call means scanning
+#  the tree hundreds of times. The planner collects all the plots whose
+#  expressions are plain (possibly indexed) tree variables and whose cuts
+#  are evaluated once per event, reads each of the needed variables (and
+#  cuts) only once, in chunks of consecutive entries, and fills all the
+#  histograms from the same chunks with numpy operations.
+#
+#  The bin contents, the errors, the statistics and the number of entries
+#  are the same that TTree::Project() would produce. The value vs. time
+#  histograms of the strip charts only keep their non-empty bins while the
+#  tree is read, and each one is turned into a ROOT histogram (and then
+#  into its profile) at the end, one at a time. The plots which cannot
+#  be handled (e.g. custom plots, or plots with arithmetic expressions) are
+#  left to the plot representations themselves.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pHistogramPlanner')
+
+import re
+import sys
+import numpy
+
+from pSafeROOT         import ROOT
+from pTreeColumnReader import pTreeColumnReader
+from pTreeColumnReader import COLUMN_CHUNK_SIZE
+
+## @brief Regular expression matching a plain (possibly indexed) variable.
+
+TERM_PATTERN       = re.compile('^\s*([A-Za-z_]\w*)((?:\[\d+\])*)\s*$')
+TIMESTAMP_VARIABLE = 'event_timestamp'
+
+
+## @brief Return the ROOT bin indices (including underflow and overflow)
+#  for an array of values on a fixed-width axis.
+## @param values
+#  The numpy array of values.
+## @param numBins
+#  The number of bins.
+## @param low
+#  The lower edge of the axis.
+## @param high
+#  The upper edge of the axis.
+
+def getBinIndices(values, numBins, low, high):
+    indices = (numBins*(values - low)/(high - low)).astype('int64') + 1
+    indices = numpy.where(values < low, 0, indices)
+    indices = numpy.where(values >= high, numBins + 1, indices)
+    return numpy.clip(indices, 0, numBins + 1)
+
+## @brief Return the weighted number of occurrences of each bin index,
+#  as an array of given size.
+## @param indices
+#  The numpy array of bin indices.
+## @param weights
+#  The numpy array of weights.
+## @param size
+#  The size of the output array.
+
+def countBinIndices(indices, weights, size):
+    counts = numpy.zeros((size), 'float64')
+    if len(indices):
+        binCounts = numpy.bincount(indices, weights)
+        counts[:len(binCounts)] = binCounts
+    return counts
+
+
+## @brief Class describing a histogram filled by the planner.
+
+class pPlannedHistogram:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The (empty) ROOT histogram (TH1F or TH2F).
+    ## @param terms
+    #  The list of the terms (see pHistogramPlanner.parseTerm()) for the x
+    #  (and y) axis.
+    ## @param cut
+    #  The cut.
+    ## @param axes
+    #  The list of (number of bins, low edge, high edge) tuples for the
+    #  axes (taken from the histogram if None).
+
+    def __init__(self, histogram, terms, cut, axes = None):
+
+        ## @var Histogram
+        ## @brief The ROOT histogram.
+
+        ## @var Terms
+        ## @brief The list of the terms for the x (and y) axis.
+
+        ## @var Cut
+        ## @brief The cut.
+
+        ## @var Axes
+        ## @brief The list of (number of bins, low edge, high edge) tuples
+        #  for the axes of the histogram.
+
+        ## @var Contents
+        ## @brief The bin contents (including underflow and overflow, in
+        #  the ROOT global bin order).
+
+        ## @var SumW2
+        ## @brief The sums of the squares of the weights, per bin.
+
+        ## @var Stats
+        ## @brief The statistics in the TH1::PutStats() format, i.e. the sum
+        #  of the weights, the sum of the squared weights, the sums of w*x and
+        #  w*x*x for each axis and, for 2-d histograms, the sum of w*x*y (4
+        #  values for a TH1F and 7 for a TH2F).
+
+        ## @var NumEntries
+        ## @brief The number of entries.
+
+        ## @var Weighted
+        ## @brief Flag set when at least one weight is different from 1.
+
+        self.Histogram  = histogram
+        self.Terms      = terms
+        self.Cut        = cut
+        if axes is None:
+            axes = []
+            for axis in [histogram.GetXaxis(),\
+                         histogram.GetYaxis()][:len(terms)]:
+                axes.append((axis.GetNbins(), axis.GetXmin(), axis.GetXmax()))
+        self.Axes       = axes
+        self.allocate()
+        numAxes = len(terms)
+        self.Stats      = numpy.zeros((2 + 2*numAxes + numAxes - 1), 'float64')
+        self.NumEntries = 0
+        self.Weighted   = False
+
+    ## @brief Allocate the (dense) bin contents and sums of the squared
+    #  weights.
+    ## @param self
+    #  The class instance.
+
+    def allocate(self):
+        size = 1
+        for (numBins, low, high) in self.Axes:
+            size *= numBins + 2
+        self.Contents = numpy.zeros((size), 'float64')
+        self.SumW2    = numpy.zeros((size), 'float64')
+
+    ## @brief Add a chunk of weights to the bin contents.
+    ## @param self
+    #  The class instance.
+    ## @param globalIndices
+    #  The numpy array of the global bin indices.
+    ## @param weights
+    #  The numpy array of the weights.
+
+    def accumulate(self, globalIndices, weights):
+        self.Contents += countBinIndices(globalIndices, weights,\
+                                         len(self.Contents))
+        self.SumW2 += countBinIndices(globalIndices, weights*weights,\
+                                      len(self.SumW2))
+
+    ## @brief Return the (global bins, contents, sums of the squared
+    #  weights) arrays for the non-empty bins.
+    ## @param self
+    #  The class instance.
+
+    def getFilledBins(self):
+        globalBins = numpy.nonzero(self.Contents)[0]
+        return (globalBins, self.Contents[globalBins], self.SumW2[globalBins])
+
+    ## @brief Fill the histogram with a chunk of values.
+    ## @param self
+    #  The class instance.
+    ## @param values
+    #  The list of the numpy arrays of the values for the x (and y) axis,
+    #  each one of shape (number of entries, number of values per entry).
+    ## @param weights
+    #  The numpy array of the cut values (one per entry), or None if there
+    #  is no cut.
+
+    def fill(self, values, weights):
+        numValues = max([value.shape[1] for value in values])
+        values = [numpy.repeat(value, numValues/value.shape[1], axis = 1)\
+                  for value in values]
+        if weights is None:
+            weights = numpy.ones(values[0].shape, 'float64')
+        else:
+            weights = numpy.repeat(weights.reshape((-1, 1)), numValues,\
+                                   axis = 1)
+        weights = weights.ravel()
+        selection = (weights != 0)
+        weights = weights[selection]
+        values = [value.ravel()[selection] for value in values]
+        if not len(weights):
+            return
+        if (weights != 1).any():
+            self.Weighted = True
+        globalIndices = numpy.zeros(weights.shape, 'int64')
+        inRange = numpy.ones(weights.shape, 'bool')
+        stride = 1
+        for (value, (numBins, low, high)) in zip(values, self.Axes):
+            indices = getBinIndices(value, numBins, low, high)
+            globalIndices += stride*indices
+            inRange &= (indices >= 1) & (indices <= numBins)
+            stride *= numBins + 2
+        self.accumulate(globalIndices, weights)
+        self.NumEntries += len(weights)
+        weights = weights[inRange]
+        values = [value[inRange] for value in values]
+        self.Stats[0] += weights.sum()
+        self.Stats[1] += (weights*weights).sum()
+        for (i, value) in enumerate(values):
+            self.Stats[2 + 2*i] += (weights*value).sum()
+            self.Stats[3 + 2*i] += (weights*value*value).sum()
+        if len(values) == 2:
+            self.Stats[6] += (weights*values[0]*values[1]).sum()
+
+    ## @brief Write the accumulated contents into a ROOT histogram.
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The (empty) ROOT histogram.
+
+    def writeHistogram(self, histogram):
+        if self.Weighted:
+            histogram.Sumw2()
+        stride = self.Axes[0][0] + 2
+        (globalBins, contents, sumW2) = self.getFilledBins()
+        for (globalBin, content, error) in zip(globalBins, contents,\
+                                               numpy.sqrt(sumW2)):
+            if len(self.Axes) == 1:
+                bins = (int(globalBin),)
+            else:
+                bins = (int(globalBin % stride), int(globalBin/stride))
+            histogram.SetBinContent(*(bins + (float(content),)))
+            if self.Weighted:
+                histogram.SetBinError(*(bins + (float(error),)))
+        histogram.PutStats(self.Stats)
+        histogram.SetEntries(float(self.NumEntries))
+
+    ## @brief Write the accumulated contents into the ROOT histogram.
+    ## @param self
+    #  The class instance.
+
+    def commit(self):
+        self.writeHistogram(self.Histogram)
+
+
+## @brief Class describing a strip chart filled by the planner.
+#
+#  A strip chart with a short time bin spans thousands of time bins (times
+#  100 y bins) and a layer level plot has hundreds of expansions, so the
+#  value vs. time histograms are neither created nor kept dense while the
+#  tree is read: only the non-empty bins are accumulated and the ROOT
+#  histogram exists only for the time needed to create the profile.
+
+class pPlannedStripChart(pPlannedHistogram):
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param rep
+    #  The strip chart representation.
+    ## @param tower
+    #  The tower ID for the expansion.
+    ## @param layer
+    #  The TKR layer ID for the expansion.
+    ## @param terms
+    #  The [time stamp, value] list of terms.
+    ## @param cut
+    #  The cut.
+    ## @param timeRange
+    #  The (minimum, maximum) time stamp.
+
+    def __init__(self, rep, tower, layer, terms, cut, timeRange):
+
+        ## @var Rep
+        ## @brief The strip chart representation.
+
+        ## @var Tower
+        ## @brief The tower ID for the expansion.
+
+        ## @var Layer
+        ## @brief The TKR layer ID for the expansion.
+
+        ## @var TimeRange
+        ## @brief The (minimum, maximum) time stamp.
+
+        ## @var GlobalBins
+        ## @brief The sorted global indices of the non-empty bins (Contents
+        #  and SumW2 are aligned to them).
+
+        self.Rep       = rep
+        self.Tower     = tower
+        self.Layer     = layer
+        self.TimeRange = timeRange
+        binning = rep.getTimeBinning(*timeRange)
+        pPlannedHistogram.__init__(self, None, terms, cut,\
+                                   [binning[0:3], binning[3:6]])
+
+    ## @brief Allocate the (empty) sparse bin contents.
+    ## @param self
+    #  The class instance.
+
+    def allocate(self):
+        self.GlobalBins = numpy.zeros((0), 'int64')
+        self.Contents   = numpy.zeros((0), 'float64')
+        self.SumW2      = numpy.zeros((0), 'float64')
+
+    ## @brief Merge a chunk of weights into the non-empty bins.
+    ## @param self
+    #  The class instance.
+    ## @param globalIndices
+    #  The numpy array of the global bin indices.
+    ## @param weights
+    #  The numpy array of the weights.
+
+    def accumulate(self, globalIndices, weights):
+        (self.GlobalBins, inverse) = numpy.unique(numpy.concatenate(\
+            (self.GlobalBins, globalIndices)), return_inverse = True)
+        size = len(self.GlobalBins)
+        self.Contents = countBinIndices(inverse, numpy.concatenate(\
+            (self.Contents, weights)), size)
+        self.SumW2 = countBinIndices(inverse, numpy.concatenate(\
+            (self.SumW2, weights*weights)), size)
+
+    ## @brief Return the (global bins, contents, sums of the squared
+    #  weights) arrays for the non-empty bins.
+    ## @param self
+    #  The class instance.
+
+    def getFilledBins(self):
+        selection = (self.Contents != 0)
+        return (self.GlobalBins[selection], self.Contents[selection],\
+                self.SumW2[selection])
+
+    ## @brief Create the value vs. time histogram, turn it into the strip
+    #  chart and release both the histogram and the accumulated contents.
+    ## @param self
+    #  The class instance.
+
+    def commit(self):
+        name = '%s_htemp' % self.Rep.getExpandedName(self.Tower, self.Layer)
+        (tmin, tmax) = self.TimeRange
+        histogram = self.Rep.createTimeHistogram(name, tmin, tmax)
+        self.writeHistogram(histogram)
+        profile = self.Rep.createProfile(histogram, self.Tower, self.Layer)
+        self.Rep.RootObjects[profile.GetName()] = profile
+        histogram.Delete()
+        self.allocate()
+
+
+## @brief The planner implementation.
+
+class pHistogramPlanner:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+
+    def __init__(self, rootTree):
+
+        ## @var RootTree
+        ## @brief The ROOT tree.
+
+        ## @var Reader
+        ## @brief The pTreeColumnReader object.
+
+        ## @var PlannedHistograms
+        ## @brief The list of pPlannedHistogram objects.
+
+        ## @var Variables
+        ## @brief Dictionary of the shapes of the tree variables to be read,
+        #  indexed by variable name.
+
+        ## @var Cuts
+        ## @brief The list of the distinct (non empty) cuts to be evaluated.
+
+        ## @var TimeRange
+        ## @brief The (minimum, maximum) time stamp in the tree (cached).
+
+        self.RootTree          = rootTree
+        self.Reader            = pTreeColumnReader(rootTree)
+        self.PlannedHistograms = []
+        self.Variables         = {}
+        self.Cuts              = []
+        self.TimeRange         = None
+
+    ## @brief Parse a plain (possibly indexed) variable.
+    #
+    #  Return a (variable name, indices, shape) tuple or None if the
+    #  expression is not supported.
+    ## @param self
+    #  The class instance.
+    ## @param expression
+    #  The expression.
+
+    def parseTerm(self, expression):
+        match = TERM_PATTERN.match(expression)
+        if match is None:
+            return None
+        name = match.group(1)
+        indices = tuple([int(index) for index in\
+                         re.findall('\d+', match.group(2))])
+        shape = self.Reader.getLeafShape(name)
+        if shape is None or len(indices) > len(shape):
+            return None
+        for (index, dimension) in zip(indices, shape):
+            if index >= dimension:
+                return None
+        return (name, indices, shape)
+
+    ## @brief Return the number of values per entry of a term.
+    ## @param self
+    #  The class instance.
+    ## @param term
+    #  The term.
+
+    def getTermSize(self, term):
+        (name, indices, shape) = term
+        return int(numpy.prod(shape[len(indices):]))
+
+    ## @brief Parse the expression of a plot in the "y:x" ROOT format.
+    #
+    #  Return the list of the terms (x first) or None if the expression is
+    #  not supported.
+    ## @param self
+    #  The class instance.
+    ## @param expression
+    #  The expression.
+    ## @param numAxes
+    #  The number of axes of the histogram.
+
+    def parseExpression(self, expression, numAxes):
+        expressions = expression.split(':')
+        if len(expressions) != numAxes:
+            return None
+        expressions.reverse()
+        terms = [self.parseTerm(item) for item in expressions]
+        if None in terms:
+            return None
+        sizes = [self.getTermSize(term) for term in terms]
+        if len(sizes) == 2 and min(sizes) != 1 and sizes[0] != sizes[1]:
+            return None
+        return terms
+
+    ## @brief Return True if a cut is empty or is evaluated once per event.
+    ## @param self
+    #  The class instance.
+    ## @param cut
+    #  The cut.
+
+    def isEventCut(self, cut):
+        if not cut.strip():
+            return True
+        formula = ROOT.TTreeFormula('pHistogramPlannerCut', cut, self.RootTree)
+        isEventCut = formula.GetNdim() > 0 and formula.GetMultiplicity() == 0
+        del formula
+        return isEventCut
+
+    ## @brief Return the (minimum, maximum) time stamp in the tree.
+    ## @param self
+    #  The class instance.
+
+    def getTimeRange(self):
+        if self.TimeRange is None:
+            self.TimeRange = (self.RootTree.GetMinimum(TIMESTAMP_VARIABLE),\
+                              self.RootTree.GetMaximum(TIMESTAMP_VARIABLE))
+        return self.TimeRange
+
+    ## @brief Add a planned histogram (or strip chart) to be filled.
+    ## @param self
+    #  The class instance.
+    ## @param planned
+    #  The pPlannedHistogram object.
+
+    def addPlannedHistogram(self, planned):
+        for (name, indices, shape) in planned.Terms:
+            self.Variables[name] = shape
+        if planned.Cut and planned.Cut not in self.Cuts:
+            self.Cuts.append(planned.Cut)
+        self.PlannedHistograms.append(planned)
+
+    ## @brief Plan the filling of all the objects of a plot representation.
+    #
+    #  Return False (without creating any object) if the plot is not
+    #  supported by the planner.
+    ## @param self
+    #  The class instance.
+    ## @param rep
+    #  The plot representation.
+
+    def addPlotRep(self, rep):
+        className = rep.__class__.__name__
+        if className in ['pTH1FXmlRep', 'pTH2FXmlRep']:
+            return self.__planHistograms(rep, 1 + int(className == 'pTH2FXmlRep'))
+        elif className in ['pStripChartXmlRep', 'pRateStripChartXmlRep']:
+            return self.__planStripCharts(rep, className ==\
+                                          'pRateStripChartXmlRep')
+        return False
+
+    ## @brief Plan the filling of a TH1F or TH2F plot representation.
+    ## @param self
+    #  The class instance.
+    ## @param rep
+    #  The plot representation.
+    ## @param numAxes
+    #  The number of axes.
+
+    def __planHistograms(self, rep, numAxes):
+        plans = []
+        for (tower, layer) in rep.getExpansions():
+            terms = self.parseExpression(rep.getExpandedExpression(tower,\
+                                                                   layer),\
+                                         numAxes)
+            cut = rep.getExpandedCut(tower, layer)
+            if terms is None or not self.isEventCut(cut):
+                return False
+            plans.append((tower, layer, terms, cut))
+        for (tower, layer, terms, cut) in plans:
+            histogram = rep.createHistogram(tower, layer)
+            self.addPlannedHistogram(pPlannedHistogram(histogram, terms,\
+                                                       cut.strip()))
+            rep.RootObjects[histogram.GetName()] = histogram
+        return True
+
+    ## @brief Plan the filling of a strip chart plot representation.
+    #
+    #  Strip charts whose y range is not specified in the configuration
+    #  file are not supported (the range would require a separate pass).
+    ## @param self
+    #  The class instance.
+    ## @param rep
+    #  The plot representation.
+    ## @param rate
+    #  Flag for rate strip charts (which are only produced at the LAT
+    #  level).
+
+    def __planStripCharts(self, rep, rate):
+        if rep.YMin is None or rep.YMax is None:
+            return False
+        timeTerm = self.parseTerm(TIMESTAMP_VARIABLE)
+        if timeTerm is None or self.getTermSize(timeTerm) != 1:
+            return False
+        if rate:
+            expansions = [(None, None)]
+        else:
+            expansions = rep.getExpansions()
+        plans = []
+        for (tower, layer) in expansions:
+            term = self.parseTerm(rep.getExpandedExpression(tower, layer))
+            cut = rep.getExpandedCut(tower, layer)
+            if term is None or not self.isEventCut(cut):
+                return False
+            plans.append((tower, layer, term, cut))
+        for (tower, layer, term, cut) in plans:
+            self.addPlannedHistogram(pPlannedStripChart(rep, tower, layer,\
+                                                        [timeTerm, term],\
+                                                        cut.strip(),\
+                                                        self.getTimeRange()))
+        return True
+
+    ## @brief Return the values of a term for a chunk of entries, as an
+    #  array of shape (number of entries, number of values per entry).
+    ## @param self
+    #  The class instance.
+    ## @param columns
+    #  The dictionary of the variable values for the chunk.
+    ## @param term
+    #  The term.
+
+    def __getTermValues(self, columns, term):
+        (name, indices, shape) = term
+        values = columns[name][(slice(None),) + indices]
+        return values.reshape((values.shape[0], -1))
+
+    ## @brief Read all the needed variables and cuts and fill all the
+    #  planned histograms (then create the strip charts).
+    ## @param self
+    #  The class instance.
+
+    def fill(self):
+        if not len(self.PlannedHistograms):
+            return
+        logger.info('Filling %d histogram(s) from %d variable(s)...' %\
+                    (len(self.PlannedHistograms), len(self.Variables)))
+        maxSize = max([int(numpy.prod(shape)) for shape in\
+                       self.Variables.values()])
+        chunkEntries = max(1, COLUMN_CHUNK_SIZE/maxSize)
+        numEntries = self.Reader.getNumEntries()
+        for firstEntry in xrange(0, numEntries, chunkEntries):
+            numChunkEntries = min(chunkEntries, numEntries - firstEntry)
+            columns = {}
+            for (name, shape) in self.Variables.items():
+                size = int(numpy.prod(shape))
+                values = self.Reader.readColumn(name, firstEntry,\
+                                                numChunkEntries, size)
+                if len(values) != numChunkEntries*size:
+                    sys.exit('Could not read %s. Abort.' % name)
+                columns[name] = values.reshape((numChunkEntries,) + shape)
+            cutValues = {'': None}
+            for cut in self.Cuts:
+                values = self.Reader.readColumn(cut, firstEntry,\
+                                                numChunkEntries)
+                if len(values) != numChunkEntries:
+                    sys.exit('Could not evaluate cut %s. Abort.' % cut)
+                cutValues[cut] = values
+            for planned in self.PlannedHistograms:
+                values = [self.__getTermValues(columns, term) for term in\
+                          planned.Terms]
+                planned.fill(values, cutValues[planned.Cut])
+        for planned in self.PlannedHistograms:
+            planned.commit()
+        self.PlannedHistograms = []
@@ -0,0 +1,130 @@
+## @package pLDFReader
+## @brief Memory-mapped reader for ldf files.
+#
+#  The input file is mapped in memory once and for all, so that reading an
+#  event requires no read system call and no string concatenation: the event
+#  header is decoded in place and the event itself is sliced straight out of
+#  the mapped file.
+#
+#  Note that the LDF python bindings only accept string buffers, so the slice
+#  (i.e. one single memory copy per event) cannot be avoided.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pLDFReader')
+
+import os
+import mmap
+import struct
+
+## @brief The size of the ldf event header (identity and length words).
+
+LDF_HEADER_SIZE = 8
+
+
+## @brief The memory-mapped ldf reader implementation.
+
+class pLDFReader:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the ldf file.
+
+    def __init__(self, filePath):
+
+        ## @var FilePath
+        ## @brief The path to the ldf file.
+
+        ## @var Size
+        ## @brief The size of the ldf file.
+
+        ## @var Offset
+        ## @brief The current offset in the file.
+
+        ## @var File
+        ## @brief The underlying file object.
+
+        ## @var Map
+        ## @brief The mmap object (None for empty files, which can't be
+        #  mapped).
+
+        self.FilePath = filePath
+        self.File     = file(filePath, 'rb')
+        self.Size     = os.fstat(self.File.fileno()).st_size
+        self.Offset   = 0
+        if self.Size:
+            self.Map  = mmap.mmap(self.File.fileno(), 0,
+                                  access = mmap.ACCESS_READ)
+        else:
+            self.Map  = None
+
+    ## @brief Return the current offset in the file.
+    ## @param self
+    #  The class instance.
+
+    def tell(self):
+        return self.Offset
+
+    ## @brief Move to a given offset in the file.
+    ## @param self
+    #  The class instance.
+    ## @param offset
+    #  The offset.
+
+    def seek(self, offset):
+        self.Offset = offset
+
+    ## @brief Return the length of the event at the current offset, or None
+    #  if the end of file is reached.
+    ## @param self
+    #  The class instance.
+
+    def __getEventLength(self):
+        if self.Offset + LDF_HEADER_SIZE > self.Size:
+            return None
+        (identity, length) = struct.unpack_from('!LL', self.Map, self.Offset)
+        if length < LDF_HEADER_SIZE:
+            logger.warn('Corrupted event header at offset %d.' % self.Offset)
+            return None
+        if self.Offset + length > self.Size:
+            logger.warn('Truncated event at offset %d.' % self.Offset)
+            return None
+        return length
+
+    ## @brief Read the next event.
+    #
+    #  Return None when the end of file is reached.
+    ## @param self
+    #  The class instance.
+
+    def readEvent(self):
+        length = self.__getEventLength()
+        if length is None:
+            return None
+        event = self.Map[self.Offset:self.Offset + length]
+        self.Offset += length
+        return event
+
+    ## @brief Skip the next event (only the event header is decoded).
+    #
+    #  Return False when the end of file is reached.
+    ## @param self
+    #  The class instance.
+
+    def skipEvent(self):
+        length = self.__getEventLength()
+        if length is None:
+            return False
+        self.Offset += length
+        return True
+
+    ## @brief Close the file.
+    ## @param self
+    #  The class instance.
+
+    def close(self):
+        if self.Map is not None:
+            self.Map.close()
+            self.Map = None
+        self.File.close()
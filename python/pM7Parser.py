@@ -6,7 +6,7 @@ logger = pSafeLogger.getLogger('pM7Parser')
 ## @package pM7Parser
 ## @brief Basic module to parse the Magic 7 text file
 #
-# The constructor takes a path to a magic7 text file and builds a list of spacecraft
+# The constructor takes a path to a magic7 text file and builds a table (numpy structured array) of spacecraft
 # position in ECI coordinate, each position is associated to the timestamp in MET(s).
 #
 # ECI (Earth-Centered Inertial) (X,Y,Z) rectangular coordinates
@@ -32,10 +32,50 @@ import time
 import math
 import os
 import sys
-import bisect
-from pSCPosition import pSCPosition
+import numpy
+from pSCPosition import pSCPosition, getEarthCoordinatesFromMET
 from pSAAPolygon import pSAAPolygon, pVertex
 
+## @brief The columns of the ATT records.
+
+M7_ATT_DTYPE = numpy.dtype([('date', 'S10'), ('time', 'S16'), ('type', 'S3'),
+                            ('met', 'int64'), ('usec', 'int64'),
+                            ('qx', 'float64'), ('qy', 'float64'),
+                            ('qz', 'float64'), ('qw', 'float64'),
+                            ('wx', 'float64'), ('wy', 'float64'),
+                            ('wz', 'float64')])
+
+## @brief The columns of the ORB records.
+
+M7_ORB_DTYPE = numpy.dtype([('date', 'S10'), ('time', 'S16'), ('type', 'S3'),
+                            ('met', 'int64'), ('usec', 'int64'),
+                            ('x', 'float64'), ('y', 'float64'),
+                            ('z', 'float64'), ('vx', 'float64'),
+                            ('vy', 'float64'), ('vz', 'float64'),
+                            ('mode', 'int32'), ('insaa', 'int32')])
+
+## @brief The columns of the ephemeris table (one row per ORB record).
+
+EPHEMERIS_DTYPE = numpy.dtype([('met', 'int64'), ('usec', 'int64'),
+                               ('yearfloat', 'float64'),
+                               ('position', 'float64', (3,)),
+                               ('velocity', 'float64', (3,)),
+                               ('quaternion', 'float64', (4,)),
+                               ('mode', 'int32'), ('insaa', 'int32')])
+
+## @brief The interpolation methods for the space craft position (None
+#  means the nearest ORB record is used).
+
+INTERPOLATION_METHODS = [None, 'linear', 'hermite']
+
+## @brief The time bucket (in seconds) of the interpolated space craft
+#  positions: all the requests within the same bucket get the same
+#  pSCPosition object, evaluated at the center of the bucket (i.e. at most
+#  50 ms, or some 400 m along the orbit, away from the requested time).
+
+INTERPOLATION_BUCKET = 0.1
+
+
 ## @brief The Magic7 parser implementation
 #
 #  The constructor needs a full path to a magic7 text file
@@ -51,49 +91,68 @@ class pM7Parser:
     def __init__(self, inputFilePath, saaDefinitionFile):
         ## @var m7FilePath
         ## @brief The magic7 file path
-	
-        ## @var m7FileContent
-        ## @brief The Magic7 file content is read in the constructor
-	
-	## @var SCPositionTable
-	## @brief The list of Space Craft Position is filled in when the file is parsed.
-	
-	## @var TimePoints
-	## @brief The list of time stamps corresponding to each space craft position.
-	#
-	# This list is used to retreive the nearest space craft position corresponding to a time stamp.
-	
+
+        ## @var EphemerisTable
+        ## @brief The numpy structured array (see EPHEMERIS_DTYPE) with one
+        #  row per ORB record, filled in when the file is parsed.
+        #
+        #  Each ORB record is associated with the attitude quaternion of the
+        #  last ATT record preceding it in the file.
+
+        ## @var TimePoints
+        ## @brief The (numpy) array of time stamps corresponding to each
+        #  space craft position.
+        #
+        # This array is used to retreive the nearest space craft position
+        # corresponding to a time stamp.
+
+        ## @var SCPositionCache
+        ## @brief The pSCPosition objects created so far, indexed by row of
+        #  the ephemeris table.
+
+        ## @var OrbTimes
+        ## @brief The (numpy) array of the full time stamps (seconds plus
+        #  microseconds) of the ORB records, for the interpolation.
+
+        ## @var AttTimes
+        ## @brief The (numpy) array of the full time stamps of all the ATT
+        #  records, for the interpolation.
+
+        ## @var AttQuaternions
+        ## @brief The (numpy) array of the quaternions of all the ATT
+        #  records, for the interpolation.
+
+        ## @var EarthCoordinates
+        ## @brief The (latitude, longitude, altitude) arrays for all the ORB
+        #  records (None until getEarthCoordinates() is called).
+
+        ## @var InterpolatedSCPositionCache
+        ## @brief The ((bucket, interpolation method), pSCPosition) tuple of
+        #  the last interpolated space craft position (see
+        #  getInterpolatedSCPosition()).
+
         if saaDefinitionFile is None:
             logger.info('No SAA definition provided. Corresponding variables will not be filled.')
             self.SAAPolygon = None
         else:
             self.SAAPolygon = pSAAPolygon(saaDefinitionFile)
         self.m7FilePath = inputFilePath
+        self.EphemerisTable = numpy.zeros((0), EPHEMERIS_DTYPE)
+        self.TimePoints = self.EphemerisTable['met']
+        self.SCPositionCache = {}
+        self.OrbTimes = numpy.zeros((0), 'float64')
+        self.AttTimes = numpy.zeros((0), 'float64')
+        self.AttQuaternions = numpy.zeros((0, 4), 'float64')
+        self.EarthCoordinates = None
+        self.InterpolatedSCPositionCache = (None, None)
         if not os.path.exists(inputFilePath):
             logger.error('Could not find M7 file "%s"...' % inputFilePath)
             self.HasData = False
         else:
-            self.m7FileContent = file(self.m7FilePath ,'r').readlines()
-            if not len(self.m7FileContent):
+            self.parseIt()
+            self.HasData = len(self.EphemerisTable) > 0
+            if not self.HasData:
                 logger.error('Got empty M7 file "%s"...' % inputFilePath)
-                self.HasData = False
-            else:
-                self.tweakM7content()
-                self.SCPositionTable = []
-                self.TimePoints = []
-                self.parseIt()
-                self.HasData = True
-
-    ## @brief Check magic 7 file content
-    #  Use this function to check the magic 7 file quality
-    ## @param self
-    #  The class instance.
-    def tweakM7content(self):
-        # I need the M7 file to start with an ATT line, if it starts with an ORB line
-	# then I'll just skip it
-	if self.m7FileContent[0].strip('\n').split(' ')[2] == "ORB":
-	    self.m7FileContent = self.m7FileContent[1:]
-        return 0
 
     ## @brief Get the list of Space Craft Position
     #  
@@ -101,95 +160,338 @@ class pM7Parser:
     #  The class instance.
 
     def getSCPositionTable(self):
-        if self.SCPositionTable == []:
-	    print 'Warning : SCPositionTable has not been filled in yet.'
-        return self.SCPositionTable
-	
-    ## @brief Parse the magic7 file content as stored in m7FileContent.
+        if not len(self.EphemerisTable):
+            print 'Warning : SCPositionTable has not been filled in yet.'
+        return [self.getSCPositionAt(index) for index in\
+                xrange(len(self.EphemerisTable))]
+
+    ## @brief Parse the magic7 file into the ephemeris table.
     #  
     ## @param self
     #  The class instance.
     #
     # The magic7 text file structure is detailed in the class description.
     #
-    # We're interested in 4 quantities to build the space craft position table
-    #
-    # yearfloat is a float quantity calculated using the year and month read in the magic7 text file.
-    #
-    # SCTime is a pair containing the time stamp in MET (seconds, microseconds)
-    #
-    # OrbPosition is a 3D vector (X, Y, Z) giving the space craft orbit position in J2000 coordinates, in meters.
-    #
-    # SCAttitudeQuaternion is a 4D vector (x, y, z, w) with the components of the attitude quaternion in the ECI J2000 frame
+    # The file is read line by line in a single pass, which sorts the ATT
+    # and ORB records and pairs each ORB record with its ATT record. The
+    # records are then loaded into two numpy structured arrays (one column
+    # per field) and merged into the ephemeris table in bulk: each ORB
+    # record takes the quaternion of the latest ATT record before it in the
+    # file (as magic7 files contain many more ATT messages than ORB ones that
+    # should work) and ORB records preceding the first ATT record are
+    # dropped.
     #
-    
+    # yearfloat is a float quantity calculated using the year and month read
+    # in the magic7 text file (for the igrf plugin).
+
     def parseIt(self):
-        i = 0
-        OrbInSAA = 0
-	for aline in self.m7FileContent:
-	    #Useless to parse this human readable timestamp - SCTime is what we need
-	    dataList = aline.strip('\n').split(' ')	    
-	    yearfloat = self.getYearFloat(dataList)
-
-	    #Spacecraft message timestamp, seconds since 2001-01-01 00:00:00
-            #Spacecraft message timestamp, microseconds of the current second
-	    SCTime = (dataList[3], dataList[4])
-	    
-	    #Message type : Attitude or Orbit
-	    dtype = dataList[2]
-	    if dtype == 'ATT':
-                #The x, y, z, and w components of the attitude quaternion in the ECI J2000 frame
-	        SCAttitudeQuaternion = (float(dataList[5]), float(dataList[6]), float(dataList[7]), float(dataList[8]))		
-		#The body-axis x, y, and z components of the spacecraft angular velocity, in rad/sec
-		SCAngularVelocity =  (dataList[9], dataList[10], dataList[11])
-
-	    elif dtype == 'ORB':
-                #ORB 	6-8 	The ECI J2000 orbit position, in meters
-		OrbPosition = (float(dataList[5]), float(dataList[6]), float(dataList[7]))	
-                #ORB 	9-11 	The ECI J2000 orbit velocity, in meters/sec
-		OrbVelocity = (dataList[8], dataList[9], dataList[10])
-                #ORB 	12 	The spacecraft attitude-control mode 3==inertially pointed, 5==sky survey (TBR)
-		OrbMode = dataList[11]
-                #ORB 	13 	Flag indicating whether or not the observatory is within the LAT SAA boundary 1==IN, 0==OUT
-		OrbInSAA = dataList[12]
-                
-		# OrbPosition as just been read from the file, whereas we get the latest value of SCAttitudeQuaternion
-		# As magic7 file contains many more ATT message than ORB ones that should work
-		self.SCPositionTable.append(pSCPosition(SCTime, yearfloat, OrbPosition, SCAttitudeQuaternion, OrbMode,
-                                                        OrbInSAA, self.SAAPolygon))
-                self.TimePoints.append(int(SCTime[0]))	    
-	    i+=1
-
-    ## @brief Get the space craft position nearest to the corresponding timestamp.
+        attLines = []
+        orbLines = []
+        attIndices = []
+        numSkipped = 0
+        inputFile = file(self.m7FilePath, 'r')
+        for line in inputFile:
+            if ' ATT ' in line:
+                attLines.append(line)
+            elif ' ORB ' in line:
+                if attLines:
+                    orbLines.append(line)
+                    attIndices.append(len(attLines) - 1)
+                else:
+                    numSkipped += 1
+        inputFile.close()
+        if numSkipped:
+            logger.info('Skipping %d ORB record(s) preceding the first ATT record.' %\
+                        numSkipped)
+        attTable = self.__loadRecords(attLines, M7_ATT_DTYPE)
+        orbTable = self.__loadRecords(orbLines, M7_ORB_DTYPE)
+        del attLines, orbLines
+        self.AttTimes = attTable['met'] + 1e-6*attTable['usec']
+        self.AttQuaternions = numpy.column_stack([attTable[name] for name in\
+                                                  ['qx', 'qy', 'qz', 'qw']])
+        attTable = attTable[numpy.array(attIndices, 'int64')]
+        table = numpy.zeros((len(orbTable)), EPHEMERIS_DTYPE)
+        table['met']  = orbTable['met']
+        table['usec'] = orbTable['usec']
+        table['yearfloat'] = self.getYearFloats(orbTable['date'])
+        for (i, name) in enumerate(['x', 'y', 'z']):
+            table['position'][:, i] = orbTable[name]
+            table['velocity'][:, i] = orbTable['v%s' % name]
+        for (i, name) in enumerate(['qx', 'qy', 'qz', 'qw']):
+            table['quaternion'][:, i] = attTable[name]
+        table['mode']  = orbTable['mode']
+        table['insaa'] = orbTable['insaa']
+        self.EphemerisTable = table
+        self.TimePoints = table['met']
+        self.OrbTimes = table['met'] + 1e-6*table['usec']
+        self.SCPositionCache = {}
+        self.EarthCoordinates = None
+        self.InterpolatedSCPositionCache = (None, None)
+
+    ## @brief Load a set of records of the magic7 file into a numpy
+    #  structured array.
+    ## @param self
+    #  The class instance.
+    ## @param lines
+    #  The list of the lines to be loaded.
+    ## @param dtype
+    #  The numpy dtype of the records.
+
+    def __loadRecords(self, lines, dtype):
+        if not len(lines):
+            return numpy.zeros((0), dtype)
+        numFields = len(dtype.names)
+        try:
+            return numpy.loadtxt(lines, dtype,\
+                                 usecols = range(numFields), ndmin = 1)
+        except (ValueError, IndexError), error:
+            sys.exit('Could not parse M7 file "%s" (%s). Abort.' %\
+                     (self.m7FilePath, error))
+
+    ## @brief Return the row of the ephemeris table nearest to a given
+    #  timestamp.
     #
-    # Using the bisect module on the TimePoints list to get the correct index in the space craft position list.
+    # Using numpy.searchsorted on the TimePoints array (same as bisect) to
+    # get the correct index in the ephemeris table.
     #
     ## @param self
     #  The class instance.
     ## @param SCTime
     #  A space craft timestamp is a pair containing the MET : (seconds, microseconds).
     #  Only the seconds are used though to get the space craft position.
-    #  Note that bisect return the length of the array when requiring a point which is
+    #  Note that searchsorted return the length of the array when requiring a point which is
     #  larger than the maximum value of the array so that in that case we decrement the returned
     #  index by one in order to avoid an IndexError.
     #  When a boundary is returned we check if the time difference is greater than 60 s, in
     #  which case the program considers the Magic 7 file time span
     #  does not match data and exits as per JIRA GDQMQ-368
-    
-    def getSCPosition(self, SCTime):
-        index = bisect.bisect(self.TimePoints, SCTime[0])
+
+    def getSCPositionIndex(self, SCTime):
+        index = int(numpy.searchsorted(self.TimePoints, SCTime[0], 'right'))
         if index == 0 or index == len(self.TimePoints):
             if index==len(self.TimePoints):
                 index-=1
-            m7time=float(self.TimePoints[index])
-            timediff=abs(m7time-SCTime[0])
-            if timediff>60:
-                logger.error('M7 Time = %s s and SC Time=%s s'% (m7time, SCTime[0]) )
-                logger.error('Time difference is %s s, greater than 60 s' % timediff)
-                logger.error('Magic 7 time span does not match space craft time, aborting...')
-                sys.exit(1)
-        return self.SCPositionTable[index]
-       
+            self.checkTimeSpan(float(self.TimePoints[index]), SCTime[0])
+        return index
+
+    ## @brief Exit if the M7 time closest to a space craft time is more than
+    #  60 s away (see getSCPositionIndex()).
+    ## @param self
+    #  The class instance.
+    ## @param m7time
+    #  The M7 time.
+    ## @param sctime
+    #  The space craft time.
+
+    def checkTimeSpan(self, m7time, sctime):
+        timediff=abs(m7time-sctime)
+        if timediff>60:
+            logger.error('M7 Time = %s s and SC Time=%s s'% (m7time, sctime) )
+            logger.error('Time difference is %s s, greater than 60 s' % timediff)
+            logger.error('Magic 7 time span does not match space craft time, aborting...')
+            sys.exit(1)
+
+    ## @brief Get the space craft position corresponding to a timestamp.
+    ## @param self
+    #  The class instance.
+    ## @param SCTime
+    #  A space craft timestamp is a pair containing the MET : (seconds, microseconds).
+    #  See getSCPositionIndex().
+    ## @param interpolation
+    #  The interpolation method (one of INTERPOLATION_METHODS). If None the
+    #  nearest ORB record is returned, otherwise see
+    #  getInterpolatedSCPosition().
+
+    def getSCPosition(self, SCTime, interpolation = None):
+        if interpolation is not None:
+            return self.getInterpolatedSCPosition(SCTime, interpolation)
+        return self.getSCPositionAt(self.getSCPositionIndex(SCTime))
+
+    ## @brief Get the space craft position at a given timestamp, interpolated
+    #  between the M7 records.
+    #
+    #  The position is interpolated between the two ORB records around the
+    #  timestamp, the attitude quaternion between the two ATT records around
+    #  it (see interpolatePositions() and interpolateQuaternions()). The
+    #  other quantities (year float, mode and SAA flag) are taken from the
+    #  ORB record preceding the timestamp. The same 60 s check of
+    #  getSCPositionIndex() applies outside the M7 time span.
+    #
+    #  The position is evaluated at the center of the INTERPOLATION_BUCKET
+    #  the timestamp falls in, and the pSCPosition object of the last bucket
+    #  is cached: since the events come in time order, consecutive requests
+    #  within the same bucket return the same object (whose coordinates
+    #  are only computed once, see pSCPosition, and whose geomagnetic
+    #  quantities are not evaluated again, see pGeomagProcessor.process()).
+    ## @param self
+    #  The class instance.
+    ## @param SCTime
+    #  A space craft timestamp is a pair containing the MET : (seconds, microseconds).
+    #  The seconds can be a float.
+    ## @param interpolation
+    #  The interpolation method for the position ('linear' or 'hermite').
+
+    def getInterpolatedSCPosition(self, SCTime, interpolation = 'hermite'):
+        met = float(SCTime[0]) + 1e-6*float(SCTime[1])
+        if met < self.OrbTimes[0]:
+            self.checkTimeSpan(self.OrbTimes[0], met)
+        elif met > self.OrbTimes[-1]:
+            self.checkTimeSpan(self.OrbTimes[-1], met)
+        key = (int(math.floor(met/INTERPOLATION_BUCKET)), interpolation)
+        (cachedKey, cachedPosition) = self.InterpolatedSCPositionCache
+        if key == cachedKey:
+            return cachedPosition
+        met = (key[0] + 0.5)*INTERPOLATION_BUCKET
+        times = numpy.array([met], 'float64')
+        position = self.interpolatePositions(times, interpolation)[0]
+        quaternion = self.interpolateQuaternions(times)[0]
+        index = max(int(numpy.searchsorted(self.OrbTimes, met, 'right')) - 1, 0)
+        row = self.EphemerisTable[index]
+        seconds = int(math.floor(met))
+        scPosition = pSCPosition((seconds, int(round(1e6*(met - seconds)))),
+                                 float(row['yearfloat']),
+                                 tuple(position.tolist()),
+                                 tuple(quaternion.tolist()),
+                                 int(row['mode']), int(row['insaa']),
+                                 self.SAAPolygon)
+        self.InterpolatedSCPositionCache = (key, scPosition)
+        return scPosition
+
+    ## @brief Return the bracketing indices and the (clipped) interpolation
+    #  fractions of a set of times in a sorted array of time stamps.
+    ## @param self
+    #  The class instance.
+    ## @param timeStamps
+    #  The array of time stamps (at least two).
+    ## @param times
+    #  The array of times.
+
+    def __getInterpolationWeights(self, timeStamps, times):
+        indices = numpy.searchsorted(timeStamps, times, 'right') - 1
+        indices = numpy.clip(indices, 0, len(timeStamps) - 2)
+        steps = timeStamps[indices + 1] - timeStamps[indices]
+        fractions = (times - timeStamps[indices])/numpy.where(steps > 0, steps, 1)
+        return (indices, steps, numpy.clip(fractions, 0, 1))
+
+    ## @brief Return the space craft positions (in ECI J2000 coordinates) at
+    #  a set of times.
+    #
+    #  The positions are interpolated between the ORB records either
+    #  linearly or with a cubic Hermite spline using the ORB velocities.
+    #  Times outside the M7 time span get the first (last) position.
+    ## @param self
+    #  The class instance.
+    ## @param times
+    #  The array of times (MET, in seconds).
+    ## @param interpolation
+    #  The interpolation method ('linear' or 'hermite').
+
+    def interpolatePositions(self, times, interpolation = 'hermite'):
+        times = numpy.asarray(times, 'float64')
+        positions = self.EphemerisTable['position']
+        if len(positions) == 1:
+            return numpy.repeat(positions, len(times), 0)
+        (indices, steps, s) = self.__getInterpolationWeights(self.OrbTimes, times)
+        s = s[:, numpy.newaxis]
+        p0 = positions[indices]
+        p1 = positions[indices + 1]
+        if interpolation == 'linear':
+            return p0 + s*(p1 - p0)
+        if interpolation != 'hermite':
+            sys.exit('Unknown interpolation method "%s". Abort.' % interpolation)
+        velocities = self.EphemerisTable['velocity']
+        steps = steps[:, numpy.newaxis]
+        s2 = s*s
+        s3 = s2*s
+        return (2*s3 - 3*s2 + 1)*p0 + (s3 - 2*s2 + s)*steps*velocities[indices] +\
+               (3*s2 - 2*s3)*p1 + (s3 - s2)*steps*velocities[indices + 1]
+
+    ## @brief Return the attitude quaternions (x, y, z, w) at a set of times.
+    #
+    #  The quaternions are interpolated between the ATT records with a
+    #  spherical linear interpolation (slerp).
+    ## @param self
+    #  The class instance.
+    ## @param times
+    #  The array of times (MET, in seconds).
+
+    def interpolateQuaternions(self, times):
+        times = numpy.asarray(times, 'float64')
+        if len(self.AttQuaternions) == 1:
+            return numpy.repeat(self.AttQuaternions, len(times), 0)
+        (indices, steps, s) = self.__getInterpolationWeights(self.AttTimes, times)
+        q0 = self.AttQuaternions[indices]
+        q1 = self.AttQuaternions[indices + 1]
+        # Take the shortest path.
+        dot = (q0*q1).sum(1)
+        q1 = numpy.where((dot < 0)[:, numpy.newaxis], -q1, q1)
+        theta = numpy.arccos(numpy.clip(numpy.abs(dot), 0, 1))
+        sinTheta = numpy.sin(theta)
+        small = sinTheta < 1e-6
+        sinTheta = numpy.where(small, 1, sinTheta)
+        w0 = numpy.where(small, 1 - s, numpy.sin((1 - s)*theta)/sinTheta)
+        w1 = numpy.where(small, s, numpy.sin(s*theta)/sinTheta)
+        q = w0[:, numpy.newaxis]*q0 + w1[:, numpy.newaxis]*q1
+        return q/numpy.sqrt((q*q).sum(1))[:, numpy.newaxis]
+
+    ## @brief Get the space craft position for a given row of the ephemeris
+    #  table.
+    #
+    #  The pSCPosition objects are only created when requested (and
+    #  cached).
+    ## @param self
+    #  The class instance.
+    ## @param index
+    #  The row of the ephemeris table.
+
+    def getSCPositionAt(self, index):
+        try:
+            return self.SCPositionCache[index]
+        except KeyError:
+            row = self.EphemerisTable[index]
+            position = pSCPosition((row['met'], row['usec']),
+                                   float(row['yearfloat']),
+                                   tuple(row['position'].tolist()),
+                                   tuple(row['quaternion'].tolist()),
+                                   int(row['mode']), int(row['insaa']),
+                                   self.SAAPolygon)
+            self.SCPositionCache[index] = position
+            return position
+
+    ## @brief Return the (latitude, longitude, altitude) arrays for all the
+    #  ORB records.
+    #
+    #  The coordinates are computed in bulk (see
+    #  pSCPosition.getEarthCoordinates()) on the first call and cached. They
+    #  are the same as those of the corresponding pSCPosition objects.
+    ## @param self
+    #  The class instance.
+
+    def getEarthCoordinates(self):
+        if self.EarthCoordinates is None:
+            self.EarthCoordinates = getEarthCoordinatesFromMET(\
+                self.TimePoints, self.EphemerisTable['position'])
+        return self.EarthCoordinates
+
+    ## @brief Parse the human readable dates of the magic7 file and return an
+    #  array of floats corresponding to the year and month of the data.
+    #
+    ## @param self
+    #  The class instance.
+    ## @param dates
+    #  The array of dates (as "YYYY-MM-DD" strings).
+    #
+    # Each distinct date is only parsed once. This yearfloat is used for the
+    # igrf plugin.
+
+    def getYearFloats(self, dates):
+        if not len(dates):
+            return numpy.zeros((0), 'float64')
+        (uniqueDates, indices) = numpy.unique(dates, return_inverse = True)
+        yearFloats = numpy.array([self.getYearFloat([date]) for date in\
+                                  uniqueDates], 'float64')
+        return yearFloats[indices]
+
     ## @brief Parse any magic7 line having a human readable time stamp and returns a float corresponding to
     # the year and month of the data.
     #
@@ -218,7 +520,6 @@ if __name__ == '__main__':
     if p.HasData:
         for met in p.TimePoints[len(p.TimePoints)-10:]: 
             sc = p.getSCPosition((met,0))
-            sc.processCoordinates()
             print met, sc.getLongitude(), sc.getLatitude(), sc.getDistanceToSAA(), sc.OrbInSAA
     print '\nTest time request out of M7 time span'
     sc = p.getSCPosition((358905868,0))
@@ -0,0 +1,467 @@
+#! /bin/env python
+
+## @package pMicroBenchmark
+## @brief Micro-benchmarks of the space craft coordinates and SAA code.
+#
+#  The throughput of the pure-python hot spots of the magic7 processing
+#  (the J2000 to TETE matrices, the earth coordinates, the full set of
+#  pSCPosition quantities, the distance to the SAA border and the magic7
+#  parsing) is measured on a fixed synthetic orbit and a fixed synthetic
+#  SAA polygon, so that the numbers are reproducible. Whenever an optimized
+#  (vectorized, cached or interpolated) implementation exists, its results
+#  are checked against the reference (one point at a time) code, and the
+#  maximum deviation is reported along with the timing.
+#
+#  python pMicroBenchmark.py [-n num points] [-r num repeats] [-d work dir]
+#
+#  The exit status is non-zero if any of the agreement checks fails.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pMicroBenchmark')
+
+import os
+import sys
+import time
+import math
+import shutil
+import tempfile
+import numpy
+
+import pTETEUtils
+
+from pSCPosition import pSCPosition, getJulianDatesFromMET
+from pSCPosition import getEarthCoordinatesFromMET, getSCQuantities
+from pSCPosition import EARTH_RADIUS
+from pSAAPolygon import pSAAPolygon, pVertex
+
+## @brief The MET of the first point of the synthetic orbit.
+
+SYNTHETIC_ORBIT_START_MET = 239557417
+
+## @brief The parameters of the synthetic (circular) orbit.
+
+SYNTHETIC_ORBIT_ALTITUDE    = 565000.
+SYNTHETIC_ORBIT_INCLINATION = 25.6
+SYNTHETIC_ORBIT_PERIOD      = 5729.
+
+## @brief The vertices (longitude, latitude) of the synthetic SAA polygon,
+#  in order of angle to the center.
+
+SYNTHETIC_SAA_VERTICES = [(-45., -30.), (-70., -24.), (-88., -12.),
+                          (-80., -1.), (-55., 2.), (-30., 0.), (0., -8.),
+                          (25., -18.), (30., -28.), (0., -30.), (-30., -30.)]
+
+## @brief The tolerances of the agreement checks.
+
+COORDINATE_TOLERANCE = 1e-5
+TETE_TOLERANCE       = 1e-9
+SAA_TOLERANCE        = 1e-6
+SAA_GRID_TOLERANCE   = 5.0
+M7_TOLERANCE         = 1e-3
+
+## @brief The seconds since the epoch at the mission start (2001-01-01).
+
+MISSION_START_EPOCH = 978307200
+
+
+## @brief Return the (mets, positions, velocities, quaternions) arrays of
+#  the synthetic orbit.
+#
+#  The space craft is on a circular orbit, with the attitude slowly
+#  rotating around a wobbling axis.
+## @param numPoints
+#  The number of points (one per second).
+
+def getSyntheticOrbit(numPoints):
+    mets = SYNTHETIC_ORBIT_START_MET + numpy.arange(numPoints)
+    radius = EARTH_RADIUS + SYNTHETIC_ORBIT_ALTITUDE
+    omega = 2*math.pi/SYNTHETIC_ORBIT_PERIOD
+    inclination = math.radians(SYNTHETIC_ORBIT_INCLINATION)
+    phases = omega*(mets - SYNTHETIC_ORBIT_START_MET)
+    positions = radius*numpy.column_stack((numpy.cos(phases),
+        numpy.sin(phases)*math.cos(inclination),
+        numpy.sin(phases)*math.sin(inclination)))
+    velocities = radius*omega*numpy.column_stack((-numpy.sin(phases),
+        numpy.cos(phases)*math.cos(inclination),
+        numpy.cos(phases)*math.sin(inclination)))
+    axes = numpy.column_stack((numpy.sin(phases/7.), numpy.cos(phases/7.),
+                               0.3*numpy.ones(numPoints)))
+    axes /= numpy.sqrt((axes*axes).sum(1))[:, numpy.newaxis]
+    quaternions = numpy.column_stack((numpy.sin(phases/2)[:, numpy.newaxis]*\
+                                      axes, numpy.cos(phases/2)))
+    return (mets, positions, velocities, quaternions)
+
+## @brief Write the synthetic SAA polygon into an xml file.
+## @param filePath
+#  The path to the output file.
+
+def writeSyntheticPolygon(filePath):
+    outputFile = file(filePath, 'w')
+    outputFile.write('<saaDefinition>\n')
+    for (lon, lat) in SYNTHETIC_SAA_VERTICES:
+        outputFile.write('  <vertex longitude="%s" latitude="%s"/>\n' %\
+                         (lon, lat))
+    outputFile.write('</saaDefinition>\n')
+    outputFile.close()
+
+## @brief Write the synthetic orbit into a magic7 file (one ATT and one ORB
+#  record per point).
+## @param filePath
+#  The path to the output file.
+## @param orbit
+#  The synthetic orbit (see getSyntheticOrbit()).
+
+def writeSyntheticM7File(filePath, orbit):
+    (mets, positions, velocities, quaternions) = orbit
+    outputFile = file(filePath, 'w')
+    for (met, position, velocity, quaternion) in\
+            zip(mets, positions, velocities, quaternions):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S.000000',\
+                              time.gmtime(MISSION_START_EPOCH + met))
+        outputFile.write('%s ATT %d 0 %.9f %.9f %.9f %.9f 0.0 0.0 0.0\n' %\
+                         ((stamp, met) + tuple(quaternion)))
+        outputFile.write('%s ORB %d 0 %.3f %.3f %.3f %.3f %.3f %.3f 5 0\n' %\
+                         ((stamp, met) + tuple(position) + tuple(velocity)))
+    outputFile.close()
+
+## @brief Return the maximum absolute deviation between two arrays.
+#
+#  The points where both values are NaN are ignored, while those where
+#  only one of them is NaN make the deviation infinite.
+## @param values
+#  The array of values.
+## @param references
+#  The array of reference values.
+## @param period
+#  The period of the values (e.g. 360 for angles), if any.
+
+def getMaxDeviation(values, references, period = None):
+    values = numpy.asarray(values, 'float64').ravel()
+    references = numpy.asarray(references, 'float64').ravel()
+    bothNaN = numpy.isnan(values) & numpy.isnan(references)
+    if (numpy.isnan(values) ^ numpy.isnan(references)).any():
+        return numpy.inf
+    deviations = numpy.abs(values[~bothNaN] - references[~bothNaN])
+    if period is not None:
+        deviations = numpy.minimum(deviations, period - deviations%period)
+    if not len(deviations):
+        return 0.0
+    return float(deviations.max())
+
+
+## @brief The micro-benchmark implementation.
+
+class pMicroBenchmark:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param numPoints
+    #  The number of points of the synthetic orbit.
+    ## @param numRepeats
+    #  The number of times each measurement is repeated (the best time is
+    #  retained).
+    ## @param workDirPath
+    #  The directory for the synthetic files.
+
+    def __init__(self, numPoints, numRepeats, workDirPath):
+
+        ## @var NumRepeats
+        ## @brief The number of times each measurement is repeated.
+
+        ## @var WorkDirPath
+        ## @brief The directory for the synthetic files.
+
+        ## @var Orbit
+        ## @brief The synthetic orbit (see getSyntheticOrbit()).
+
+        ## @var ResultsList
+        ## @brief The list of the (benchmark, implementation, number of
+        #  items, time, reference time, deviation, tolerance) tuples.
+
+        self.NumRepeats  = numRepeats
+        self.WorkDirPath = workDirPath
+        self.Orbit       = getSyntheticOrbit(numPoints)
+        self.ResultsList = []
+
+    ## @brief Run a function a number of times and return a (best time,
+    #  result) tuple.
+    ## @param self
+    #  The class instance.
+    ## @param function
+    #  The function (taking no arguments).
+    ## @param setup
+    #  The function called (and not timed) before each run, if any.
+
+    def timeIt(self, function, setup = None):
+        bestTime = None
+        for i in xrange(self.NumRepeats):
+            if setup is not None:
+                setup()
+            startTime = time.time()
+            result = function()
+            elapsedTime = time.time() - startTime
+            if bestTime is None or elapsedTime < bestTime:
+                bestTime = elapsedTime
+        return (bestTime, result)
+
+    ## @brief Add a result.
+    ## @param self
+    #  The class instance.
+    ## @param benchmark
+    #  The benchmark name.
+    ## @param implementation
+    #  The implementation name.
+    ## @param numItems
+    #  The number of items processed.
+    ## @param elapsedTime
+    #  The time elapsed.
+    ## @param referenceTime
+    #  The time elapsed with the reference implementation (None if this is
+    #  the reference implementation).
+    ## @param deviation
+    #  The maximum deviation from the reference implementation (None if not
+    #  checked).
+    ## @param tolerance
+    #  The tolerance on the deviation.
+
+    def addResult(self, benchmark, implementation, numItems, elapsedTime,
+                  referenceTime = None, deviation = None, tolerance = None):
+        self.ResultsList.append((benchmark, implementation, numItems,\
+                                 elapsedTime, referenceTime, deviation,\
+                                 tolerance))
+
+    ## @brief Return the number of failed agreement checks.
+    ## @param self
+    #  The class instance.
+
+    def getNumFailures(self):
+        return len([result for result in self.ResultsList if\
+                    result[5] is not None and not result[5] <= result[6]])
+
+    ## @brief Benchmark the J2000 to TETE matrices.
+    ## @param self
+    #  The class instance.
+
+    def benchmarkTETEMatrices(self):
+        julianDates = getJulianDatesFromMET(self.Orbit[0])
+        def reference():
+            return numpy.array([pTETEUtils.getJ2000toTETEMatrix(julianDate)\
+                                for julianDate in julianDates])
+        (referenceTime, references) = self.timeIt(reference)
+        self.addResult('tete_matrix', 'reference', len(julianDates),\
+                       referenceTime)
+        function = lambda: pTETEUtils.getJ2000toTETEMatrices(julianDates)
+        (elapsedTime, values) = self.timeIt(function,\
+                                            pTETEUtils.TETE_MATRIX_CACHE.clear)
+        self.addResult('tete_matrix', 'bucketed', len(julianDates),\
+                       elapsedTime, referenceTime,\
+                       getMaxDeviation(values, references), TETE_TOLERANCE)
+        (elapsedTime, values) = self.timeIt(function)
+        self.addResult('tete_matrix', 'bucketed (cached)', len(julianDates),\
+                       elapsedTime, referenceTime,\
+                       getMaxDeviation(values, references), TETE_TOLERANCE)
+
+    ## @brief Benchmark the earth coordinates.
+    ## @param self
+    #  The class instance.
+
+    def benchmarkEarthCoordinates(self):
+        (mets, positions, velocities, quaternions) = self.Orbit
+        def reference():
+            coordinates = []
+            for (met, position) in zip(mets, positions):
+                sc = pSCPosition((met, 0), None, tuple(position))
+                sc.JulianDate = sc.getJulianDateFromMET(met)
+                sc.GMSTime = sc.getGMSTime(sc.JulianDate)
+                coordinates.append(sc.getEarthCoordinateReference())
+            return numpy.array(coordinates).T
+        (referenceTime, references) = self.timeIt(reference)
+        self.addResult('earth_coordinates', 'reference', len(mets),\
+                       referenceTime)
+        function = lambda: getEarthCoordinatesFromMET(mets, positions)
+        (elapsedTime, values) = self.timeIt(function)
+        deviation = max(getMaxDeviation(values[0], references[0]),\
+                        getMaxDeviation(values[1], references[1], 360.),\
+                        getMaxDeviation(values[2], references[2])/1000.)
+        self.addResult('earth_coordinates', 'batch', len(mets), elapsedTime,\
+                       referenceTime, deviation, COORDINATE_TOLERANCE)
+
+    ## @brief Benchmark the full set of space craft quantities.
+    ## @param self
+    #  The class instance.
+
+    def benchmarkSCQuantities(self):
+        (mets, positions, velocities, quaternions) = self.Orbit
+        getters = [
+            ('spacecraft_latitude', lambda sc: sc.getLatitude(), None),
+            ('spacecraft_longitude', lambda sc: sc.getLongitude(), 360.),
+            ('spacecraft_altitude',\
+             lambda sc: sc.getRelativeAltitude()/1000., None),
+            ('spacecraft_pitch', lambda sc: sc.getPitch(), None),
+            ('spacecraft_roll', lambda sc: sc.getRoll(), None),
+            ('spacecraft_yaw', lambda sc: sc.getYaw(), None),
+            ('spacecraft_rock', lambda sc: sc.getRockAngle(), None),
+            ('spacecraft_xra', lambda sc: sc.getXRa(), 360.),
+            ('spacecraft_xdec', lambda sc: sc.getXDec(), None),
+            ('spacecraft_yra', lambda sc: sc.getYRa(), 360.),
+            ('spacecraft_ydec', lambda sc: sc.getYDec(), None),
+            ('spacecraft_zra', lambda sc: sc.getZRa(), 360.),
+            ('spacecraft_zdec', lambda sc: sc.getZDec(), None),
+            ('spacecraft_zgalL', lambda sc: sc.getZGalL(), 360.),
+            ('spacecraft_zgalB', lambda sc: sc.getZGalB(), None),
+            ('spacecraft_earthlimb', lambda sc: sc.getLimbAngle(), None),
+            ('spacecraft_earthlimb_fov',\
+             lambda sc: sc.getArcAngleEarthLimb(), None)]
+        def reference():
+            references = dict([(key, []) for (key, getter, period) in\
+                               getters])
+            for (met, position, quaternion) in\
+                    zip(mets, positions, quaternions):
+                sc = pSCPosition((met, 0), None, tuple(position),\
+                                 tuple(quaternion))
+                sc.processCoordinates()
+                for (key, getter, period) in getters:
+                    references[key].append(getter(sc))
+            return references
+        (referenceTime, references) = self.timeIt(reference)
+        self.addResult('sc_quantities', 'reference', len(mets), referenceTime)
+        function = lambda: getSCQuantities(mets, positions, quaternions)
+        (elapsedTime, values) = self.timeIt(function)
+        deviation = 0.0
+        for (key, getter, period) in getters:
+            keyDeviation = getMaxDeviation(values[key], references[key],\
+                                           period)
+            logger.debug('%s: maximum deviation %s.' % (key, keyDeviation))
+            deviation = max(deviation, keyDeviation)
+        self.addResult('sc_quantities', 'batch', len(mets), elapsedTime,\
+                       referenceTime, deviation, COORDINATE_TOLERANCE)
+
+    ## @brief Benchmark the distance to the SAA border.
+    ## @param self
+    #  The class instance.
+
+    def benchmarkSAADistance(self):
+        (mets, positions, velocities, quaternions) = self.Orbit
+        (lats, lons, alts) = getEarthCoordinatesFromMET(mets, positions)
+        polygonFilePath = os.path.join(self.WorkDirPath, 'saaDefinition.xml')
+        writeSyntheticPolygon(polygonFilePath)
+        polygon = pSAAPolygon(polygonFilePath)
+        # The scalar code is not defined where the line to the SAA center
+        # crosses no segment (at lon or, next to lon = 180, at -lon): these
+        # points are NaN in the vectorized code as well. Any other failure
+        # is a genuine error.
+        def getDistance(lon, lat, lonPadding = 10.0):
+            vertices = [pVertex(lon, lat)]
+            if abs(abs(lon) - 180) <= lonPadding:
+                vertices.append(pVertex(-lon, lat))
+            for vertex in vertices:
+                if polygon.getCrossSegments(vertex)[0] is None:
+                    return numpy.nan
+            return polygon.getDistanceToBorder(vertices[0], lonPadding)
+        reference = lambda: numpy.array([getDistance(lon, lat) for\
+                                         (lon, lat) in zip(lons, lats)])
+        (referenceTime, references) = self.timeIt(reference)
+        self.addResult('saa_distance', 'reference', len(lons), referenceTime)
+        function = lambda: polygon.getDistancesToBorder(lons, lats)
+        (elapsedTime, values) = self.timeIt(function)
+        self.addResult('saa_distance', 'vectorized', len(lons), elapsedTime,\
+                       referenceTime, getMaxDeviation(values, references),\
+                       SAA_TOLERANCE)
+        (elapsedTime, result) = self.timeIt(polygon.buildDistanceGrid)
+        self.addResult('saa_distance', 'grid (build)',\
+                       polygon.DistanceGrid.size, elapsedTime)
+        function = lambda: polygon.getDistancesAt(lons, lats)
+        (elapsedTime, values) = self.timeIt(function)
+        self.addResult('saa_distance', 'grid', len(lons), elapsedTime,\
+                       referenceTime, getMaxDeviation(values, references),\
+                       SAA_GRID_TOLERANCE)
+
+    ## @brief Benchmark the magic7 parsing.
+    ## @param self
+    #  The class instance.
+
+    def benchmarkM7Parsing(self):
+        from pM7Parser import pM7Parser
+        (mets, positions, velocities, quaternions) = self.Orbit
+        m7FilePath = os.path.join(self.WorkDirPath, 'magic7.txt')
+        writeSyntheticM7File(m7FilePath, self.Orbit)
+        (elapsedTime, parser) = self.timeIt(lambda: pM7Parser(m7FilePath,\
+                                                              None))
+        table = parser.EphemerisTable
+        if len(table) != len(mets):
+            deviation = numpy.inf
+        else:
+            deviation = max(getMaxDeviation(table['met'], mets),\
+                            getMaxDeviation(table['position'], positions),\
+                            getMaxDeviation(table['velocity'], velocities),\
+                            getMaxDeviation(table['quaternion'], quaternions))
+        self.addResult('m7_parsing', 'parseIt', 2*len(mets), elapsedTime,\
+                       None, deviation, M7_TOLERANCE)
+
+    ## @brief Run all the benchmarks.
+    ## @param self
+    #  The class instance.
+
+    def run(self):
+        for benchmark in [self.benchmarkTETEMatrices,
+                          self.benchmarkEarthCoordinates,
+                          self.benchmarkSCQuantities,
+                          self.benchmarkSAADistance,
+                          self.benchmarkM7Parsing]:
+            logger.info('Running %s()...' % benchmark.__name__)
+            benchmark()
+
+    ## @brief Class representation.
+    ## @param self
+    #  The class instance.
+
+    def __str__(self):
+        text = '%-18s %-18s %8s %10s %12s %8s %10s %6s\n' %\
+               ('Benchmark', 'Implementation', 'Items', 'Time (s)',\
+                'Items/s', 'Speedup', 'Deviation', 'Check')
+        for (benchmark, implementation, numItems, elapsedTime,\
+             referenceTime, deviation, tolerance) in self.ResultsList:
+            rate = numItems/max(elapsedTime, 1e-9)
+            if referenceTime is None:
+                speedup = '-'
+            else:
+                speedup = '%.1f' % (referenceTime/max(elapsedTime, 1e-9))
+            if deviation is None:
+                (deviation, check) = ('-', '-')
+            else:
+                check = ('FAIL', 'ok')[deviation <= tolerance]
+                deviation = '%.2e' % deviation
+            text += '%-18s %-18s %8d %10.4f %12.1f %8s %10s %6s\n' %\
+                    (benchmark, implementation, numItems, elapsedTime, rate,\
+                     speedup, deviation, check)
+        return text
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options]')
+    parser.add_option('-n', '--num-points', dest = 'n', type = 'int',
+                      default = 2000, help = 'number of orbit points')
+    parser.add_option('-r', '--repeats', dest = 'r', type = 'int',
+                      default = 3, help = 'number of repeats')
+    parser.add_option('-d', '--work-dir', dest = 'd', default = None,
+                      help = 'directory for the synthetic files (kept)')
+    (options, args) = parser.parse_args()
+    if options.d is None:
+        workDirPath = tempfile.mkdtemp(prefix = 'pMicroBenchmark')
+    else:
+        workDirPath = options.d
+        if not os.path.exists(workDirPath):
+            os.makedirs(workDirPath)
+    try:
+        microBenchmark = pMicroBenchmark(options.n, options.r, workDirPath)
+        microBenchmark.run()
+    finally:
+        if options.d is None:
+            shutil.rmtree(workDirPath)
+    print microBenchmark
+    numFailures = microBenchmark.getNumFailures()
+    if numFailures:
+        sys.exit('%d agreement check(s) failed.' % numFailures)
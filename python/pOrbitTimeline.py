@@ -0,0 +1,328 @@
+#! /bin/env python
+
+## @package pOrbitTimeline
+## @brief Precomputed orbit timeline for a magic7 file.
+#
+#  All the space craft quantities filled by pGeomagProcessor.process()
+#  (position, attitude, pointing, earth limb, distance to the SAA and
+#  geomagnetic quantities) are computed in bulk for all the ORB records of
+#  a magic7 file and written into a numpy structured array (.npy format,
+#  one column per tree variable), which the pDataProcessor memory-maps
+#  instead of parsing the magic7 file and evaluating the models.
+#
+#  The timeline is written by default in a sidecar file next to the magic7
+#  file (<magic7 file>.timeline.npy), along with a small metadata file
+#  identifying the versions of the magic7 and SAA definition files it has
+#  been built from. It is automatically ignored when any of them changes.
+#
+#  The timeline is built by running this module:
+#
+#  python pOrbitTimeline.py [-s saaDefinition.xml] [-o output file] m7file
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pOrbitTimeline')
+
+import os
+import sys
+import time
+import cPickle
+import numpy
+
+TIMELINE_FILE_SUFFIX      = '.timeline.npy'
+TIMELINE_META_FILE_SUFFIX = '.meta'
+TIMELINE_VERSION          = 2
+
+## @brief The (tree variable, numpy type) pairs of the timeline columns
+#  (besides the MET).
+
+TIMELINE_VARIABLES = [('spacecraft_orbit_mode'        , 'int32'),
+                      ('spacecraft_orbit_inSAA'       , 'int32'),
+                      ('spacecraft_latitude'          , 'float64'),
+                      ('spacecraft_longitude'         , 'float64'),
+                      ('spacecraft_altitude'          , 'float64'),
+                      ('spacecraft_distance_to_saa'   , 'float64'),
+                      ('spacecraft_pitch'             , 'float64'),
+                      ('spacecraft_roll'              , 'float64'),
+                      ('spacecraft_yaw'               , 'float64'),
+                      ('spacecraft_rock'              , 'float64'),
+                      ('spacecraft_xra'               , 'float64'),
+                      ('spacecraft_xdec'              , 'float64'),
+                      ('spacecraft_yra'               , 'float64'),
+                      ('spacecraft_ydec'              , 'float64'),
+                      ('spacecraft_zra'               , 'float64'),
+                      ('spacecraft_zdec'              , 'float64'),
+                      ('spacecraft_zgalL'             , 'float64'),
+                      ('spacecraft_zgalB'             , 'float64'),
+                      ('spacecraft_earthlimb'         , 'float64'),
+                      ('spacecraft_earthlimb_fov'     , 'float64'),
+                      ('geomagnetic_cutoff'           , 'float64'),
+                      ('geomagnetic_bb0'              , 'float64'),
+                      ('geomagnetic_InvariantLambda'  , 'float64'),
+                      ('geomagnetic_InvariantLatitude', 'float64'),
+                      ('geomagnetic_InvariantRadius'  , 'float64'),
+                      ('geomagnetic_McIlwainL'        , 'float64')]
+
+TIMELINE_DTYPE = numpy.dtype([('met', 'int64')] + TIMELINE_VARIABLES)
+
+
+## @brief Return the path to the timeline sidecar file for a magic7 file.
+## @param m7FilePath
+#  The path to the magic7 file.
+
+def getTimelineFilePath(m7FilePath):
+    return '%s%s' % (m7FilePath, TIMELINE_FILE_SUFFIX)
+
+## @brief Return the path to the metadata file of a timeline file.
+## @param timelineFilePath
+#  The path to the timeline file.
+
+def getMetaFilePath(timelineFilePath):
+    return '%s%s' % (timelineFilePath, TIMELINE_META_FILE_SUFFIX)
+
+## @brief Return a (size, modification time) tuple identifying the
+#  current version of a file (None if no file).
+#
+#  The path is deliberately not part of the signature, so that the same
+#  file reached through a different path (e.g. a symbolic link or a
+#  different mount point) is recognized.
+## @param filePath
+#  The path to the file.
+
+def getFileSignature(filePath):
+    if filePath is None:
+        return None
+    stat = os.stat(filePath)
+    return (stat.st_size, int(stat.st_mtime))
+
+
+## @brief Build the timeline for a magic7 file and write it to disk.
+## @param m7FilePath
+#  The path to the magic7 file.
+## @param saaDefinitionFile
+#  The path to the SAA definition file (None if not available).
+## @param timelineFilePath
+#  The path to the output file (None means the default sidecar file).
+
+def buildTimeline(m7FilePath, saaDefinitionFile = None,
+                  timelineFilePath = None):
+    from pM7Parser        import pM7Parser
+    from pSCPosition      import getSCQuantities
+    from pGeomagProcessor import pGeomagProcessor, GEOMAG_VARIABLES
+    if timelineFilePath is None:
+        timelineFilePath = getTimelineFilePath(m7FilePath)
+    startTime = time.time()
+    parser = pM7Parser(m7FilePath, saaDefinitionFile)
+    if not parser.HasData:
+        sys.exit('No data in M7 file "%s". Abort.' % m7FilePath)
+    ephemeris = parser.EphemerisTable
+    logger.info('Computing the orbit timeline (%d points)...' % len(ephemeris))
+    quantities = getSCQuantities(ephemeris['met'], ephemeris['position'],
+                                 ephemeris['quaternion'])
+    quantities['spacecraft_orbit_mode']  = ephemeris['mode']
+    quantities['spacecraft_orbit_inSAA'] = ephemeris['insaa']
+    if parser.SAAPolygon is None:
+        quantities['spacecraft_distance_to_saa'] =\
+            -9999*numpy.ones((len(ephemeris)), 'float64')
+    else:
+        quantities['spacecraft_distance_to_saa'] =\
+            parser.SAAPolygon.getDistancesToBorder(\
+            quantities['spacecraft_longitude'],
+            quantities['spacecraft_latitude'])
+    geomagProcessor = pGeomagProcessor(None)
+    values = geomagProcessor.computeBatch(quantities['spacecraft_latitude'],
+                                          quantities['spacecraft_longitude'],
+                                          quantities['spacecraft_altitude'],
+                                          ephemeris['yearfloat'])
+    for (i, (varName, memberName)) in enumerate(GEOMAG_VARIABLES):
+        quantities[varName] = values[:, i]
+    timeline = numpy.zeros((len(ephemeris)), TIMELINE_DTYPE)
+    timeline['met'] = ephemeris['met']
+    for (varName, varType) in TIMELINE_VARIABLES:
+        timeline[varName] = quantities[varName]
+    writeTimeline(timeline, timelineFilePath, m7FilePath, saaDefinitionFile)
+    logger.info('Orbit timeline written to %s in %.2f s.' %\
+                (timelineFilePath, time.time() - startTime))
+
+## @brief Write a timeline and its metadata file.
+#
+#  Both files are written under a temporary name and then renamed, the
+#  metadata file last, so that concurrent jobs never use a partially
+#  written timeline.
+## @param timeline
+#  The timeline (numpy structured array).
+## @param timelineFilePath
+#  The path to the timeline file.
+## @param m7FilePath
+#  The path to the magic7 file.
+## @param saaDefinitionFile
+#  The path to the SAA definition file (None if not available).
+
+def writeTimeline(timeline, timelineFilePath, m7FilePath, saaDefinitionFile):
+    metaFilePath = getMetaFilePath(timelineFilePath)
+    if os.path.exists(metaFilePath):
+        os.remove(metaFilePath)
+    tmpFilePath = '%s.%d.tmp' % (timelineFilePath, os.getpid())
+    tmpFile = file(tmpFilePath, 'wb')
+    numpy.save(tmpFile, timeline)
+    tmpFile.close()
+    os.rename(tmpFilePath, timelineFilePath)
+    tmpFilePath = '%s.%d.tmp' % (metaFilePath, os.getpid())
+    tmpFile = file(tmpFilePath, 'wb')
+    cPickle.dump({'Version'         : TIMELINE_VERSION,
+                  'M7FilePath'      : os.path.abspath(m7FilePath),
+                  'M7Signature'     : getFileSignature(m7FilePath),
+                  'SAASignature'    : getFileSignature(saaDefinitionFile),
+                  'TimelineFileSize': os.path.getsize(timelineFilePath)},
+                 tmpFile, cPickle.HIGHEST_PROTOCOL)
+    tmpFile.close()
+    os.rename(tmpFilePath, metaFilePath)
+
+
+## @brief Class reading the (memory-mapped) timeline.
+
+class pOrbitTimeline:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param timelineFilePath
+    #  The path to the timeline file.
+
+    def __init__(self, timelineFilePath):
+
+        ## @var TimelineFilePath
+        ## @brief The path to the timeline file.
+
+        ## @var Meta
+        ## @brief The content of the metadata file.
+
+        ## @var Timeline
+        ## @brief The memory-mapped timeline (numpy structured array).
+
+        ## @var TimePoints
+        ## @brief The (numpy) array of the time stamps of the timeline.
+
+        ## @var HasData
+        ## @brief Flag set if the timeline is not empty.
+
+        self.TimelineFilePath = timelineFilePath
+        inputFile = file(getMetaFilePath(timelineFilePath), 'rb')
+        self.Meta = cPickle.load(inputFile)
+        inputFile.close()
+        self.Timeline = numpy.load(timelineFilePath, mmap_mode = 'r')
+        self.TimePoints = numpy.array(self.Timeline['met'])
+        self.HasData = len(self.Timeline) > 0
+
+    ## @brief Return True if the timeline has been built from the given
+    #  magic7 and SAA definition files (in their current version).
+    ## @param self
+    #  The class instance.
+    ## @param m7FilePath
+    #  The path to the magic7 file (None means it's not checked).
+    ## @param saaDefinitionFile
+    #  The path to the SAA definition file.
+
+    def isUpToDate(self, m7FilePath, saaDefinitionFile):
+        if self.Meta['Version'] != TIMELINE_VERSION:
+            return False
+        if self.Meta['TimelineFileSize'] !=\
+               os.path.getsize(self.TimelineFilePath):
+            return False
+        if m7FilePath is not None and\
+               self.Meta['M7Signature'] != getFileSignature(m7FilePath):
+            return False
+        return self.Meta['SAASignature'] == getFileSignature(saaDefinitionFile)
+
+    ## @brief Return the row of the timeline for a given time stamp.
+    #
+    #  Same as pM7Parser.getSCPositionIndex() (i.e. the nearest ORB record at
+    #  or after the time stamp, with the same 60 s check at the boundaries).
+    ## @param self
+    #  The class instance.
+    ## @param met
+    #  The time stamp (MET, in seconds).
+
+    def getIndex(self, met):
+        index = int(numpy.searchsorted(self.TimePoints, met, 'right'))
+        if index == 0 or index == len(self.TimePoints):
+            if index == len(self.TimePoints):
+                index -= 1
+            timediff = abs(float(self.TimePoints[index]) - met)
+            if timediff > 60:
+                logger.error('Timeline Time = %s s and SC Time=%s s' %\
+                             (self.TimePoints[index], met))
+                logger.error('Time difference is %s s, greater than 60 s' %\
+                             timediff)
+                logger.error('Timeline time span does not match space craft time, aborting...')
+                sys.exit(1)
+        return index
+
+    ## @brief Fill the space craft and geomagnetic tree variables for a given
+    #  time stamp.
+    ## @param self
+    #  The class instance.
+    ## @param treeMaker
+    #  The tree maker object.
+    ## @param met
+    #  The time stamp (MET, in seconds).
+
+    def fillVariables(self, treeMaker, met):
+        row = self.Timeline[self.getIndex(met)]
+        for (varName, varType) in TIMELINE_VARIABLES:
+            treeMaker.getVariable(varName)[0] = row[varName]
+
+
+## @brief Return the timeline to be used for a given magic7 file, or None
+#  if there's no up-to-date timeline (in which case the magic7 file is to
+#  be parsed).
+#
+#  The magic7 file path can also be the path to a timeline file, in which
+#  case the magic7 file it has been built from is checked (if it still
+#  exists) and the job is aborted if the timeline is out of date.
+## @param m7FilePath
+#  The path to the magic7 (or timeline) file.
+## @param saaDefinitionFile
+#  The path to the SAA definition file.
+
+def openOrbitTimeline(m7FilePath, saaDefinitionFile):
+    if m7FilePath.endswith(TIMELINE_FILE_SUFFIX):
+        if not os.path.exists(getMetaFilePath(m7FilePath)):
+            sys.exit('Could not find the metadata of timeline %s. Abort.' %\
+                     m7FilePath)
+        timeline = pOrbitTimeline(m7FilePath)
+        if timeline.Meta['Version'] != TIMELINE_VERSION:
+            sys.exit('Timeline %s out of date. Abort.' % m7FilePath)
+        sourceFilePath = timeline.Meta['M7FilePath']
+        if not os.path.exists(sourceFilePath):
+            logger.warn('Could not find %s, using timeline %s unchecked.' %\
+                        (sourceFilePath, m7FilePath))
+            sourceFilePath = None
+        if not timeline.isUpToDate(sourceFilePath, saaDefinitionFile):
+            sys.exit('Timeline %s out of date. Abort.' % m7FilePath)
+        logger.info('Using orbit timeline %s.' % m7FilePath)
+        return timeline
+    timelineFilePath = getTimelineFilePath(m7FilePath)
+    if not os.path.exists(getMetaFilePath(timelineFilePath)) or\
+           not os.path.exists(timelineFilePath):
+        return None
+    timeline = pOrbitTimeline(timelineFilePath)
+    if not timeline.isUpToDate(m7FilePath, saaDefinitionFile):
+        logger.info('Orbit timeline %s out of date.' % timelineFilePath)
+        return None
+    logger.info('Using orbit timeline %s.' % timelineFilePath)
+    return timeline
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options] m7_file')
+    parser.add_option('-s', '--saa-definition', dest = 's', default = None,
+                      help = 'path to the SAA definition file')
+    parser.add_option('-o', '--output-file', dest = 'o', default = None,
+                      help = 'path to the output timeline file')
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.print_help()
+        parser.error('Please provide a (single) input M7 file.')
+    buildTimeline(args[0], options.s, options.o)
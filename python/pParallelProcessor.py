@@ -0,0 +1,300 @@
+## @package pParallelProcessor
+## @brief Multi-process (sharded) implementation of the event loop.
+#
+#  The input file is split into contiguous event-range shards, each one
+#  processed by an independent pDataProcessor object (with its own iterator
+#  chain and tree maker) running in a separate process. The per-shard ROOT
+#  trees and error handlers are eventually merged into the same output files
+#  that a serial run would produce.
+#
+#  The counters which are not reset between events (DiscardedDelta,
+#  DeadZoneDelta, PrescaledDelta and the time tone bookkeeping of the meta
+#  context processor) are stitched at the shard boundaries by processing
+#  the last event of the previous shard as a priming event (see
+#  pDataProcessor.PrimingEvent).
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pParallelProcessor')
+
+import os
+import sys
+import time
+import multiprocessing
+
+from pFastMonTreeMaker import FAST_MON_TREE_NAME
+from pErrorHandler     import pErrorHandler
+from pErrorStream      import removeSideFiles
+from pEventIndex       import pEventIndex
+from pSafeROOT         import ROOT
+
+
+## @brief The input file types supporting the parallel processing.
+#
+#  lsf files are not supported since the time hack rollover counter of the
+#  pMetaEventProcessor cannot be recovered from a single priming event.
+
+PARALLEL_FILE_TYPES = ['ldf', 'evt']
+
+
+## @brief Split a given number of events into (at most) numShards
+#  contiguous shards of (almost) equal size.
+#
+#  Return a list of (firstEvent, numEvents) tuples.
+## @param numEvents
+#  The total number of events.
+## @param numShards
+#  The number of shards.
+
+def getShards(numEvents, numShards):
+    numShards = max(1, min(numShards, numEvents))
+    shards = []
+    firstEvent = 0
+    for i in range(numShards):
+        shardSize = numEvents/numShards + int(i < numEvents % numShards)
+        shards.append((firstEvent, shardSize))
+        firstEvent += shardSize
+    return shards
+
+## @brief Process a single shard.
+#
+#  This is the target function of the worker processes.
+#
+#  The options of the parent data processor affecting the space craft
+#  position and geomagnetic variables are passed on to the shard, together
+#  with the SAA distance grid, if any (the workers are forked, so this
+#  comes at no cost). The geomagnetic timeline, if requested, is set up
+#  again, so that each shard only evaluates the buckets it needs.
+## @param dataProcessor
+#  The pDataProcessor object of the parent process (only used to retrieve
+#  the configuration).
+## @param firstEvent
+#  The index of the first event of the shard.
+## @param numEvents
+#  The number of events in the shard.
+## @param outputFilePath
+#  The path to the output ROOT file for the shard.
+## @param outputErrorFilePath
+#  The path to the error handler pickle file for the shard.
+
+def processShard(dataProcessor, firstEvent, numEvents, outputFilePath,
+                 outputErrorFilePath):
+    from pDataProcessor import pDataProcessor
+    shardProcessor = pDataProcessor(dataProcessor.InputFilePath,
+                                    dataProcessor.ConfigFilePath,
+                                    outputFilePath, None, outputErrorFilePath,
+                                    dataProcessor.InputMagic7FilePath,
+                                    dataProcessor.SaaDefinitionFile, False)
+    shardProcessor.FirstEvent = firstEvent
+    shardProcessor.StreamErrors = dataProcessor.StreamErrors
+    shardProcessor.M7RefreshInterval = dataProcessor.M7RefreshInterval
+    shardProcessor.M7Interpolation   = dataProcessor.M7Interpolation
+    if dataProcessor.M7Parser is not None and\
+           shardProcessor.M7Parser is not None:
+        polygon = dataProcessor.M7Parser.SAAPolygon
+        shardPolygon = shardProcessor.M7Parser.SAAPolygon
+        if polygon is not None and shardPolygon is not None:
+            shardPolygon.DistanceGrid = polygon.DistanceGrid
+            shardPolygon.GridStep     = polygon.GridStep
+    if dataProcessor.GeomagProcessor is not None and\
+           dataProcessor.GeomagProcessor.Timeline is not None and\
+           shardProcessor.GeomagProcessor is not None:
+        shardProcessor.GeomagProcessor.computeTimeline(\
+            shardProcessor.M7Parser, shardProcessor.M7Interpolation,\
+            dataProcessor.GeomagProcessor.TimelineBucket)
+    shardProcessor.startProcessing(numEvents)
+
+
+## @brief The parallel processor implementation.
+
+class pParallelProcessor:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param dataProcessor
+    #  The pDataProcessor object whose output files have to be filled.
+    ## @param numWorkers
+    #  The number of worker processes.
+
+    def __init__(self, dataProcessor, numWorkers):
+
+        ## @var DataProcessor
+        ## @brief The pDataProcessor object whose output files have to be
+        #  filled.
+
+        ## @var NumWorkers
+        ## @brief The number of worker processes.
+
+        self.DataProcessor = dataProcessor
+        self.NumWorkers    = numWorkers
+
+    ## @brief Return the number of events in the input file.
+    #
+    #  The event index of the input file is read from the sidecar file or,
+    #  if not available, built and written, so that the workers can seek
+    #  directly to the beginning of their shard.
+    ## @param self
+    #  The class instance.
+
+    def countEvents(self):
+        eventIndex = pEventIndex(self.DataProcessor.InputFilePath)
+        eventIndex.load()
+        return eventIndex.getNumEvents()
+
+    ## @brief Return the path to the output ROOT file of a given shard,
+    #  without the extension.
+    #
+    #  Only the extension of the file name is stripped, so that the shard
+    #  files always differ from the output file, no matter what the latter
+    #  (and the directories it lives in) are called.
+    ## @param self
+    #  The class instance.
+    ## @param shardId
+    #  The shard id.
+
+    def getShardBasePath(self, shardId):
+        basePath = os.path.splitext(self.DataProcessor.OutputFilePath)[0]
+        return '%s_shard%03d' % (basePath, shardId)
+
+    ## @brief Return the path to the output ROOT file for a given shard.
+    ## @param self
+    #  The class instance.
+    ## @param shardId
+    #  The shard id.
+
+    def getShardFilePath(self, shardId):
+        return '%s.root' % self.getShardBasePath(shardId)
+
+    ## @brief Return the path to the error handler pickle file for a given
+    #  shard.
+    ## @param self
+    #  The class instance.
+    ## @param shardId
+    #  The shard id.
+
+    def getShardErrorFilePath(self, shardId):
+        return '%s.errors.pickle' % self.getShardBasePath(shardId)
+
+    ## @brief Run the worker processes and merge their outputs.
+    ## @param self
+    #  The class instance.
+    ## @param maxNumEvents
+    #  The maximum number of events to be processed (-1 means all).
+
+    def run(self, maxNumEvents = -1):
+        firstEvent = self.DataProcessor.FirstEvent
+        numEvents = max(0, self.countEvents() - firstEvent)
+        if maxNumEvents >= 0:
+            numEvents = min(numEvents, maxNumEvents)
+        shards = [(firstEvent + shardStart, shardSize) for\
+                  (shardStart, shardSize) in\
+                  getShards(numEvents, self.NumWorkers)]
+        # The (empty) output tree of the parent process is closed before
+        # forking, so that the workers don't inherit an open ROOT file.
+        # The output file is overwritten when the shards are merged.
+        self.DataProcessor.TreeMaker.close()
+        logger.info('Processing started on %s.' % time.asctime())
+        logger.info('Using %d worker(s).' % len(shards))
+        self.DataProcessor.StartTime = time.time()
+        workers = []
+        for (shardId, (firstEvent, shardSize)) in enumerate(shards):
+            logger.info('Shard %d: events %d to %d.' %\
+                        (shardId, firstEvent, firstEvent + shardSize - 1))
+            args = (self.DataProcessor, firstEvent, shardSize,
+                    self.getShardFilePath(shardId),
+                    self.getShardErrorFilePath(shardId))
+            worker = multiprocessing.Process(target = processShard,
+                                             args = args)
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+        numFailures = len([worker for worker in workers if worker.exitcode])
+        if numFailures:
+            sys.exit('%d worker(s) failed. Abort.' % numFailures)
+        shardIds = range(len(shards))
+        deltaTime = self.mergeTrees(shardIds)
+        self.mergeErrorHandlers(shardIds)
+        self.cleanup(shardIds)
+        self.finalize(deltaTime)
+
+    ## @brief Merge the shard ROOT trees into the output file.
+    #
+    #  Return the time span (in seconds) of the merged data set.
+    ## @param self
+    #  The class instance.
+    ## @param shardIds
+    #  The list of shard ids.
+
+    def mergeTrees(self, shardIds):
+        logger.info('Merging ROOT trees...')
+        startTime = time.time()
+        chain = ROOT.TChain(FAST_MON_TREE_NAME)
+        for shardId in shardIds:
+            chain.Add(self.getShardFilePath(shardId))
+        tmin = chain.GetMinimum('event_timestamp')
+        tmax = chain.GetMaximum('event_timestamp')
+        chain.Merge(self.DataProcessor.OutputFilePath, 'fast')
+        logger.info('Done in %.2f s.' % (time.time() - startTime))
+        return int(tmax - tmin)
+
+    ## @brief Merge the shard error handlers (in event order) into the
+    #  error handler of the data processor.
+    #
+    #  When the error events are streamed, the ones streamed by the shards
+    #  are appended to the error stream of the data processor, so that the
+    #  xml error file lists all of them, as in a serial run. Otherwise the
+    #  samples of the shards are merged (see pErrorHandler.merge()).
+    ## @param self
+    #  The class instance.
+    ## @param shardIds
+    #  The list of shard ids.
+
+    def mergeErrorHandlers(self, shardIds):
+        logger.info('Merging error handlers...')
+        self.DataProcessor.NumEvents = 0
+        streamErrors = self.DataProcessor.StreamErrors
+        if streamErrors:
+            self.DataProcessor.ErrorHandler.openXmlStream(\
+                self.DataProcessor.OutputErrorFilePath)
+        for shardId in shardIds:
+            errorHandler = pErrorHandler()
+            errorHandler.load(self.getShardErrorFilePath(shardId))
+            self.DataProcessor.ErrorHandler.merge(errorHandler)
+            if streamErrors:
+                self.DataProcessor.ErrorHandler.ErrorStream.appendEvents(\
+                    self.getShardErrorFilePath(shardId))
+            self.DataProcessor.NumEvents += errorHandler.NumProcessedEvents
+
+    ## @brief Remove the shard files.
+    ## @param self
+    #  The class instance.
+    ## @param shardIds
+    #  The list of shard ids.
+
+    def cleanup(self, shardIds):
+        logger.info('Removing shard files...')
+        for shardId in shardIds:
+            os.remove(self.getShardFilePath(shardId))
+            os.remove(self.getShardErrorFilePath(shardId))
+            removeSideFiles(self.getShardErrorFilePath(shardId))
+
+    ## @brief Finalize the data processing (this is the equivalent of
+    #  pDataProcessor.finalize() for a parallel run).
+    ## @param self
+    #  The class instance.
+    ## @param deltaTime
+    #  The time span (in seconds) of the data set.
+
+    def finalize(self, deltaTime):
+        dataProcessor = self.DataProcessor
+        dataProcessor.StopTime = time.time()
+        elapsedTime = dataProcessor.StopTime - dataProcessor.StartTime
+        averageRate = dataProcessor.NumEvents/elapsedTime
+        logger.info('Processing stopped on %s.' % time.asctime())
+        logger.info('%d events processed in %.2f s (%.2f Hz).\n' %\
+                    (dataProcessor.NumEvents, elapsedTime, averageRate))
+        dataProcessor.ErrorHandler.NumProcessedEvents = dataProcessor.NumEvents
+        dataProcessor.ErrorHandler.SecondsElapsed     = deltaTime
+        dataProcessor.writeErrorOutput()
+        logger.info('Data processing complete.')
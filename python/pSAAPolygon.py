@@ -8,6 +8,7 @@ from pSafeROOT import ROOT
 import sys
 import os
 import time
+import numpy
 
 from math import sqrt, cos, sin, acos, pi, atan2
 
@@ -24,6 +25,15 @@ MIN_LATITUDE  = - MAX_LATITUDE
 MAX_LONGITUDE = 180.0
 MIN_LONGITUDE = - MAX_LONGITUDE
 
+# The distance grid (see pSAAPolygon.useDistanceGrid()) covers all the
+# longitudes and the latitudes reachable by the spacecraft (plus a margin),
+# with a step of SAA_GRID_STEP degrees. It is cached in a sidecar file next
+# to the SAA definition file, which is invalidated when the latter changes.
+SAA_GRID_STEP        = 0.1
+SAA_GRID_MIN_LATITUDE = MIN_LATITUDE - 5.
+SAA_GRID_MAX_LATITUDE = MAX_LATITUDE + 5.
+SAA_GRID_FILE_SUFFIX = '.grid.npz'
+
 EARTH_GRID = ROOT.TH2F('grid', 'grid', 1000, -180, 180, 1000, -180, 180)
 EARTH_GRID.GetXaxis().SetTitle('Longitude (degrees)')
 EARTH_GRID.GetYaxis().SetTitle('Latitude (degrees)')
@@ -34,6 +44,15 @@ def getDistanceOnSphere(v1, v2):
     A = DEG_TO_RAD*(v1.Lon - v2.Lon)
     return EARTH_RADIUS/1000.*acos(cos(b)*cos(c) + sin(b)*sin(c)*cos(A))
 
+# Vectorized version of getDistanceOnSphere() for numpy arrays of longitudes
+# and latitudes.
+def getDistancesOnSphere(lon1, lat1, lon2, lat2):
+    b = DEG_TO_RAD*(90 - lat1)
+    c = DEG_TO_RAD*(90 - lat2)
+    A = DEG_TO_RAD*(lon1 - lon2)
+    cosine = numpy.cos(b)*numpy.cos(c) + numpy.sin(b)*numpy.sin(c)*numpy.cos(A)
+    return EARTH_RADIUS/1000.*numpy.arccos(numpy.clip(cosine, -1., 1.))
+
 
 class pVertex:
 
@@ -104,6 +123,7 @@ class pSegment:
 class pSAAPolygon:
 
     def __init__(self, xmlFilePath):
+        self.XmlFilePath = xmlFilePath
         self.VertexList  = []
         self.SegmentList = []
         self.AngleList   = []
@@ -125,6 +145,15 @@ class pSAAPolygon:
         self.Center /= self.getNumVertices()
         for vertex in self.VertexList:
             self.AngleList.append(self.getAngleToCenter(vertex))
+        # Segment end points and angles to the center, as numpy arrays.
+        self.SegmentArray = numpy.array([(s.Vertex1.Lon, s.Vertex1.Lat,
+                                          s.Vertex2.Lon, s.Vertex2.Lat)\
+                                         for s in self.SegmentList], 'float64')
+        self.SegmentAngles = numpy.array([(self.getAngleToCenter(s.Vertex1),
+                                           self.getAngleToCenter(s.Vertex2))\
+                                          for s in self.SegmentList], 'float64')
+        self.DistanceGrid = None
+        self.GridStep     = None
 
     def getNumVertices(self):
         return len(self.VertexList)
@@ -153,9 +182,8 @@ class pSAAPolygon:
             shift = -180
         else:
             shift = 180
-        for segment in self.SegmentList:
-            angle1 = self.getAngleToCenter(segment.Vertex1)
-            angle2 = self.getAngleToCenter(segment.Vertex2)
+        for (segment, (angle1, angle2)) in zip(self.SegmentList,
+                                               self.SegmentAngles):
             if (angle > angle1 and angle < angle2):
                 s1 = segment
             if (angle + shift > angle1 and angle + shift < angle2):
@@ -211,7 +239,174 @@ class pSAAPolygon:
         d2 = self.__getDistanceToBorder(pVertex(-v.Lon, v.Lat))
         weight = 1 - abs(lonPadding - pad)/(2*lonPadding)
         return d1*weight + d2*(1 - weight)
-    
+
+    # Return the index of the last segment whose angular range contains
+    # each angle (-1 if none), as in getCrossSegments().
+    def __getLastSegments(self, angles):
+        mask = (angles[:, numpy.newaxis] > self.SegmentAngles[:, 0]) &\
+               (angles[:, numpy.newaxis] < self.SegmentAngles[:, 1])
+        last = mask.shape[1] - 1 - numpy.argmax(mask[:, ::-1], 1)
+        return numpy.where(mask.any(1), last, -1)
+
+    # Return the intersections between the straight lines joining the points
+    # to the SAA center and the given segments.
+    def __getIntersections(self, lons, lats, segments):
+        (x1, y1) = (self.Center.Lon, self.Center.Lat)
+        (x2, y2) = (lons, lats)
+        (x3, y3, x4, y4) = self.SegmentArray[numpy.maximum(segments, 0)].T
+        u = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3))/\
+            ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1))
+        return (x1 + u*(x2-x1), y1 + u*(y2-y1))
+
+    # Vectorized version of __getDistanceToBorder() (NaN is returned for the
+    # points where the scalar version would fail).
+    def __getDistancesToBorder(self, lons, lats):
+        angles = RAD_TO_DEG*numpy.arctan2(lons - self.Center.Lon,
+                                          lats - self.Center.Lat)
+        s1 = self.__getLastSegments(angles)
+        s2 = self.__getLastSegments(angles + numpy.where(angles > 0, -180, 180))
+        s2 = numpy.where(s2 < 0, len(self.SegmentList) - 1, s2)
+        (lon1, lat1) = self.__getIntersections(lons, lats, s1)
+        (lon2, lat2) = self.__getIntersections(lons, lats, s2)
+        d = numpy.minimum(getDistancesOnSphere(lons, lats, lon1, lat1),
+                          getDistancesOnSphere(lons, lats, lon2, lat2))
+        (x, y) = (self.Center.Lon, self.Center.Lat)
+        inside = getDistancesOnSphere(x, y, lons, lats) <\
+                 getDistancesOnSphere(x, y, lon1, lat1)
+        d = numpy.where(inside, -d, d)
+        return numpy.where(s1 < 0, numpy.nan, d)
+
+    # Vectorized (exact) version of getDistanceToBorder() for numpy arrays
+    # of longitudes and latitudes.
+    def getDistancesToBorder(self, lons, lats, lonPadding = 10.0):
+        lons = numpy.asarray(lons, 'float64').ravel()
+        lats = numpy.asarray(lats, 'float64').ravel()
+        errorSettings = numpy.seterr(divide = 'ignore', invalid = 'ignore')
+        try:
+            d = self.__getDistancesToBorder(lons, lats)
+            pad = numpy.abs(numpy.abs(lons) - 180)
+            mask = pad <= lonPadding
+            if mask.any():
+                d2 = self.__getDistancesToBorder(-lons[mask], lats[mask])
+                weight = 1 - numpy.abs(lonPadding - pad[mask])/(2*lonPadding)
+                d[mask] = d[mask]*weight + d2*(1 - weight)
+        finally:
+            numpy.seterr(**errorSettings)
+        return d
+
+    # Return the distance to the SAA border for a given longitude and
+    # latitude, interpolated on the distance grid if available (see
+    # useDistanceGrid()) or computed exactly otherwise.
+    # The exact calculation is also used next to the grid nodes where the
+    # distance is not defined (i.e. NaN), which would spoil the
+    # interpolation.
+    def getDistanceAt(self, lon, lat):
+        if self.DistanceGrid is not None:
+            x = (lon - MIN_LONGITUDE)/self.GridStep
+            y = (lat - SAA_GRID_MIN_LATITUDE)/self.GridStep
+            (numRows, numColumns) = self.DistanceGrid.shape
+            if x >= 0 and x <= numColumns - 1 and y >= 0 and y <= numRows - 1:
+                i = min(int(y), numRows - 2)
+                j = min(int(x), numColumns - 2)
+                fy = y - i
+                fx = x - j
+                g = self.DistanceGrid
+                d = float((1 - fy)*((1 - fx)*g[i, j] + fx*g[i, j + 1]) +\
+                          fy*((1 - fx)*g[i + 1, j] + fx*g[i + 1, j + 1]))
+                if not numpy.isnan(d):
+                    return d
+        return float(self.getDistancesToBorder([lon], [lat])[0])
+
+    # Vectorized version of getDistanceAt().
+    def getDistancesAt(self, lons, lats):
+        lons = numpy.asarray(lons, 'float64').ravel()
+        lats = numpy.asarray(lats, 'float64').ravel()
+        if self.DistanceGrid is None:
+            return self.getDistancesToBorder(lons, lats)
+        (numRows, numColumns) = self.DistanceGrid.shape
+        x = (lons - MIN_LONGITUDE)/self.GridStep
+        y = (lats - SAA_GRID_MIN_LATITUDE)/self.GridStep
+        inside = (x >= 0) & (x <= numColumns - 1) & (y >= 0) & (y <= numRows - 1)
+        i = numpy.clip(numpy.floor(y).astype('int64'), 0, numRows - 2)
+        j = numpy.clip(numpy.floor(x).astype('int64'), 0, numColumns - 2)
+        fy = y - i
+        fx = x - j
+        g = self.DistanceGrid
+        d = (1 - fy)*((1 - fx)*g[i, j] + fx*g[i, j + 1]) +\
+            fy*((1 - fx)*g[i + 1, j] + fx*g[i + 1, j + 1])
+        exact = ~inside | numpy.isnan(d)
+        if exact.any():
+            d[exact] = self.getDistancesToBorder(lons[exact], lats[exact])
+        return d
+
+    # Build the distance grid with the exact (vectorized) calculation.
+    def buildDistanceGrid(self, step = SAA_GRID_STEP):
+        logger.info('Building SAA distance grid (%.3f degrees step)...' % step)
+        startTime = time.time()
+        numColumns = int(round((MAX_LONGITUDE - MIN_LONGITUDE)/step)) + 1
+        numRows = int(round((SAA_GRID_MAX_LATITUDE -\
+                             SAA_GRID_MIN_LATITUDE)/step)) + 1
+        lons = MIN_LONGITUDE + step*numpy.arange(numColumns)
+        grid = numpy.zeros((numRows, numColumns), 'float64')
+        for i in xrange(numRows):
+            lat = SAA_GRID_MIN_LATITUDE + step*i
+            grid[i] = self.getDistancesToBorder(lons, numpy.repeat(lat, numColumns))
+        self.DistanceGrid = grid
+        self.GridStep = step
+        logger.info('Done in %.2f s.' % (time.time() - startTime))
+
+    def getGridFilePath(self):
+        return '%s%s' % (self.XmlFilePath, SAA_GRID_FILE_SUFFIX)
+
+    # The signature identifies the SAA definition file version and the grid
+    # parameters the sidecar file has been built with.
+    def getGridSignature(self, step):
+        stat = os.stat(self.XmlFilePath)
+        return numpy.array([stat.st_size, int(stat.st_mtime), step,
+                            SAA_GRID_MIN_LATITUDE, SAA_GRID_MAX_LATITUDE],
+                           'float64')
+
+    # Read the distance grid from the sidecar file (return False if it does
+    # not exist or if it's out of date).
+    def readDistanceGrid(self, step = SAA_GRID_STEP):
+        gridFilePath = self.getGridFilePath()
+        if not os.path.exists(gridFilePath):
+            return False
+        gridFile = numpy.load(gridFilePath)
+        signature = gridFile['signature']
+        if signature.shape != (5,) or\
+               not (signature == self.getGridSignature(step)).all():
+            gridFile.close()
+            logger.info('SAA distance grid %s out of date.' % gridFilePath)
+            return False
+        self.DistanceGrid = gridFile['grid']
+        self.GridStep = step
+        gridFile.close()
+        logger.info('SAA distance grid read from %s.' % gridFilePath)
+        return True
+
+    # Write the distance grid to the sidecar file (under a temporary name,
+    # then renamed).
+    def writeDistanceGrid(self):
+        gridFilePath = self.getGridFilePath()
+        tmpFilePath = '%s.%d.tmp' % (gridFilePath, os.getpid())
+        try:
+            tmpFile = file(tmpFilePath, 'wb')
+            numpy.savez(tmpFile, signature = self.getGridSignature(self.GridStep),
+                        grid = self.DistanceGrid)
+            tmpFile.close()
+            os.rename(tmpFilePath, gridFilePath)
+            logger.info('SAA distance grid written to %s.' % gridFilePath)
+        except (IOError, OSError), e:
+            logger.warn('Could not write SAA distance grid (%s).' % e)
+
+    # Use the distance grid in getDistanceAt() and getDistancesAt(), reading
+    # it from the sidecar file or building (and caching) it.
+    def useDistanceGrid(self, step = SAA_GRID_STEP):
+        if not self.readDistanceGrid(step):
+            self.buildDistanceGrid(step)
+            self.writeDistanceGrid()
+
 
 
 if __name__ == '__main__':
@@ -26,6 +26,169 @@ EARTH_FLAT      = 1/298.25
 EARTH_RADIUS    = 6378145
 SECONDS_PER_DAY = 24*60*60
 LAT_FOV = 70 # LAT Field of View for Earth limb is set to 80 degrees
+# Julian dates of the mission start (1 Jan 2001 00:00) and of J2000, see
+# pSCPosition.getMissionStart() and pSCPosition.getJ2000()
+MISSION_START_JD = 2451910.5
+J2000_JD         = 2451545.0
+
+
+## @brief Return the Julian Dates for an array of MET
+## @param mets
+#  The array of mission elapsed times in seconds
+def getJulianDatesFromMET(mets):
+    return MISSION_START_JD + numpy.asarray(mets, 'float64')/SECONDS_PER_DAY
+
+## @brief Return the Greenwich Meridian Sideral Times (in degrees) for an
+#  array of Julian Dates
+#
+#  Vectorized version of pSCPosition.getGMSTime().
+## @param julianDates
+#  The array of Julian Dates
+def getGMSTimes(julianDates):
+    jd = numpy.asarray(julianDates, 'float64') - 1.764810/86400.
+    hours = numpy.modf(jd - 0.5)[0]*24.
+    jd = jd - hours/24.
+    T = (jd - J2000_JD)/36525.
+    T1 = (24110.54841 + 8640184.812866*T + 0.093104*T*T - 0.0000062*T*T*T)/86400.0
+    gmst = numpy.modf(T1)[0]*24. + hours*1.00273790935
+    gmst = numpy.where(gmst < 0., gmst + 24., gmst)
+    gmst = numpy.where(gmst >= 24., gmst - 24., gmst)
+    return gmst*15.
+
+## @brief Return the (latitude, longitude, altitude) arrays for arrays of
+#  ECI J2000 positions
+#
+#  Vectorized version of pSCPosition.getEarthCoordinate(), the J2000 to
+#  TETE matrices being cached per time bucket (see pTETEUtils).
+## @param julianDates
+#  The array of Julian Dates
+## @param gmsTimes
+#  The array of Greenwich Meridian Sideral Times (in degrees)
+## @param positions
+#  The (n, 3) array of positions in meters
+def getEarthCoordinates(julianDates, gmsTimes, positions):
+    v = pTETEUtils.rotateJ2000toTETE(julianDates, positions)
+    (x, y, z) = (v[:, 0], v[:, 1], v[:, 2])
+    rho = numpy.sqrt(x*x + y*y)
+    theta = numpy.arctan2(rho, z)
+    phi = numpy.arctan2(y, x)
+    lat = math.pi/2. - theta
+    lon = numpy.fmod(phi - numpy.asarray(gmsTimes)*math.pi/180., 2*math.pi)
+    lon = numpy.where(lon < math.pi, lon + 2.*math.pi, lon)
+    lon = numpy.where(lon > math.pi, lon - 2.*math.pi, lon)
+    # See pSCPosition.getEarthCoordinate() for the corrections
+    lat = numpy.arctan(numpy.tan(lat))/((1. - EARTH_FLAT)*(1. - EARTH_FLAT))
+    alt = rho/numpy.cos(lat) -\
+          EARTH_RADIUS/(1000.*numpy.sqrt(1. - (0.00669454*numpy.sin(lat))**2))
+    return (numpy.degrees(lat), numpy.degrees(lon), alt)
+
+## @brief Return the (latitude, longitude, altitude) arrays for arrays of
+#  MET and ECI J2000 positions
+## @param mets
+#  The array of mission elapsed times in seconds
+## @param positions
+#  The (n, 3) array of positions in meters
+def getEarthCoordinatesFromMET(mets, positions):
+    julianDates = getJulianDatesFromMET(mets)
+    return getEarthCoordinates(julianDates, getGMSTimes(julianDates),
+                               positions)
+
+## @brief Return the (X, Y, Z) axis vectors, as (n, 3) arrays, for an
+#  (n, 4) array of attitude quaternions (x, y, z, w)
+#
+#  Vectorized version of pSCPosition.setAllAxisVectors().
+## @param quaternions
+#  The (n, 4) array of quaternions
+def getAxisVectors(quaternions):
+    q = numpy.asarray(quaternions, 'float64')
+    q = q/numpy.sqrt((q*q).sum(1))[:, numpy.newaxis]
+    (x, y, z, w) = (q[:, 0], q[:, 1], q[:, 2], q[:, 3])
+    xaxis = numpy.column_stack((1 - 2*(y*y + z*z), 2*(x*y + w*z), 2*(x*z - w*y)))
+    yaxis = numpy.column_stack((2*(x*y - w*z), 1 - 2*(x*x + z*z), 2*(y*z + w*x)))
+    zaxis = numpy.column_stack((2*(x*z + w*y), 2*(y*z - w*x), 1 - 2*(x*x + y*y)))
+    return (xaxis, yaxis, zaxis)
+
+## @brief Return the (Ra, Dec) arrays for an (n, 3) array of axis vectors
+#
+#  Vectorized version of pSCPosition.getAxisRaDec().
+## @param axes
+#  The (n, 3) array of axis vectors
+def getAxesRaDec(axes):
+    (x, y, z) = (axes[:, 0], axes[:, 1], axes[:, 2])
+    dec = 90 - numpy.degrees(numpy.arctan2(numpy.sqrt(x*x + y*y), z))
+    ra = numpy.degrees(numpy.arctan2(y, x))
+    ra = numpy.where(ra < 0, ra + 360, ra)
+    return (ra, dec)
+
+## @brief Return the rotation matrix from equatorial to galactic coordinates
+#  used in pSCPosition.processZGalacticLB()
+def getGalacticMatrix():
+    def rotateZ(angle):
+        (c, s) = (math.cos(angle), math.sin(angle))
+        return numpy.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], 'float64')
+    def rotateX(angle):
+        (c, s) = (math.cos(angle), math.sin(angle))
+        return numpy.array([[1, 0, 0], [0, c, -s], [0, s, c]], 'float64')
+    matrix = rotateZ(-282.8592*math.pi/180)
+    matrix = numpy.dot(rotateX(-62.8717 *math.pi/180), matrix)
+    matrix = numpy.dot(rotateZ( 32.93224*math.pi/180), matrix)
+    return numpy.dot(rotateZ(math.pi), matrix)
+
+## @brief Return a dictionary of arrays with all the space craft quantities
+#  (the keys being the names of the corresponding tree variables, see
+#  pGeomagProcessor.process()) for arrays of MET, positions and attitude
+#  quaternions
+#
+#  This is the vectorized version of all the pSCPosition calculations.
+## @param mets
+#  The array of mission elapsed times in seconds
+## @param positions
+#  The (n, 3) array of ECI J2000 positions in meters
+## @param quaternions
+#  The (n, 4) array of attitude quaternions (x, y, z, w)
+def getSCQuantities(mets, positions, quaternions):
+    positions = numpy.asarray(positions, 'float64')
+    quaternions = numpy.asarray(quaternions, 'float64')
+    quantities = {}
+    errorSettings = numpy.seterr(divide = 'ignore', invalid = 'ignore')
+    try:
+        (lat, lon, alt) = getEarthCoordinatesFromMET(mets, positions)
+        quantities['spacecraft_latitude']  = lat
+        quantities['spacecraft_longitude'] = lon
+        quantities['spacecraft_altitude']  = (alt - EARTH_RADIUS)/1000.
+        # Euler angles, see pSCPosition.getEulerAngles()
+        (q1, q2, q3, q0) = (quaternions[:, 0], quaternions[:, 1],
+                            quaternions[:, 2], quaternions[:, 3])
+        quantities['spacecraft_pitch'] = numpy.degrees(numpy.arctan(\
+            2*(q0*q1 + q2*q3)/(1 - 2*(q1*q1 + q2*q2))))
+        quantities['spacecraft_roll']  = numpy.degrees(numpy.arcsin(\
+            numpy.clip(2*(q0*q2 - q3*q1), -1, 1)))
+        quantities['spacecraft_yaw']   = numpy.degrees(numpy.arctan(\
+            2*(q0*q3 + q1*q2)/(1 - 2*(q2*q2 + q3*q3))))
+        (xaxis, yaxis, zaxis) = getAxisVectors(quaternions)
+        # Rock angle, see pSCPosition.setRockAngle()
+        cosine = (zaxis*positions).sum(1)/\
+                 numpy.sqrt((zaxis*zaxis).sum(1)*(positions*positions).sum(1))
+        rock = numpy.degrees(numpy.arccos(numpy.clip(cosine, -1, 1)))
+        quantities['spacecraft_rock'] = rock
+        for (name, axis) in [('x', xaxis), ('y', yaxis), ('z', zaxis)]:
+            (ra, dec) = getAxesRaDec(axis)
+            quantities['spacecraft_%sra' % name]  = ra
+            quantities['spacecraft_%sdec' % name] = dec
+        (l, b) = getAxesRaDec(numpy.dot(zaxis, getGalacticMatrix().T))
+        quantities['spacecraft_zgalL'] = l
+        quantities['spacecraft_zgalB'] = b
+        # Horizon and earth limb, see pSCPosition.getHorizonAngle() and
+        # pSCPosition.getEarthLimb()
+        horizon = 180 - numpy.degrees(numpy.arcsin(EARTH_RADIUS/(alt + 10000)))
+        limb = numpy.degrees(2*numpy.arccos(math.cos(math.radians(LAT_FOV))/\
+                                            numpy.cos(numpy.radians(rock - horizon))))
+        limb = numpy.where(horizon - (rock + LAT_FOV) > 0, 0., limb)
+        quantities['spacecraft_earthlimb']     = horizon
+        quantities['spacecraft_earthlimb_fov'] = limb
+    finally:
+        numpy.seterr(**errorSettings)
+    return quantities
 
 ## @brief The space craft position implementation.
 
@@ -123,6 +286,12 @@ class pSCPosition:
        
        ## @var ZGalB
        ## @brief The space craft Z axis pointing direction in galactic coordinates B       
+
+       ## @var DistanceToSAA
+       ## @brief The distance to the SAA border
+
+       # All the derived quantities are computed on first access (see the
+       # process* methods) and cached.
        
 
        self.YearFloat  = yearfloat
@@ -158,7 +327,10 @@ class pSCPosition:
        self.ZGalacticLB = (None, None)
        self.ZGalL = None
        self.ZGalB = None
-       self.processCoordinates()
+       self.Yaxis = (None, None)
+       self.YRa   = None
+       self.YDec  = None
+       self.DistanceToSAA = None
        
     ## @brief Compare 2 space craft positions using the time stamp in seconds
     ## @param self
@@ -170,6 +342,7 @@ class pSCPosition:
     ## @param self
     #  The class instance.
     def __str__(self):
+        self.processCoordinates()
         return '\nSpace Craft Position parameters:\n'                   	                       \
 	      +'MetInSeconds                 	     = %d\n'	       % self.MetInSeconds             \
 	      +'MetMicroSeconds              	     = %s\n'	       % self.MetMicroSeconds          \
@@ -210,42 +383,42 @@ class pSCPosition:
 	return self.YearFloat 
     ## @brief Returns the space craft Latitude.
     #
-    #  If Latitude is None, try to process the coordinates before giving Latitude
+    #  If Latitude is None, compute it (and the related quantities) before giving Latitude
     ## @param self
     #  The class instance.
     def getLatitude(self):
 	if self.Latitude is None:
-	    self.processCoordinates()
+	    self.processEarthCoordinates()
 	return self.Latitude 
     
     ## @brief Returns the space craft Longitude.
     #
-    #  If Longitude is None, try to process the coordinates before giving Longitude
+    #  If Longitude is None, compute it (and the related quantities) before giving Longitude
     ## @param self
     #  The class instance.
     def getLongitude(self):
 	if self.Longitude is None:
-	    self.processCoordinates()
+	    self.processEarthCoordinates()
 	return self.Longitude 
 
     ## @brief Returns the space craft Altitude.
     #
-    #  If Altitude is None, try to process the coordinates before giving Altitude
+    #  If Altitude is None, compute it (and the related quantities) before giving Altitude
     ## @param self
     #  The class instance.
     def getAltitude(self):
 	if self.Altitude is None:
-	    self.processCoordinates()
+	    self.processEarthCoordinates()
 	return self.Altitude 
 
     ## @brief Returns the space craft Altitude relative to the earth surface.
     #
-    #  If Altitude is None, try to process the coordinates before giving Altitude minus the Earth radius.
+    #  If Altitude is None, compute it (and the related quantities) before giving Altitude minus the Earth radius.
     ## @param self
     #  The class instance.
     def getRelativeAltitude(self):
 	if self.Altitude is None:
-	    self.processCoordinates()
+	    self.processEarthCoordinates()
 	return self.Altitude - EARTH_RADIUS
 
     ## @brief Returns the current value of position.
@@ -256,143 +429,143 @@ class pSCPosition:
 
     ## @brief Returns the space craft Pitch (Theta).
     #
-    #  If Pitch is None, try to process the coordinates before giving Pitch
+    #  If Pitch is None, compute it (and the related quantities) before giving Pitch
     ## @param self
     #  The class instance.
     def getPitch(self):
 	if self.Pitch is None:
-	    self.processCoordinates()
+	    self.processEulerAngles()
 	return self.Pitch
 
     ## @brief Returns the space craft Roll (Phi).
     #
-    #  If Roll is None, try to process the coordinates before giving Roll
+    #  If Roll is None, compute it (and the related quantities) before giving Roll
     ## @param self
     #  The class instance.
     def getRoll(self):
 	if self.Roll is None:
-	    self.processCoordinates()
+	    self.processEulerAngles()
 	return self.Roll
 
     ## @brief Returns the space craft Yaw (Psi).
     #
-    #  If Yaw is None, try to process the coordinates before giving Yaw
+    #  If Yaw is None, compute it (and the related quantities) before giving Yaw
     ## @param self
     #  The class instance.
     def getYaw(self):
 	if self.Yaw is None:
-	    self.processCoordinates()
+	    self.processEulerAngles()
 	return self.Yaw
 
     ## @brief Returns the space craft Rock angle
     #
-    #  If Rock is None, try to process the coordinates before giving Rock
+    #  If Rock is None, compute it (and the related quantities) before giving Rock
     ## @param self
     #  The class instance.
     def getRockAngle(self):
 	if self.RockAngle is None:
-	    self.processCoordinates()
+	    self.processRockAngle()
 	return self.RockAngle
 
 
     ## @brief Returns the space craft X axis RA
     #
-    #  If XRa is None, try to process the coordinates before giving XRa
+    #  If XRa is None, compute it (and the related quantities) before giving XRa
     ## @param self
     #  The class instance.
     def getXRa(self):
 	if self.XRa is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.XRa
 
     ## @brief Returns the space craft X axis Dec
     #
-    #  If XDec is None, try to process the coordinates before giving XDec
+    #  If XDec is None, compute it (and the related quantities) before giving XDec
     ## @param self
     #  The class instance.
     def getXDec(self):
 	if self.XDec is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.XDec
 
     ## @brief Returns the space craft Y aYis RA
     #
-    #  If YRa is None, try to process the coordinates before giving YRa
+    #  If YRa is None, compute it (and the related quantities) before giving YRa
     ## @param self
     #  The class instance.
     def getYRa(self):
 	if self.YRa is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.YRa
 
     ## @brief Returns the space craft Y aYis Dec
     #
-    #  If YDec is None, try to process the coordinates before giving YDec
+    #  If YDec is None, compute it (and the related quantities) before giving YDec
     ## @param self
     #  The class instance.
     def getYDec(self):
 	if self.YDec is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.YDec
 
     ## @brief Returns the space craft Z axis RA
     #
-    #  If ZRa is None, try to process the coordinates before giving ZRa
+    #  If ZRa is None, compute it (and the related quantities) before giving ZRa
     ## @param self
     #  The class instance.
     def getZRa(self):
 	if self.ZRa is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.ZRa
 
     ## @brief Returns the space craft Z axis Dec
     #
-    #  If ZDec is None, try to process the coordinates before giving ZDec
+    #  If ZDec is None, compute it (and the related quantities) before giving ZDec
     ## @param self
     #  The class instance.
     def getZDec(self):
 	if self.ZDec is None:
-	    self.processCoordinates()
+	    self.processAxisPointing()
 	return self.ZDec
 
     ## @brief Returns the space craft Z axis L pointing in galactic coordinate
     #
-    #  If ZGalL is None, try to process the coordinates before giving ZGalL
+    #  If ZGalL is None, compute it (and the related quantities) before giving ZGalL
     ## @param self
     #  The class instance.
     def getZGalL(self):
 	if self.ZGalL is None:
-	    self.processCoordinates()
+	    self.processZGalactic()
 	return self.ZGalL
 
     ## @brief Returns the space craft Z axis B pointing in galactic coordinate
     #
-    #  If ZGalB is None, try to process the coordinates before giving ZGalB
+    #  If ZGalB is None, compute it (and the related quantities) before giving ZGalB
     ## @param self
     #  The class instance.
     def getZGalB(self):
 	if self.ZGalB is None:
-	    self.processCoordinates()
+	    self.processZGalactic()
 	return self.ZGalB
 	
     ## @brief Returns the angle between zenith 
     #  and earth horizon
-    #  If HorizonAngle is None, try to process the coordinates before giving HorizonAngle
+    #  If HorizonAngle is None, compute it (and the related quantities) before giving HorizonAngle
     ## @param self
     #  The class instance.
     def getLimbAngle(self):
 	if self.HorizonAngle is None:
-	    self.processCoordinates()
+	    self.processEarthLimb()
 	return self.HorizonAngle
 
     ## @brief Returns the arc angle of the earth limb within the LAT FOV
     #
-    #  If ArcAngleEarthLimb is None, try to process the coordinates before giving ArcAngleEarthLimb
+    #  If ArcAngleEarthLimb is None, compute it (and the related quantities) before giving ArcAngleEarthLimb
     ## @param self
     #  The class instance.
     def getArcAngleEarthLimb(self):
 	if self.ArcAngleEarthLimb is None:
-	    self.processCoordinates()
+	    self.processEarthLimb()
 	return self.ArcAngleEarthLimb
 
     ## @brief Returns the Julian date for a given Gregorian date
@@ -499,9 +672,24 @@ class pSCPosition:
 
     ## @brief Calculate and return the space craft position in Earth coordinates
     #  Routine was checked against astro package code, Jun 13th 2008 JB
+    #
+    #  The actual calculation is done by the batch getEarthCoordinates()
+    #  function, the original code being kept below for reference. The two
+    #  agree within the tolerance of the bucketed J2000 to TETE matrices
+    #  (see pTETEUtils.TETE_MATRIX_BUCKET).
     ## @param self
     #  The class instance.
     def getEarthCoordinate(self):
+        (lat, lon, alt) = getEarthCoordinates([self.JulianDate],
+                                              [self.GMSTime],
+                                              [self.Position])
+        return (float(lat[0]), float(lon[0]), float(alt[0]))
+
+    ## @brief Calculate and return the space craft position in Earth
+    #  coordinates, one position at a time (reference implementation)
+    ## @param self
+    #  The class instance.
+    def getEarthCoordinateReference(self):
  	x = self.Position[0]
 	y = self.Position[1]
 	z = self.Position[2]
@@ -656,45 +844,113 @@ class pSCPosition:
     def getZaxisPointing(self):        
         return self.getAxisRaDec(self.ZaxisVector)
 
+    ## @brief Returns the distance to the SAA border (-9999 if no SAA
+    #  definition is available).
+    #
+    #  If DistanceToSAA is None, compute it before giving DistanceToSAA
+    ## @param self
+    #  The class instance.
     def getDistanceToSAA(self):
         if self.SAAPolygon is None:
             return -9999
-        else:
-            vertex = pVertex(self.getLongitude(), self.getLatitude())
-            return self.SAAPolygon.getDistanceToBorder(vertex)
+        if self.DistanceToSAA is None:
+            self.DistanceToSAA = self.SAAPolygon.getDistanceAt(self.getLongitude(),
+                                                               self.getLatitude())
+        return self.DistanceToSAA
 
-    ## @brief Call processing of the earth coordinates
+    ## @brief Compute the axis vectors (if not done yet)
     ## @param self
     #  The class instance.
-    def processCoordinates(self):
-	self.setAllAxisVectors()
-	self.setRockAngle()
+    def processAxisVectors(self):
+        if self.ZaxisVector is None:
+            self.setAllAxisVectors()
+
+    ## @brief Compute the earth coordinates (if not done yet)
+    ## @param self
+    #  The class instance.
+    def processEarthCoordinates(self):
+        if self.Latitude is not None:
+            return
         self.JulianDate = self.getJulianDateFromMET(self.MetInSeconds)
         self.GMSTime    = self.getGMSTime(self.JulianDate)
         self.EarthCoordinates = self.getEarthCoordinate()
         self.Latitude         = self.EarthCoordinates[0]
         self.Longitude        = self.EarthCoordinates[1]
         self.Altitude         = self.EarthCoordinates[2]
-	self.PitchRollYaw     = self.getEulerAngles()
-	self.Pitch 	      = self.PitchRollYaw[0]
-	self.Roll  	      = self.PitchRollYaw[1]
-	self.Yaw   	      = self.PitchRollYaw[2]
-	self.Xaxis = self.getXaxisPointing()
-	self.XRa   = self.Xaxis[0]
-	self.XDec  = self.Xaxis[1]
-	self.Yaxis = self.getYaxisPointing()
-	self.YRa   = self.Yaxis[0]
-	self.YDec  = self.Yaxis[1]
-	self.Zaxis = self.getZaxisPointing()
-	self.ZRa   = self.Zaxis[0]
-	self.ZDec  = self.Zaxis[1]
-	self.HorizonAngle      = self.getHorizonAngle()
-	self.ArcAngleEarthLimb = self.getEarthLimb()
-	self.ZGalacticLB = self.processZGalacticLB()
-	self.ZGalL = self.ZGalacticLB[0]
-	self.ZGalB = self.ZGalacticLB[1]
-	
-	
+
+    ## @brief Compute the Euler angles (if not done yet)
+    ## @param self
+    #  The class instance.
+    def processEulerAngles(self):
+        if self.Pitch is not None:
+            return
+        self.PitchRollYaw = self.getEulerAngles()
+        self.Pitch        = self.PitchRollYaw[0]
+        self.Roll         = self.PitchRollYaw[1]
+        self.Yaw          = self.PitchRollYaw[2]
+
+    ## @brief Compute the rock angle (if not done yet)
+    ## @param self
+    #  The class instance.
+    def processRockAngle(self):
+        if self.RockAngle is not None:
+            return
+        self.processAxisVectors()
+        self.setRockAngle()
+
+    ## @brief Compute the axis pointing directions (if not done yet)
+    ## @param self
+    #  The class instance.
+    def processAxisPointing(self):
+        if self.ZRa is not None:
+            return
+        self.processAxisVectors()
+        self.Xaxis = self.getXaxisPointing()
+        self.XRa   = self.Xaxis[0]
+        self.XDec  = self.Xaxis[1]
+        self.Yaxis = self.getYaxisPointing()
+        self.YRa   = self.Yaxis[0]
+        self.YDec  = self.Yaxis[1]
+        self.Zaxis = self.getZaxisPointing()
+        self.ZRa   = self.Zaxis[0]
+        self.ZDec  = self.Zaxis[1]
+
+    ## @brief Compute the horizon angle and the earth limb arc angle (if not
+    #  done yet)
+    ## @param self
+    #  The class instance.
+    def processEarthLimb(self):
+        if self.ArcAngleEarthLimb is not None:
+            return
+        self.processEarthCoordinates()
+        self.processRockAngle()
+        self.HorizonAngle      = self.getHorizonAngle()
+        self.ArcAngleEarthLimb = self.getEarthLimb()
+
+    ## @brief Compute the Z axis galactic coordinates (if not done yet)
+    ## @param self
+    #  The class instance.
+    def processZGalactic(self):
+        if self.ZGalL is not None:
+            return
+        self.processAxisVectors()
+        self.ZGalacticLB = self.processZGalacticLB()
+        self.ZGalL = self.ZGalacticLB[0]
+        self.ZGalB = self.ZGalacticLB[1]
+
+    ## @brief Call processing of all the coordinates
+    #
+    #  Only the quantities not computed yet are processed.
+    ## @param self
+    #  The class instance.
+    def processCoordinates(self):
+        self.processEarthCoordinates()
+        self.processEulerAngles()
+        self.processAxisPointing()
+        self.processEarthLimb()
+        self.processZGalactic()
+
+
 if __name__ == '__main__':
     sc = pSCPosition(2008.5, (252672900, 0))
     print sc
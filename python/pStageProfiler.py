@@ -0,0 +1,139 @@
+## @package pStageProfiler
+## @brief Wall time accounting for the stages of the event pipeline.
+#
+#  The profiler works by replacing selected methods of the pipeline objects
+#  (on the instances, not on the classes) with wrappers accumulating the
+#  number of calls and the wall time spent in each of them. When profiling
+#  is not requested no method is wrapped and the event loop runs exactly
+#  the same code as before.
+#
+#  Since the LDF iterators call back into python, the stages are nested:
+#  the time of the event iteration stage includes the one of the component
+#  handlers.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pStageProfiler')
+
+import time
+
+
+## @brief The stage profiler implementation.
+
+class pStageProfiler:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+
+    def __init__(self):
+
+        ## @var StageNames
+        ## @brief The list of the stage names, in order of registration.
+
+        ## @var NumCalls
+        ## @brief The dictionary of the number of calls, indexed by stage.
+
+        ## @var ElapsedTimes
+        ## @brief The dictionary of the wall time (in seconds), indexed by
+        #  stage.
+
+        self.StageNames   = []
+        self.NumCalls     = {}
+        self.ElapsedTimes = {}
+
+    ## @brief Add a stage (nothing is done if it already exists).
+    ## @param self
+    #  The class instance.
+    ## @param stageName
+    #  The stage name.
+
+    def addStage(self, stageName):
+        if stageName not in self.StageNames:
+            self.StageNames.append(stageName)
+            self.NumCalls[stageName]     = 0
+            self.ElapsedTimes[stageName] = 0.0
+
+    ## @brief Wrap a method of an object, so that the calls are accounted
+    #  for in a given stage.
+    #
+    #  Several methods can be accounted for in the same stage.
+    ## @param self
+    #  The class instance.
+    ## @param obj
+    #  The object (nothing is done if None).
+    ## @param methodName
+    #  The name of the method.
+    ## @param stageName
+    #  The stage name.
+
+    def instrument(self, obj, methodName, stageName):
+        if obj is None:
+            return
+        self.addStage(stageName)
+        method = getattr(obj, methodName)
+        numCalls = self.NumCalls
+        elapsedTimes = self.ElapsedTimes
+        def wrapper(*args):
+            startTime = time.time()
+            try:
+                return method(*args)
+            finally:
+                elapsedTimes[stageName] += time.time() - startTime
+                numCalls[stageName] += 1
+        setattr(obj, methodName, wrapper)
+        logger.debug('Profiling %s.%s() as %s.' %\
+                     (obj.__class__.__name__, methodName, stageName))
+
+    ## @brief Return the list of the (stage name, number of calls, elapsed
+    #  time) tuples, in order of registration.
+    ## @param self
+    #  The class instance.
+
+    def getStages(self):
+        return [(stageName, self.NumCalls[stageName],\
+                 self.ElapsedTimes[stageName]) for stageName in\
+                self.StageNames]
+
+    ## @brief Write the profiling information with a pXmlWriter object.
+    ## @param self
+    #  The class instance.
+    ## @param writer
+    #  The pXmlWriter object.
+    ## @param totalTime
+    #  The total time of the event loop (in seconds).
+
+    def writeXml(self, writer, totalTime):
+        writer.openTag('profile')
+        writer.indent()
+        for (stageName, numCalls, elapsedTime) in self.getStages():
+            if numCalls:
+                timePerCall = elapsedTime/numCalls
+            else:
+                timePerCall = 0.0
+            if totalTime > 0:
+                fraction = elapsedTime/totalTime
+            else:
+                fraction = 0.0
+            writer.writeTag('stage', {'name'          : stageName,
+                                      'calls'         : numCalls,
+                                      'seconds'       : '%.6f' % elapsedTime,
+                                      'seconds_per_call': '%.3e' % timePerCall,
+                                      'fraction'      : '%.4f' % fraction})
+        writer.backup()
+        writer.closeTag('profile')
+
+    ## @brief Class representation.
+    ## @param self
+    #  The class instance.
+
+    def __str__(self):
+        text = '%-20s %10s %12s %12s\n' % ('Stage', 'Calls', 'Time (s)',\
+                                            'Time/call (s)')
+        for (stageName, numCalls, elapsedTime) in self.getStages():
+            if numCalls:
+                timePerCall = elapsedTime/numCalls
+            else:
+                timePerCall = 0.0
+            text += '%-20s %10d %12.3f %12.3e\n' % (stageName, numCalls,\
+                                                     elapsedTime, timePerCall)
+        return text
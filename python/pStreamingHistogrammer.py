@@ -0,0 +1,300 @@
+## @package pStreamingHistogrammer
+## @brief Event-by-event filling of the output-list histograms.
+#
+#  In the standard processing the histograms defined in the output lists
+#  are created by pFastMonTreeProcessor after the event loop, re-reading
+#  the whole ROOT tree. When the streaming mode is enabled, the TH1F and
+#  TH2F plots whose expressions are plain (possibly indexed) tree variables
+#  and whose cuts can be evaluated on the tree variables of the current
+#  event are instead filled at the end of the processing of each event
+#  (see pDataProcessor.__postEvent()), so that they are available as soon
+#  as the event loop is over.
+#
+#  The histograms are filled the same way TTree::Project() does (one
+#  TH1::FillN() call per event, with the cut value used as a weight), so the
+#  output is the same as in the standard processing.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pStreamingHistogrammer')
+
+import re
+import numpy
+import __future__
+
+from pSafeROOT         import ROOT
+from pHistogramPlanner import TERM_PATTERN
+
+## @brief Regular expression matching the (possibly indexed) variables
+#  in a cut.
+
+CUT_VARIABLE_PATTERN = re.compile('(?<![\w.])([A-Za-z_]\w*)((?:\[\d+\])*)')
+
+## @brief Regular expression matching the operators whose precedence (or
+#  meaning) is different in python and in the TTreeFormula syntax.
+
+CUT_UNSUPPORTED_PATTERN = re.compile('!(?!=)|(?<!&)&(?!&)|(?<!\|)\|(?!\|)|'+\
+                                     '\^|::|"|\'')
+
+## @brief The (TTreeFormula, python) replacement pairs for the logical
+#  operators.
+
+CUT_OPERATORS = [('&&', ' and '), ('||', ' or ')]
+
+
+## @brief Class describing a histogram filled event by event.
+
+class pStreamedHistogram:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The (empty) ROOT histogram.
+    ## @param values
+    #  The list of the numpy arrays (views into the tree variables) holding
+    #  the values for the x (and y) axis.
+    ## @param cut
+    #  The cut.
+
+    def __init__(self, histogram, values, cut):
+
+        ## @var Histogram
+        ## @brief The ROOT histogram.
+
+        ## @var Values
+        ## @brief The list of the numpy arrays holding the values for the
+        #  x (and y) axis.
+
+        ## @var NumValues
+        ## @brief The number of values filled per event.
+
+        ## @var Weights
+        ## @brief The array of unit weights.
+
+        ## @var Cut
+        ## @brief The cut.
+
+        self.Histogram = histogram
+        self.Values    = values
+        self.NumValues = max([len(value) for value in values])
+        self.Weights   = numpy.ones((self.NumValues), 'float64')
+        self.Cut       = cut
+
+    ## @brief Fill the histogram with the values of the current event.
+    ## @param self
+    #  The class instance.
+    ## @param weight
+    #  The value of the cut for the current event.
+
+    def fill(self, weight):
+        values = [numpy.repeat(value.astype('float64'),\
+                               self.NumValues/len(value))\
+                  for value in self.Values]
+        if weight == 1:
+            weights = self.Weights
+        else:
+            weights = self.Weights*weight
+        self.Histogram.FillN(*([self.NumValues] + values + [weights]))
+
+
+## @brief The streaming histogrammer implementation.
+
+class pStreamingHistogrammer:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  The xml parser object (pXmlParser instance).
+    ## @param treeMaker
+    #  The tree maker object (pFastMonTreeMaker instance).
+
+    def __init__(self, xmlParser, treeMaker):
+
+        ## @var TreeMaker
+        ## @brief The tree maker object.
+
+        ## @var Histograms
+        ## @brief The list of pStreamedHistogram objects.
+
+        ## @var Cuts
+        ## @brief Dictionary of the compiled (python) cuts, indexed by cut.
+
+        ## @var StreamedReps
+        ## @brief The list of the keys (in the pXmlParser
+        #  EnabledPlotRepsDict) of the plots filled event by event.
+
+        ## @var MinTimestamp
+        ## @brief The minimum event time stamp.
+
+        ## @var MaxTimestamp
+        ## @brief The maximum event time stamp.
+
+        self.TreeMaker    = treeMaker
+        self.Histograms   = []
+        self.Cuts         = {}
+        self.StreamedReps = []
+        self.MinTimestamp = None
+        self.MaxTimestamp = None
+        keys = xmlParser.EnabledPlotRepsDict.keys()
+        keys.sort()
+        addDirectory = ROOT.TH1.AddDirectoryStatus()
+        ROOT.TH1.AddDirectory(False)
+        for key in keys:
+            if self.__addPlotRep(xmlParser.EnabledPlotRepsDict[key]):
+                self.StreamedReps.append(key)
+        ROOT.TH1.AddDirectory(addDirectory)
+        logger.info('%d out of %d plot(s) filled event by event.' %\
+                    (len(self.StreamedReps), len(keys)))
+
+    ## @brief Return True if a plot is filled event by event.
+    ## @param self
+    #  The class instance.
+    ## @param key
+    #  The key of the plot in the pXmlParser EnabledPlotRepsDict.
+
+    def isStreamed(self, key):
+        return key in self.StreamedReps
+
+    ## @brief Return the array of a (possibly indexed) tree variable as a
+    #  flat numpy view, or None if the variable does not exist.
+    ## @param self
+    #  The class instance.
+    ## @param expression
+    #  The expression.
+
+    def __getValues(self, expression):
+        match = TERM_PATTERN.match(expression)
+        if match is None:
+            return None
+        try:
+            array = self.TreeMaker.VariablesDictionary[match.group(1)]
+        except KeyError:
+            return None
+        indices = tuple([int(index) for index in\
+                         re.findall('\d+', match.group(2))])
+        if len(indices) > array.ndim:
+            return None
+        for (index, dimension) in zip(indices, array.shape):
+            if index >= dimension:
+                return None
+        if indices and len(indices) == array.ndim:
+            values = array[indices[:-1]][indices[-1]:indices[-1] + 1]
+        else:
+            values = array[indices]
+        return values.reshape(-1)
+
+    ## @brief Translate a cut into a compiled python expression.
+    #
+    #  Return None if the cut is not supported (i.e. it uses functions or
+    #  operators with different semantics in python, or it's not evaluated
+    #  once per event).
+    ## @param self
+    #  The class instance.
+    ## @param cut
+    #  The cut.
+
+    def __compileCut(self, cut):
+        if CUT_UNSUPPORTED_PATTERN.search(cut):
+            return None
+        for (rootOperator, pythonOperator) in CUT_OPERATORS:
+            cut = cut.replace(rootOperator, pythonOperator)
+        for match in CUT_VARIABLE_PATTERN.finditer(cut):
+            if match.group(1) in ['and', 'or']:
+                continue
+            values = self.__getValues(match.group(0))
+            if values is None or len(values) != 1:
+                return None
+        expression = CUT_VARIABLE_PATTERN.sub(self.__translateCutVariable,\
+                                              cut)
+        try:
+            return compile(expression, '<cut>', 'eval',\
+                           __future__.division.compiler_flag)
+        except SyntaxError:
+            return None
+
+    ## @brief Translate a variable of a cut into a python expression.
+    ## @param self
+    #  The class instance.
+    ## @param match
+    #  The match object for the variable.
+
+    def __translateCutVariable(self, match):
+        (name, indices) = match.groups()
+        if name in ['and', 'or']:
+            return name
+        array = self.TreeMaker.VariablesDictionary[name]
+        if not indices:
+            indices = '[0]'*array.ndim
+        return 'float(%s%s)' % (name, indices)
+
+    ## @brief Add the histograms of a plot representation.
+    #
+    #  Return False (without creating any object) if the plot can't be
+    #  filled event by event.
+    ## @param self
+    #  The class instance.
+    ## @param rep
+    #  The plot representation.
+
+    def __addPlotRep(self, rep):
+        className = rep.__class__.__name__
+        if className not in ['pTH1FXmlRep', 'pTH2FXmlRep']:
+            return False
+        numAxes = 1 + int(className == 'pTH2FXmlRep')
+        plans = []
+        for (tower, layer) in rep.getExpansions():
+            expressions = rep.getExpandedExpression(tower, layer).split(':')
+            if len(expressions) != numAxes:
+                return False
+            expressions.reverse()
+            values = [self.__getValues(expression) for expression in\
+                      expressions]
+            if None in values:
+                return False
+            # Same rule as in the pHistogramPlanner: TTreeFormula pairs the
+            # indices of operands of different sizes its own way, so only
+            # equal sizes or scalar (i.e. size 1) operands are streamed.
+            sizes = [len(value) for value in values]
+            if min(sizes) != 1 and max(sizes) != min(sizes):
+                return False
+            cut = rep.getExpandedCut(tower, layer).strip()
+            if cut and cut not in self.Cuts:
+                code = self.__compileCut(cut)
+                if code is None:
+                    return False
+                self.Cuts[cut] = code
+            plans.append((tower, layer, values, cut))
+        for (tower, layer, values, cut) in plans:
+            histogram = rep.createHistogram(tower, layer)
+            self.Histograms.append(pStreamedHistogram(histogram, values, cut))
+            rep.RootObjects[histogram.GetName()] = histogram
+        return True
+
+    ## @brief Fill all the histograms with the current event.
+    ## @param self
+    #  The class instance.
+
+    def processEvent(self):
+        variables = self.TreeMaker.VariablesDictionary
+        weights = {'': 1.0}
+        for (cut, code) in self.Cuts.items():
+            weights[cut] = float(eval(code, {}, variables))
+        for histogram in self.Histograms:
+            weight = weights[histogram.Cut]
+            if weight:
+                histogram.fill(weight)
+        timestamp = float(variables['event_timestamp'][0])
+        if self.MinTimestamp is None or timestamp < self.MinTimestamp:
+            self.MinTimestamp = timestamp
+        if self.MaxTimestamp is None or timestamp > self.MaxTimestamp:
+            self.MaxTimestamp = timestamp
+
+    ## @brief Return the time span (in seconds) of the processed events.
+    ## @param self
+    #  The class instance.
+
+    def getTimeSpan(self):
+        if self.MinTimestamp is None:
+            return 0
+        return int(self.MaxTimestamp - self.MinTimestamp)
@@ -3,6 +3,18 @@ from math import pi, sin, cos
 import numpy
 
 D2R = pi/180.
+SECONDS_PER_DAY = 24*60*60
+
+# The rotation matrices change very slowly with time, so in the batch
+# functions they are evaluated once per time bucket (of TETE_MATRIX_BUCKET
+# seconds, at the bucket center) and cached.
+# This is an approximation: the matrix elements differ from those evaluated
+# at the exact event time by less than 1e-9 (i.e. a rotation below 1e-9 rad,
+# less than 1 cm at the space craft radius), so the batch coordinates agree
+# with the per-event reference within that tolerance, not bit for bit.
+TETE_MATRIX_BUCKET     = 60.
+TETE_MATRIX_CACHE_SIZE = 100000
+TETE_MATRIX_CACHE      = {}
 
 
 # Ref "The Astronomical Almanac", QB8.U5, 2003, p. B18,B20.
@@ -57,6 +69,35 @@ def getTETEtoJ2000Matrix(julianDate):
 def getJ2000toTETEMatrix(julianDate):
     return getTETEtoJ2000Matrix(julianDate).transpose()
 
+def getCachedJ2000toTETEMatrix(bucket, bucketSize = TETE_MATRIX_BUCKET):
+    key = (bucket, bucketSize)
+    try:
+        return TETE_MATRIX_CACHE[key]
+    except KeyError:
+        if len(TETE_MATRIX_CACHE) >= TETE_MATRIX_CACHE_SIZE:
+            TETE_MATRIX_CACHE.clear()
+        julianDate = (bucket + 0.5)*bucketSize/SECONDS_PER_DAY
+        matrix = numpy.array(getJ2000toTETEMatrix(julianDate))
+        TETE_MATRIX_CACHE[key] = matrix
+        return matrix
+
+# Return the (n, 3, 3) array of the J2000 to TETE matrices for an array of
+# julian dates.
+def getJ2000toTETEMatrices(julianDates, bucketSize = TETE_MATRIX_BUCKET):
+    julianDates = numpy.asarray(julianDates, 'float64')
+    buckets = numpy.floor(julianDates*SECONDS_PER_DAY/bucketSize)
+    (buckets, indices) = numpy.unique(buckets.astype('int64'),
+                                      return_inverse = True)
+    matrices = numpy.array([getCachedJ2000toTETEMatrix(bucket, bucketSize)\
+                            for bucket in buckets])
+    return matrices[indices]
+
+# Rotate an (n, 3) array of positions from J2000 to TETE.
+def rotateJ2000toTETE(julianDates, positions, bucketSize = TETE_MATRIX_BUCKET):
+    matrices = getJ2000toTETEMatrices(julianDates, bucketSize)
+    return numpy.einsum('nij,nj->ni', matrices,
+                        numpy.asarray(positions, 'float64'))
+
 
 
 if __name__ == '__main__':
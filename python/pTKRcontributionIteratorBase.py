@@ -10,11 +10,91 @@ import LDF
 from copy      import copy
 from pGlobals  import *
 
+## @brief The number of towers (i.e. TEM ids).
+
+NUM_TKR_TOWERS     = 16
+
+## @brief The number of TKR layer ends per tower.
+
+NUM_TKR_LAYER_ENDS = 72
+
+## @brief The number of physical strips per TKR layer end (the strip ids
+#  above are due to the TEM bug).
+
+NUM_TKR_STRIPS     = 1536
+
 
 ## @brief Base TKR contribution iterator.
 
 class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
 
+    ## @var FusedFunctions
+    ## @brief Implementations of the per-hit variable functions, inlined by
+    #  the code generator into the strip() and TOT() methods of the
+    #  generated iterator (this is the only implementation of these
+    #  functions).
+    #
+    #  The dictionary is indexed by the name of the function (i.e. the
+    #  variable name followed by the name of the iterator method, as for
+    #  the other variable functions) and each entry is a (guard, lines)
+    #  tuple, where guard is an optional condition on the function
+    #  arguments and lines is the list of statements. The numpy array of
+    #  the variable is accessed as the local <variable name>Array (bound
+    #  once per call of the generated method, along with the locals listed
+    #  in FusedGuards). The arguments are the ones of the iterator method,
+    #  i.e. tower (the TEM id, 0 to 15), layerEnd (the TKR layer end id, 0
+    #  to 71), hit (the TKR strip id) and tot (the TOT value).
+
+    FusedFunctions = {
+        # Number of hits per tower, plane and end.
+        'TkrHitsTowerPlaneEnd__strip__':
+        (None, ['TkrHitsTowerPlaneEndArray'
+                '[temId, layerEnd/2, layerEnd%2] += 1']),
+        # Number of hits per tower, plane and GTFE (unphysical strips,
+        # due to the TEM bug, are skipped).
+        'TkrHitsGTFE__strip__':
+        ('hit < NUM_TKR_STRIPS', ['TkrHitsGTFEArray'
+                                  '[temId, layerEnd/2, hit/64] += 1']),
+        # Number of hits per tower and plane.
+        'TkrHitsTowerPlane__strip__':
+        (None, ['TkrHitsTowerPlaneArray[temId, layerEnd/2] += 1']),
+        # TOT of the controller 0, per tower and plane.
+        'ToT_con0_TowerPlane__TOT__':
+        ('layerEnd%2 == 0', ['ToT_con0_TowerPlaneArray'
+                             '[temId, layerEnd/2] = tot']),
+        # TOT of the controller 1, per tower and plane.
+        'ToT_con1_TowerPlane__TOT__':
+        ('layerEnd%2 == 1', ['ToT_con1_TowerPlaneArray'
+                             '[temId, layerEnd/2] = tot']),
+        # TOT per tower, plane and end.
+        'tkr_layer_end_tot__TOT__':
+        (None, ['tkr_layer_end_totArray'
+                '[temId, layerEnd/2, layerEnd%2] = tot'])
+        }
+
+    ## @var FusedGuards
+    ## @brief The range checks of the fused block of each iterator method.
+    #
+    #  Each entry is a (bindings, condition) tuple, where bindings is the
+    #  list of the local variables assigned at the beginning of the
+    #  generated method and condition is the range check wrapping all the
+    #  fused statements of the method (the indices out of range are
+    #  skipped, as the IndexErrors of the original per-hit methods were).
+
+    FusedGuards = {
+        'strip': (['temId = self.TemId'],
+                  'temId < NUM_TKR_TOWERS and layerEnd < NUM_TKR_LAYER_ENDS'),
+        'TOT'  : (['temId = self.TemId'],
+                  'temId < NUM_TKR_TOWERS and layerEnd < NUM_TKR_LAYER_ENDS')
+        }
+
+    ## @var NoOpFunctions
+    ## @brief The iterator methods whose implementation below does nothing
+    #  (and which the generated iterator does not call). Any method doing
+    #  something must be removed from the list.
+
+    NoOpFunctions = ['strip', 'TOT']
+
     ## @brief Contructor.
     ## @param self
     #  The class instance.
@@ -116,118 +196,3 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
                         [self.TemId] = copy(self.stripCount())
         except:
 	    logger.debug('Strip count too big %s' % self.stripCount())
-
-    ## @brief Function filling the TkrHitsTowerPlaneEnd variable in the
-    #  strip() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param hit
-    #  The TKR strip id.
-    
-    def TkrHitsTowerPlaneEnd__strip__(self, tower, layerEnd, hit):
-        try:
-            self.TreeMaker.getVariable("TkrHitsTowerPlaneEnd")\
-                 [self.TemId][layerEnd/2][layerEnd%2] += 1
-        except IndexError:
-            pass
-
-    ## @brief Function filling the TkrHitsGTFE variable in the
-    #  strip() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param hit
-    #  The TKR strip id.
-    
-    def TkrHitsGTFE__strip__(self, tower, layerEnd, hit):
-        try:
-            self.TreeMaker.getVariable("TkrHitsGTFE")\
-                        [self.TemId][layerEnd/2][hit/64] += 1
-        except IndexError:
-            pass
-
-    ## @brief Function filling the ToT_con0_TowerPlane variable in the
-    #  TOT() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param tot
-    #  The value of the TOT for the specified layer.
-
-    def ToT_con0_TowerPlane__TOT__(self, tower, layerEnd, tot):
-        if layerEnd%2 == 0:
-            try:
-                self.TreeMaker.getVariable("ToT_con0_TowerPlane")\
-                        [self.TemId][layerEnd/2]= copy(tot)
-            except IndexError:
-                pass
-
-    ## @brief Function filling the ToT_con1_TowerPlane variable in the
-    #  TOT() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param tot
-    #  The value of the TOT for the specified layer.
-
-    def ToT_con1_TowerPlane__TOT__(self, tower, layerEnd, tot):
-        if layerEnd%2 == 1:
-            try:
-                self.TreeMaker.getVariable("ToT_con1_TowerPlane")\
-                        [self.TemId][layerEnd/2]= copy(tot)
-            except IndexError:
-                pass
-        
-    ## @brief Function filling the tkr_layer_end_tot variable in the
-    #  TOT() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param tot
-    #  The value of the TOT for the specified layer.
-
-    def tkr_layer_end_tot__TOT__(self, tower, layerEnd, tot):
-        try:
-            self.TreeMaker.getVariable("tkr_layer_end_tot")\
-                        [self.TemId][layerEnd/2][layerEnd%2] = copy(tot)
-        except IndexError:
-            pass
-        
-    ## @brief Function filling the TkrHitsTowerPlane variable in the
-    #  strip() iterator method.
-    #  Try/Except is probably not needed anymore
-    ## @param self
-    #  The class instance.
-    ## @param tower
-    #  The TEM id (0 to 15).
-    ## @param layerEnd
-    #  The TKR layer end id (0 to 71). 
-    ## @param hit
-    #  The TKR strip id.
-    def TkrHitsTowerPlane__strip__(self, tower, layerEnd, hit):
-        try:
-            self.TreeMaker.getVariable("TkrHitsTowerPlane")\
-                        [self.TemId][layerEnd/2] += 1
-        except IndexError:
-            pass
@@ -0,0 +1,150 @@
+## @package pTreeColumnReader
+## @brief Bulk (column-wise) reader for the FastMon ROOT tree.
+#
+#  The values of a tree expression are read for a whole range of entries in
+#  a single TTree::Draw() call (with the "goff" option) and copied from the
+#  internal buffer of the tree player into a numpy array, so that the
+#  subsequent processing can be done with array operations instead of
+#  looping over the entries in python.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pTreeColumnReader')
+
+import re
+import numpy
+
+## @brief The (maximum) number of values read at once by
+#  pTreeColumnReader.iterateColumn().
+
+COLUMN_CHUNK_SIZE = 1000000
+
+
+## @brief The column reader implementation.
+
+class pTreeColumnReader:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+
+    def __init__(self, rootTree):
+
+        ## @var RootTree
+        ## @brief The ROOT tree.
+
+        self.RootTree = rootTree
+
+    ## @brief Return the number of entries in the tree.
+    ## @param self
+    #  The class instance.
+
+    def getNumEntries(self):
+        return int(self.RootTree.GetEntries())
+
+    ## @brief Return the dimensions of a (fixed-size) leaf as a tuple, or
+    #  None if the leaf does not exist.
+    #
+    #  Scalar leaves have shape (1,).
+    ## @param self
+    #  The class instance.
+    ## @param leafName
+    #  The leaf name.
+
+    def getLeafShape(self, leafName):
+        leaf = self.RootTree.GetLeaf(leafName)
+        if leaf is None or not leaf:
+            return None
+        shape = tuple([int(dim) for dim in\
+                       re.findall('\[(\d+)\]', leaf.GetTitle())])
+        if not len(shape):
+            shape = (1,)
+        if numpy.prod(shape) != leaf.GetLen():
+            return None
+        return shape
+
+    ## @brief Return a numpy array with the values of a tree expression for
+    #  a given range of entries.
+    #
+    #  The values of all the instances of the expression (i.e. all the
+    #  elements, for arrays) are returned in a flat array, in entry order.
+    ## @param self
+    #  The class instance.
+    ## @param expression
+    #  The tree expression (e.g. a leaf name or a cut).
+    ## @param firstEntry
+    #  The first entry.
+    ## @param numEntries
+    #  The number of entries.
+    ## @param size
+    #  The (maximum) number of values per entry.
+    ## @param cut
+    #  An optional selection (only the instances passing the cut are
+    #  returned).
+
+    def readColumn(self, expression, firstEntry, numEntries, size = 1,\
+                   cut = ''):
+        self.RootTree.SetEstimate(numEntries*size + 1)
+        self.RootTree.Draw(expression, cut, 'goff', numEntries, firstEntry)
+        numRows = self.RootTree.GetSelectedRows()
+        if numRows <= 0:
+            return numpy.zeros((0), 'float64')
+        rows = self.RootTree.GetV1()
+        rows.SetSize(numRows)
+        return numpy.array(numpy.frombuffer(rows, 'float64', numRows))
+
+    ## @brief Return a boolean numpy array (one element per tree entry)
+    #  flagging the entries which pass a given cut.
+    #
+    #  As for TTree::CopyTree(), an entry is selected if at least one of the
+    #  instances of the cut (for cuts involving arrays) is satisfied.
+    ## @param self
+    #  The class instance.
+    ## @param cut
+    #  The cut.
+    ## @param size
+    #  The (maximum) number of instances of the cut per entry.
+
+    def getSelection(self, cut, size = 1):
+        numEntries = self.getNumEntries()
+        selection = numpy.zeros((numEntries), 'bool')
+        chunkEntries = max(1, COLUMN_CHUNK_SIZE/size)
+        for firstEntry in xrange(0, numEntries, chunkEntries):
+            entries = self.readColumn('Entry$', firstEntry, chunkEntries,\
+                                      size, cut)
+            selection[entries.astype('int64')] = True
+        return selection
+
+    ## @brief Iterate over the values of a tree variable, in chunks of
+    #  consecutive entries.
+    #
+    #  Each chunk is returned as a numpy array of shape
+    #  (number of entries,) + shape.
+    ## @param self
+    #  The class instance.
+    ## @param varName
+    #  The variable name.
+    ## @param shape
+    #  The shape of the variable (as a tuple).
+    ## @param type
+    #  The numpy type of the returned arrays.
+    ## @param selection
+    #  An optional boolean numpy array (see getSelection()): only the
+    #  selected entries are returned.
+
+    def iterateColumn(self, varName, shape, type, selection = None):
+        size = int(numpy.prod(shape))
+        chunkEntries = max(1, COLUMN_CHUNK_SIZE/size)
+        numEntries = self.getNumEntries()
+        for firstEntry in xrange(0, numEntries, chunkEntries):
+            if selection is not None and\
+                   not selection[firstEntry:firstEntry + chunkEntries].any():
+                continue
+            values = self.readColumn(varName, firstEntry, chunkEntries, size)
+            values = values.astype(type).reshape((-1,) + tuple(shape))
+            if selection is not None:
+                values = values[selection[firstEntry:\
+                                          firstEntry + len(values)]]
+            if len(values):
+                yield values
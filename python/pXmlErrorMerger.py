@@ -1,57 +1,290 @@
 #! /usr/bin/env python
 
+## @package pXmlErrorMerger
+## @brief Merge a list of xml error files into a single one.
+#
+#  The input files are read with an event-driven (SAX) parser, so that they
+#  are never loaded in memory. Each input file is parsed once (possibly in
+#  a separate process): the summary counters are returned to the merger
+#  and the error events are written to a temporary file, which is then
+#  copied into the output file (after the merged summary) in input order.
+
 import pSafeLogger
 logger = pSafeLogger.getLogger('pXmlErrorMerger')
 
+import os
 import sys
+import multiprocessing
+import xml.sax
+
+from pXmlWriter      import pXmlWriter
+from xml.sax.handler import ContentHandler
+from xml.sax.saxutils import quoteattr
+
+EVENT_SUMMARY_KEYS = ['num_error_events', 'num_processed_events',\
+                      'seconds_elapsed', 'truncated']
+
+
+## @brief Evaluate an attribute of the eventSummary element (0 if the
+#  attribute is not a number or a boolean, e.g. "n/a").
+## @param value
+#  The attribute value.
+
+def evalAttribute(value):
+    try:
+        value = eval(value, {}, {})
+    except:
+        return 0
+    if not isinstance(value, (int, long, float, bool)):
+        return 0
+    return value
+
+## @brief Return the xml line of an element.
+## @param name
+#  The element name.
+## @param attrs
+#  The element attributes.
+## @param empty
+#  Flag for elements with no children.
+
+def formatTag(name, attrs, empty):
+    names = attrs.keys()
+    names.sort()
+    text = '<%s' % name
+    for attrName in names:
+        text += ' %s=%s' % (attrName, quoteattr(attrs[attrName]))
+    if empty:
+        return '%s/>' % text
+    return '%s>' % text
+
+
+## @brief SAX handler for a single xml error file.
+
+class pXmlErrorFileHandler(ContentHandler):
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param eventsFile
+    #  The file object the error events are written to.
+    ## @param maxErrorEvents
+    #  The maximum number of error events to be written (None means all).
+
+    def __init__(self, eventsFile, maxErrorEvents):
+
+        ## @var Summary
+        ## @brief The dictionary with the summary counters (see
+        #  getEmptySummary()).
+
+        ## @var EventsFile
+        ## @brief The file object the error events are written to.
+
+        ## @var MaxErrorEvents
+        ## @brief The maximum number of error events to be written.
+
+        ## @var CurrentEvent
+        ## @brief The list of the xml lines of the error event being parsed
+        #  (None if it's not to be written).
+
+        ContentHandler.__init__(self)
+        self.Summary        = getEmptySummary()
+        self.EventsFile     = eventsFile
+        self.MaxErrorEvents = maxErrorEvents
+        self.CurrentEvent   = None
+
+    def startElement(self, name, attrs):
+        if name == 'errorType':
+            code = attrs.get('code')
+            addCount(self.Summary['ErrorCountsDict'], code,\
+                     int(attrs.get('quantity', 0)))
+            addCount(self.Summary['EventCountsDict'], code,\
+                     int(attrs.get('events', 0)))
+        elif name == 'eventSummary':
+            for key in EVENT_SUMMARY_KEYS:
+                self.Summary['EventSummaryDict'][key] +=\
+                    evalAttribute(attrs.get(key, '0'))
+        elif name == 'errorEvent':
+            if self.MaxErrorEvents is None or\
+                   self.Summary['NumWrittenEvents'] < self.MaxErrorEvents:
+                self.CurrentEvent = [formatTag(name, attrs, False)]
+            else:
+                self.Summary['Truncated'] = True
+        elif self.CurrentEvent is not None:
+            self.CurrentEvent.append('  %s' % formatTag(name, attrs, True))
+
+    def endElement(self, name):
+        if name == 'errorEvent' and self.CurrentEvent is not None:
+            self.CurrentEvent.append('</errorEvent>')
+            self.EventsFile.write('%s\n' % '\n'.join(self.CurrentEvent))
+            self.Summary['NumWrittenEvents'] += 1
+            self.CurrentEvent = None
 
-from pXmlWriter import pXmlWriter
-from xml.dom    import minidom
-from pXmlBaseElement import pXmlBaseElement
+
+## @brief Return a summary dictionary with all the counters set to zero.
+
+def getEmptySummary():
+    return {'ErrorCountsDict' : {},
+            'EventCountsDict' : {},
+            'EventSummaryDict': dict([(key, 0) for key in\
+                                      EVENT_SUMMARY_KEYS]),
+            'NumWrittenEvents': 0,
+            'Truncated'       : False}
+
+## @brief Add a count to a dictionary of counters.
+## @param countsDict
+#  The dictionary.
+## @param key
+#  The key.
+## @param count
+#  The count.
+
+def addCount(countsDict, key, count):
+    try:
+        countsDict[key] += count
+    except KeyError:
+        countsDict[key] = count
+
+## @brief Parse a single xml error file, writing its error events to a
+#  temporary file, and return its summary.
+#
+#  This is the target function of the worker processes.
+## @param args
+#  The (input file path, events file path, maximum number of error events)
+#  tuple.
+
+def parseXmlErrorFile(args):
+    (inputFilePath, eventsFilePath, maxErrorEvents) = args
+    eventsFile = file(eventsFilePath, 'w')
+    handler = pXmlErrorFileHandler(eventsFile, maxErrorEvents)
+    try:
+        xml.sax.parse(inputFilePath, handler)
+    except xml.sax.SAXParseException, error:
+        # The exception itself can't be sent back by a worker process.
+        raise RuntimeError('Could not parse %s (%s).' % (inputFilePath, error))
+    eventsFile.close()
+    return handler.Summary
 
 
 class pXmlErrorMerger(pXmlWriter):
 
-    def mergeXmlFiles(self, inputList):
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param outputFilePath
+    #  The path to the output file.
+
+    def __init__(self, outputFilePath):
+
+        ## @var OutputFilePath
+        ## @brief The path to the output file.
+
+        pXmlWriter.__init__(self, outputFilePath)
+        self.OutputFilePath = outputFilePath
+
+    ## @brief Merge a list of xml error files.
+    ## @param self
+    #  The class instance.
+    ## @param inputList
+    #  The list of paths to the input files.
+    ## @param numWorkers
+    #  The number of processes parsing the input files.
+    ## @param maxErrorEvents
+    #  The maximum number of error events in the output file (None means
+    #  all); the eventSummary is flagged as truncated if the cap is hit.
+
+    def mergeXmlFiles(self, inputList, numWorkers = 1, maxErrorEvents = None):
         self.ErrorCountsDict = {}
         self.EventCountsDict = {}
-        self.EventSummaryDict = {'num_error_events'      : 0,
-                                 'num_processed_events'  : 0,
-				 'seconds_elapsed'       : 0,
-                                 'truncated'             : 0
-                                 }
-        self.ErrorEventsList = []
+        self.EventSummaryDict = dict([(key, 0) for key in EVENT_SUMMARY_KEYS])
+        self.MaxErrorEvents = maxErrorEvents
         logger.info('Merging input files list...')
-        for filePath in inputList:
-            self.addXmlFile(filePath)
-        self.writeXmlOutput()
-
-    def addXmlFile(self, inputFilePath):
-        logger.info('Adding input file %s...' % inputFilePath)
-        xmlDoc = pXmlBaseElement(minidom.parse(file(inputFilePath)))
-        for element in xmlDoc.getElementsByTagName('errorType'):
-            element = pXmlBaseElement(element)
-            code = element.getAttribute('code')
-            quantity = int(element.getAttribute('quantity'))
-            try:
-                self.ErrorCountsDict[code] += quantity
-            except KeyError:
-                self.ErrorCountsDict[code] = quantity
-            events = int(element.getAttribute('events'))
+        eventsFilePaths = [self.getEventsFilePath(i) for i in\
+                           range(len(inputList))]
+        args = [(inputFilePath, eventsFilePath, maxErrorEvents) for\
+                (inputFilePath, eventsFilePath) in\
+                zip(inputList, eventsFilePaths)]
+        try:
+            summaries = self.parseXmlFiles(args, numWorkers)
+        except RuntimeError, error:
+            for eventsFilePath in eventsFilePaths:
+                if os.path.exists(eventsFilePath):
+                    os.remove(eventsFilePath)
+            sys.exit('%s Abort.' % error)
+        for summary in summaries:
+            self.addSummary(summary)
+        self.writeXmlOutput(eventsFilePaths,\
+                            [summary['NumWrittenEvents'] for summary in\
+                             summaries])
+        for eventsFilePath in eventsFilePaths:
+            os.remove(eventsFilePath)
+
+    ## @brief Parse the input files (possibly in parallel) and return the
+    #  list of their summaries.
+    ## @param self
+    #  The class instance.
+    ## @param args
+    #  The list of the arguments for parseXmlErrorFile().
+    ## @param numWorkers
+    #  The number of processes parsing the input files.
+
+    def parseXmlFiles(self, args, numWorkers):
+        if numWorkers > 1 and len(args) > 1:
+            logger.info('Parsing %d input files with %d processes...' %\
+                        (len(args), min(numWorkers, len(args))))
+            pool = multiprocessing.Pool(min(numWorkers, len(args)))
             try:
-                self.EventCountsDict[code] += events
-            except KeyError:
-                self.EventCountsDict[code] = events
-        element = pXmlBaseElement(xmlDoc.getElementByTagName('eventSummary'))
-        for key in self.EventSummaryDict.keys():
-            self.EventSummaryDict[key] += element.evalAttribute(key)
+                summaries = pool.map(parseXmlErrorFile, args)
+            finally:
+                pool.close()
+                pool.join()
+            return summaries
+        summaries = []
+        for arg in args:
+            logger.info('Adding input file %s...' % arg[0])
+            summaries.append(parseXmlErrorFile(arg))
+        return summaries
+
+    ## @brief Return the path to the temporary events file for a given
+    #  input file.
+    ## @param self
+    #  The class instance.
+    ## @param index
+    #  The index of the input file.
+
+    def getEventsFilePath(self, index):
+        return '%s.%d.%d.part' % (self.OutputFilePath, os.getpid(), index)
+
+    ## @brief Add the summary of an input file.
+    ## @param self
+    #  The class instance.
+    ## @param summary
+    #  The summary dictionary returned by parseXmlErrorFile().
+
+    def addSummary(self, summary):
+        for (code, quantity) in summary['ErrorCountsDict'].items():
+            addCount(self.ErrorCountsDict, code, quantity)
+        for (code, events) in summary['EventCountsDict'].items():
+            addCount(self.EventCountsDict, code, events)
+        for key in EVENT_SUMMARY_KEYS:
+            self.EventSummaryDict[key] += summary['EventSummaryDict'][key]
         self.EventSummaryDict['truncated'] =\
-            (self.EventSummaryDict['truncated'] > 0)
-        for element in xmlDoc.getElementsByTagName('errorEvent'):
-            self.ErrorEventsList.append(element.toxml())
+            (self.EventSummaryDict['truncated'] > 0) or summary['Truncated']
+
+    ## @brief Write the output file.
+    ## @param self
+    #  The class instance.
+    ## @param eventsFilePaths
+    #  The list of the paths to the temporary events files.
+    ## @param numEventsList
+    #  The list of the number of error events in each file.
 
-    def writeXmlOutput(self):
+    def writeXmlOutput(self, eventsFilePaths, numEventsList):
         logger.info('Writing output file...')
+        numEventsToWrite = sum(numEventsList)
+        if self.MaxErrorEvents is not None and\
+               numEventsToWrite > self.MaxErrorEvents:
+            numEventsToWrite = self.MaxErrorEvents
+            self.EventSummaryDict['truncated'] = True
         self.openTag('errorContribution')
         self.indent()
         self.newLine()
@@ -69,8 +302,17 @@ class pXmlErrorMerger(pXmlWriter):
         self.writeComment('Summary by event number')
         self.openTag('eventSummary', self.EventSummaryDict)
         self.indent()
-        for errorEvent in self.ErrorEventsList:
-            self.writeLine(errorEvent)
+        for eventsFilePath in eventsFilePaths:
+            if not numEventsToWrite:
+                break
+            eventsFile = file(eventsFilePath)
+            for line in eventsFile:
+                self.writeLine(line.rstrip('\n'))
+                if line.startswith('</errorEvent>'):
+                    numEventsToWrite -= 1
+                    if not numEventsToWrite:
+                        break
+            eventsFile.close()
         self.backup()
         self.closeTag('eventSummary')
         self.backup()
@@ -84,9 +326,14 @@ if __name__ == "__main__":
     parser = optparse.OptionParser()
     parser.add_option('-o', '--output-file', dest='o')
     parser.add_option('-i', '--input-file', dest='i', action='append')
+    parser.add_option('-j', '--jobs', dest='j', type='int', default=1,
+                      help='number of processes parsing the input files')
+    parser.add_option('-m', '--max-error-events', dest='m', type='int',
+                      default=None,
+                      help='maximum number of error events in the output')
     options, args = parser.parse_args()
     if options.i is None:
         print 'Please provide a list of xml file to merge through the i option.'
         sys.exit()
     merger = pXmlErrorMerger(options.o)
-    merger.mergeXmlFiles(options.i)
+    merger.mergeXmlFiles(options.i, options.j, options.m)
@@ -203,6 +203,21 @@ class pPlotXmlRep(pXmlElement):
         return self.Cut.replace(self.getExpandedExpression(),\
                                 self.getExpandedExpression(tower, layer, end))
                         
+    ## @brief Return the list of (tower, layer) tuples identifying the
+    #  objects to be created for the Level of the plot.
+    ## @param self
+    #  The class instance.
+
+    def getExpansions(self):
+        if self.Level == LAT_LEVEL:
+            return [(None, None)]
+        elif self.Level == TOWER_LEVEL:
+            return [(tower, None) for tower in range(NUM_TOWERS)]
+        elif self.Level == TKR_LAYER_LEVEL:
+            return [(tower, layer) for tower in range(NUM_TOWERS)\
+                    for layer in range(NUM_TKR_LAYERS_PER_TOWER)]
+        return []
+
     ## @brief Create the actual ROOT objects.
     ## @param self
     #  The class instance.
@@ -211,18 +226,9 @@ class pPlotXmlRep(pXmlElement):
     #  plots are created.
     
     def createRootObjects(self, rootTree):
-        if self.Level == LAT_LEVEL:
-            object = self.getRootObject(rootTree)
+        for (tower, layer) in self.getExpansions():
+            object = self.getRootObject(rootTree, tower, layer)
             self.RootObjects[object.GetName()] = object
-        elif self.Level == TOWER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                object = self.getRootObject(rootTree, tower)
-                self.RootObjects[object.GetName()] = object
-        elif self.Level == TKR_LAYER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                for layer in range(NUM_TKR_LAYERS_PER_TOWER):
-                    object = self.getRootObject(rootTree, tower, layer)
-                    self.RootObjects[object.GetName()] = object
 
     ## @brief Get the list of names of the ROOT objects, as they would be
     #  created by createRootObjects().
@@ -285,23 +291,35 @@ class pTH1FXmlRep(pPlotXmlRep):
         self.XMin     = self.evalTagValue('xmin')
         self.XMax     = self.evalTagValue('xmax')
 
-    ## @brief Return the actual ROOT histogram for the specified Level.
+    ## @brief Return the (empty) ROOT histogram for the specified Level.
     ## @param self
     #  The class instance.
-    ## @param rootTree
-    #  The ROOT tree containing the (filled) branches from which the
-    #  plots are created.
     ## @param tower
     #  The tower ID for the specified Level.
     ## @param layer
     #  The TKR layer ID for the specified Level.
 
-    def getRootObject(self, rootTree, tower=None, layer=None):
+    def createHistogram(self, tower=None, layer=None):
         histogram = ROOT.TH1F(self.getExpandedName(tower, layer),\
                               self.getExpandedTitle(tower, layer),\
                               self.NumXBins, self.XMin, self.XMax)
         histogram.GetXaxis().SetTitle(self.XLabel)
         histogram.GetYaxis().SetTitle(self.YLabel)
+        return histogram
+
+    ## @brief Return the actual ROOT histogram for the specified Level.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree containing the (filled) branches from which the
+    #  plots are created.
+    ## @param tower
+    #  The tower ID for the specified Level.
+    ## @param layer
+    #  The TKR layer ID for the specified Level.
+
+    def getRootObject(self, rootTree, tower=None, layer=None):
+        histogram = self.createHistogram(tower, layer)
         rootTree.Project(histogram.GetName(),\
                          self.getExpandedExpression(tower, layer),\
                          self.getExpandedCut(tower, layer))
@@ -344,27 +362,21 @@ class pTH2FXmlRep(pTH1FXmlRep):
         self.YMin     = self.evalTagValue('ymin')
         self.YMax     = self.evalTagValue('ymax')
 
-    ## @brief Return the actual ROOT histogram for the specified Level.
+    ## @brief Return the (empty) ROOT histogram for the specified Level.
     ## @param self
     #  The class instance.
-    ## @param rootTree
-    #  The ROOT tree containing the (filled) branches from which the
-    #  plots are created.
     ## @param tower
     #  The tower ID for the specified Level.
     ## @param layer
     #  The TKR layer ID for the specified Level.
 
-    def getRootObject(self, rootTree, tower=None, layer=None):
+    def createHistogram(self, tower=None, layer=None):
         histogram = ROOT.TH2F(self.getExpandedName(tower, layer),\
                               self.getExpandedTitle(tower, layer),\
                               self.NumXBins, self.XMin, self.XMax,\
                               self.NumYBins, self.YMin, self.YMax)
         histogram.GetXaxis().SetTitle(self.XLabel)
         histogram.GetYaxis().SetTitle(self.YLabel)
-        rootTree.Project(histogram.GetName(),\
-                         self.getExpandedExpression(tower, layer),\
-                         self.getExpandedCut(tower, layer))
         return histogram
 
     ## @brief Class representation.
@@ -417,33 +429,73 @@ class pStripChartXmlRep(pPlotXmlRep):
     #  The TKR layer ID for the specified Level.
 
     def getRootObject(self, rootTree, tower=None, layer=None):
-	tmin = rootTree.GetMinimum('event_timestamp')
+        tmin = rootTree.GetMinimum('event_timestamp')
         tmax = rootTree.GetMaximum('event_timestamp')
-	# ymin and ymax may be passed in the xml if not try to get
+        # ymin and ymax may be passed in the xml if not try to get
         #them from the tree
         # GetMaximum works only on direct tree variable (e.g. not on
         #cal_log_count[i])
-	# Need to implement something better
-	expression = self.getExpandedExpression()
+        # Need to implement something better
+        expression = self.getExpandedExpression()
         if self.YMin is None:
-	  self.YMin = rootTree.GetMinimum(expression)
+            self.YMin = rootTree.GetMinimum(expression)
         if self.YMax is None:
-	  self.YMax = rootTree.GetMaximum(expression)
-        
-        nTimeBin = int((tmax-tmin)/self.DTime)
-	htemp = ROOT.TH2F('htemp', 'htemp', nTimeBin, tmin, tmax, 100,\
-                          self.YMin,self.YMax)
-	#Cut is always on the variable itself now : should come from xml
+            self.YMax = rootTree.GetMaximum(expression)
+        htemp = self.createTimeHistogram('htemp', tmin, tmax)
+        #Cut is always on the variable itself now : should come from xml
         expression = self.getExpandedExpression(tower, layer)
         cut        = self.getExpandedCut(tower, layer)
-	rootTree.Project('htemp', '%s:event_timestamp'% expression, cut)
+        rootTree.Project('htemp', '%s:event_timestamp'% expression, cut)
+        return self.createProfile(htemp, tower, layer)
+
+    ## @brief Return the (empty) two-dimensional histogram (value vs. time)
+    #  from which the strip chart is created.
+    ## @param self
+    #  The class instance.
+    ## @param name
+    #  The histogram name.
+    ## @param tmin
+    #  The minimum time stamp.
+    ## @param tmax
+    #  The maximum time stamp.
+
+    def createTimeHistogram(self, name, tmin, tmax):
+        (nTimeBin, tmin, tmax, nYBin, ymin, ymax) =\
+                   self.getTimeBinning(tmin, tmax)
+        return ROOT.TH2F(name, name, nTimeBin, tmin, tmax, nYBin, ymin, ymax)
+
+    ## @brief Return the binning of the value vs. time histogram, as a
+    #  (number of time bins, tmin, tmax, number of y bins, ymin, ymax) tuple.
+    ## @param self
+    #  The class instance.
+    ## @param tmin
+    #  The minimum time stamp.
+    ## @param tmax
+    #  The maximum time stamp.
+
+    def getTimeBinning(self, tmin, tmax):
+        nTimeBin = int((tmax-tmin)/self.DTime)
+        return (nTimeBin, tmin, tmax, 100, self.YMin, self.YMax)
+
+    ## @brief Return the strip chart (i.e. the profile of the value vs. time
+    #  histogram) for the specified Level.
+    ## @param self
+    #  The class instance.
+    ## @param htemp
+    #  The (filled) value vs. time histogram.
+    ## @param tower
+    #  The tower ID for the specified Level.
+    ## @param layer
+    #  The TKR layer ID for the specified Level.
+
+    def createProfile(self, htemp, tower=None, layer=None):
         profile = htemp.ProfileX()
         profile.SetNameTitle(self.getExpandedName(tower, layer),\
                              self.getExpandedTitle(tower, layer))
         profile.GetXaxis().SetTitle(self.XLabel)
         profile.GetYaxis().SetTitle(self.YLabel)
         del htemp
-	return  profile
+        return  profile
 
     def __str__(self):
         return pPlotXmlRep.__str__(self)
@@ -478,8 +530,22 @@ class pRateStripChartXmlRep(pStripChartXmlRep):
     #  The TKR layer ID for the specified Level.
     
     def getRootObject(self, rootTree, tower=None, layer=None):
-        profileTemp = pStripChartXmlRep.getRootObject(self, rootTree,\
-                                                      tower=None, layer=None)
+        return pStripChartXmlRep.getRootObject(self, rootTree,\
+                                               tower=None, layer=None)
+
+    ## @brief Return the strip chart, scaled to the width of the time bin.
+    ## @param self
+    #  The class instance.
+    ## @param htemp
+    #  The (filled) value vs. time histogram.
+    ## @param tower
+    #  The tower ID for the specified Level.
+    ## @param layer
+    #  The TKR layer ID for the specified Level.
+
+    def createProfile(self, htemp, tower=None, layer=None):
+        profileTemp = pStripChartXmlRep.createProfile(self, htemp, tower,\
+                                                      layer)
         profileTemp.Scale(profileTemp.GetSumOfWeights()/self.DTime)
         return profileTemp
 
@@ -0,0 +1,181 @@
+#!/bin/env python
+
+## @brief Check that the events written by the pEventGenerator are decoded
+#  by the LDF bindings as they were written.
+#
+#  python testEventGenerator.py
+#
+#  The events of two synthetic files (one without errors and one with an
+#  injected error in each event) are run through the same chain of
+#  iterators the pDataProcessor uses (starting from LDF.LATdataBufferIterator)
+#  and the decoded TKR strips, CAL logs and ACD PHA values, as well as the
+#  events flagged with each error, are counted and compared with the ones
+#  written by the generator.
+
+import os
+import sys
+import tempfile
+
+import LDF
+
+from pEventGenerator              import pEventGenerator
+from pLDFReader                   import pLDFReader
+from pErrorHandler                import pErrorHandler
+from pLATcomponentIterator        import pLATcomponentIterator
+from pEBFeventIterator            import pEBFeventIterator
+from pLATcontributionIterator     import pLATcontributionIterator
+from pLATdatagramIterator         import pLATdatagramIterator
+from pTKRcontributionIteratorBase import pTKRcontributionIteratorBase
+from pCALcontributionIteratorBase import pCALcontributionIteratorBase
+from pAEMcontributionIteratorBase import pAEMcontributionIteratorBase
+
+NUM_EVENTS = 1000
+
+## @brief The error code each injected error must be flagged with.
+
+ERROR_CODES = {'acd_header_parity'     : 'ACD_HEADER_PARITY_ERROR',
+               'acd_pha_parity'        : 'ACD_PHA_PARITY_ERROR',
+               'acd_pha_inconsistency' : 'ACD_PHA_INCONSISTENCY',
+               'truncated_contribution': 'PACKET_ERROR'}
+
+
+## @brief TKR iterator counting the decoded strips.
+
+class pTKRcountingIterator(pTKRcontributionIteratorBase):
+
+    def strip(self, tower, layerEnd, hit):
+        self.Counts['tkr_strips'] += 1
+
+
+## @brief CAL iterator counting the decoded logs.
+
+class pCALcountingIterator(pCALcontributionIteratorBase):
+
+    def log(self, tower, layer, calLog):
+        self.Counts['cal_logs'] += 1
+
+
+## @brief AEM iterator counting the decoded PHA values (the error checks
+#  are the ones of the base class).
+
+class pAEMcountingIterator(pAEMcontributionIteratorBase):
+
+    def pha(self, cable, channel, pha):
+        pAEMcontributionIteratorBase.pha(self, cable, channel, pha)
+        self.Counts['acd_phas'] += 1
+
+
+## @brief LAT component iterator running the counting iterators (the
+#  error and packet error handling are the ones of the base class).
+
+class pCountingComponentIterator(pLATcomponentIterator):
+
+    def __init__(self, errorHandler):
+        pLATcomponentIterator.__init__(self, None, errorHandler)
+        self.Counts = {'tkr_strips': 0, 'cal_logs': 0, 'acd_phas': 0}
+
+    def GEMcomponent(self, event, contribution):
+        return 0
+
+    def TKRcomponent(self, event, contribution):
+        tkrIterator = pTKRcountingIterator(event, contribution, None,\
+                                           self.ErrorHandler)
+        tkrIterator.Counts = self.Counts
+        tkrIterator.iterate()
+        if tkrIterator.diagnostic() is not None:
+            self.TKRend(tkrIterator.diagnostic())
+        return 0
+
+    def CALcomponent(self, event, contribution):
+        calIterator = pCALcountingIterator(event, contribution, None,\
+                                           self.ErrorHandler)
+        calIterator.Counts = self.Counts
+        calIterator.iterate()
+        self.CALend(calIterator.CALend())
+        return 0
+
+    def ACDcomponent(self, event, contribution):
+        aemIterator = pAEMcountingIterator(event, contribution, None,\
+                                           self.ErrorHandler)
+        aemIterator.Counts = self.Counts
+        aemIterator.iterate()
+        return 0
+
+
+## @brief Write a synthetic file, run it through the LDF iterators and
+#  return the (generator, component iterator, error handler, number of
+#  events read) tuple.
+## @param errorRate
+#  The fraction of events with one injected error.
+
+def decodeFile(errorRate):
+    filePath = os.path.join(tempfile.mkdtemp(), 'test.ldf')
+    generator = pEventGenerator(errorRate = errorRate, seed = 1)
+    generator.writeFile(filePath, NUM_EVENTS)
+    errorHandler = pErrorHandler()
+    componentIterator = pCountingComponentIterator(errorHandler)
+    ebfEventIterator = pEBFeventIterator(componentIterator)
+    contributionIterator = pLATcontributionIterator(ebfEventIterator)
+    datagramIterator = pLATdatagramIterator(contributionIterator)
+    for iterator in [ebfEventIterator, contributionIterator,\
+                     datagramIterator]:
+        iterator.ErrorHandler = errorHandler
+    dataBufferIterator = LDF.LATdataBufferIterator(datagramIterator)
+    reader = pLDFReader(filePath)
+    numEvents = 0
+    event = reader.readEvent()
+    while event is not None:
+        dataBufferIterator.iterate(event, len(event))
+        errorHandler.flushErrorsBuffer(numEvents)
+        numEvents += 1
+        event = reader.readEvent()
+    reader.close()
+    return (generator, componentIterator, errorHandler, numEvents)
+
+## @brief Check the number of hits decoded from a file without errors.
+
+def testHits():
+    (generator, componentIterator, errorHandler, numEvents) = decodeFile(0.0)
+    numFailures = 0
+    if numEvents != NUM_EVENTS:
+        print 'Read %d events (%d written).' % (numEvents, NUM_EVENTS)
+        numFailures += 1
+    written = {'tkr_strips': generator.NumTkrStrips,
+               'cal_logs'  : generator.NumCalLogs,
+               'acd_phas'  : generator.NumAcdPhas}
+    for (name, value) in written.items():
+        if componentIterator.Counts[name] != value:
+            print 'Decoded %d %s (%d written).' %\
+                  (componentIterator.Counts[name], name, value)
+            numFailures += 1
+    if errorHandler.NumErrorEvents:
+        print '%d events with errors (none injected).' %\
+              errorHandler.NumErrorEvents
+        numFailures += 1
+    return numFailures
+
+## @brief Check the number of events flagged with each error in a file
+#  with one injected error per event.
+
+def testErrors():
+    (generator, componentIterator, errorHandler, numEvents) = decodeFile(1.0)
+    numFailures = 0
+    if errorHandler.NumErrorEvents != NUM_EVENTS:
+        print '%d events with errors (%d injected).' %\
+              (errorHandler.NumErrorEvents, NUM_EVENTS)
+        numFailures += 1
+    for (error, errorCode) in ERROR_CODES.items():
+        numInjected = generator.InjectedErrorsDict[error]
+        numFlagged = errorHandler.getNumEventsWithError(errorCode)
+        if numFlagged != numInjected:
+            print '%d events flagged with %s (%d injected).' %\
+                  (numFlagged, errorCode, numInjected)
+            numFailures += 1
+    return numFailures
+
+
+if __name__ == '__main__':
+    numFailures = testHits() + testErrors()
+    if numFailures:
+        sys.exit('%d failures found. Abort.' % numFailures)
+    print 'All checks passed.'
@@ -0,0 +1,138 @@
+#!/bin/env python
+
+## @brief Check that the event index built by the standalone scan and the one
+#  built on the fly (i.e. the way the pDataProcessor does it) are the same,
+#  and that the lookups (by event number and by time stamp) work on both.
+#
+#  python testEventIndex.py [evt file]
+#
+#  The ldf checks run on a synthetic file written by the pEventGenerator;
+#  the evt checks only run if an evt file is provided.
+
+import os
+import sys
+import numpy
+import tempfile
+
+from pEventIndex     import pEventIndex
+from pLDFReader      import pLDFReader
+from pEventGenerator import pEventGenerator
+
+NUM_LDF_EVENTS = 1000
+LOOKUP_EVENTS  = [0, 1, 17, 500, 999]
+
+
+## @brief Compare the arrays of two indices and return the number of
+#  mismatches.
+## @param label
+#  The label for the printout.
+## @param scanIndex
+#  The index built by the standalone scan.
+## @param loopIndex
+#  The index built on the fly.
+
+def compare(label, scanIndex, loopIndex):
+    numFailures = 0
+    for name in ['Offsets', 'Lengths', 'Timestamps']:
+        a = getattr(scanIndex, name)
+        b = getattr(loopIndex, name)
+        if len(a) != len(b) or not (a == b).all():
+            print '%s: %s differ between the two build paths.' % (label, name)
+            numFailures += 1
+    return numFailures
+
+## @brief Look up some events in an evt index, both by event number and by
+#  time stamp, and return the number of failures.
+## @param label
+#  The label for the printout.
+## @param index
+#  The event index.
+## @param timestamps
+#  The event time stamps read sequentially.
+
+def lookupEvt(label, index, timestamps):
+    numFailures = 0
+    for eventNumber in [i for i in LOOKUP_EVENTS if i < len(timestamps)]:
+        timestamp = index.getTimestamp(eventNumber)
+        if timestamp != timestamps[eventNumber]:
+            print '%s: wrong time stamp for event %d.' % (label, eventNumber)
+            numFailures += 1
+        found = index.getEventNumber(timestamp)
+        if found > eventNumber or index.getTimestamp(found) != timestamp:
+            print '%s: time stamp lookup failed for event %d (got %d).' %\
+                  (label, eventNumber, found)
+            numFailures += 1
+    return numFailures
+
+## @brief Index a synthetic ldf file in both ways and look up some events.
+
+def testLDF():
+    filePath = os.path.join(tempfile.mkdtemp(), 'test.ldf')
+    pEventGenerator(seed = 1).writeFile(filePath, NUM_LDF_EVENTS)
+    scanIndex = pEventIndex(filePath)
+    scanIndex.build()
+    loopIndex = pEventIndex(filePath)
+    events = []
+    reader = pLDFReader(filePath)
+    offset = reader.tell()
+    event = reader.readEvent()
+    while event is not None:
+        # Any time stamp passed in must be dropped for ldf files.
+        loopIndex.addEvent(offset, len(event), 1.0 + len(events))
+        events.append(event)
+        offset = reader.tell()
+        event = reader.readEvent()
+    reader.close()
+    loopIndex.commit()
+    numFailures = compare('ldf', scanIndex, loopIndex)
+    loopIndex.write()
+    readIndex = pEventIndex(filePath)
+    if not readIndex.read():
+        print 'ldf: could not read back the index.'
+        return numFailures + 1
+    for (label, index) in [('ldf scan', scanIndex), ('ldf loop', loopIndex),
+                           ('ldf read', readIndex)]:
+        for eventNumber in LOOKUP_EVENTS:
+            if index.readEvent(eventNumber) != events[eventNumber] or\
+                   index.getTimestamp(eventNumber) != 0:
+                print '%s: lookup failed for event %d.' % (label, eventNumber)
+                numFailures += 1
+    return numFailures
+
+## @brief Index an evt file in both ways and look up some events.
+## @param filePath
+#  The path to the evt file.
+
+def testEvt(filePath):
+    from eventFile import LSEReader
+    from pEvtMetaContextProcessor import pEvtMetaContextProcessor
+    from pEvtMetaContextProcessor import getEvtMeta
+    scanIndex = pEventIndex(filePath)
+    scanIndex.build()
+    loopIndex = pEventIndex(filePath)
+    metaProcessor = pEvtMetaContextProcessor(None, None)
+    timestamps = []
+    reader = LSEReader(filePath)
+    offset = reader.tell()
+    evt = reader.nextEvent()
+    while not evt.isNull():
+        timestamp = metaProcessor.calculateTimeStamp(getEvtMeta(evt),
+                                                     evt.ctx())
+        loopIndex.addEvent(offset, reader.tell() - offset, timestamp)
+        timestamps.append(timestamp)
+        offset = reader.tell()
+        evt = reader.nextEvent()
+    loopIndex.commit()
+    numFailures = compare('evt', scanIndex, loopIndex)
+    numFailures += lookupEvt('evt scan', scanIndex, timestamps)
+    numFailures += lookupEvt('evt loop', loopIndex, timestamps)
+    return numFailures
+
+
+if __name__ == '__main__':
+    numFailures = testLDF()
+    if len(sys.argv) > 1:
+        numFailures += testEvt(sys.argv[1])
+    if numFailures:
+        sys.exit('%d failures found. Abort.' % numFailures)
+    print 'All checks passed.'
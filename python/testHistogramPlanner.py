@@ -0,0 +1,219 @@
+#!/bin/env python
+
+## @brief Check the histograms filled by the pHistogramPlanner against the
+#  same histograms filled directly through ROOT (TH1F::Fill() for the 1-d
+#  histograms, TTree::Project() for the 2-d histograms and the strip
+#  charts).
+
+import sys
+import numpy
+
+from xml.dom           import minidom
+from pSafeROOT         import ROOT
+from pHistogramPlanner import pPlannedHistogram
+from pHistogramPlanner import pPlannedStripChart
+from pXmlOutputList    import pStripChartXmlRep
+from pXmlOutputList    import pRateStripChartXmlRep
+
+NUM_ENTRIES = 10000
+TOLERANCE   = 1e-6
+STRIP_CHART = '<%s name="%s" enabled="True"><title>%s</title>'\
+              '<expression>y</expression><cut>w</cut><dtime>7.5</dtime>'\
+              '<ymin>-4</ymin><ymax>4</ymax></%s>'
+
+
+## @brief Return the statistics of a ROOT histogram, as a list.
+## @param histogram
+#  The ROOT histogram.
+## @param size
+#  The number of statistics.
+
+def getStats(histogram, size):
+    stats = numpy.zeros((size), 'float64')
+    histogram.GetStats(stats)
+    return list(stats)
+
+## @brief Compare two lists of numbers and return the number of mismatches.
+## @param label
+#  The label for the printout.
+## @param planned
+#  The values from the planned histogram.
+## @param direct
+#  The values from the directly filled histogram.
+
+def compare(label, planned, direct):
+    numFailures = 0
+    for (i, (a, b)) in enumerate(zip(planned, direct)):
+        if abs(a - b) > TOLERANCE*max(1.0, abs(b)):
+            print '%s[%d] mismatch: planned %f, direct %f' % (label, i, a, b)
+            numFailures += 1
+    return numFailures
+
+## @brief Fill a planned 1-d histogram and a TH1F with the same values and
+#  compare contents, number of entries and statistics.
+## @param weighted
+#  If True a random cut (i.e. weight) is applied to the entries.
+
+def test1d(weighted):
+    values = numpy.random.normal(0.0, 2.0, (NUM_ENTRIES, 1))
+    if weighted:
+        weights = numpy.random.randint(0, 3, NUM_ENTRIES).astype('float64')
+    else:
+        weights = None
+    plannedHist = ROOT.TH1F('hPlanned', 'hPlanned', 50, -5, 5)
+    directHist = ROOT.TH1F('hDirect', 'hDirect', 50, -5, 5)
+    planned = pPlannedHistogram(plannedHist, [('x', (), ())], None)
+    planned.fill([values[:NUM_ENTRIES/2]], None if weights is None else\
+                     weights[:NUM_ENTRIES/2])
+    planned.fill([values[NUM_ENTRIES/2:]], None if weights is None else\
+                     weights[NUM_ENTRIES/2:])
+    planned.commit()
+    if weighted:
+        directHist.Sumw2()
+    for i in xrange(NUM_ENTRIES):
+        if weights is None:
+            directHist.Fill(values[i][0])
+        elif weights[i]:
+            directHist.Fill(values[i][0], weights[i])
+    label = 'TH1F (%s)' % ['unweighted', 'weighted'][weighted]
+    numFailures = 0
+    numFailures += compare('%s contents' % label,
+                           [plannedHist.GetBinContent(i) for i in xrange(52)],
+                           [directHist.GetBinContent(i) for i in xrange(52)])
+    numFailures += compare('%s entries' % label, [plannedHist.GetEntries()],
+                           [directHist.GetEntries()])
+    numFailures += compare('%s stats' % label, getStats(plannedHist, 4),
+                           getStats(directHist, 4))
+    plannedHist.Delete()
+    directHist.Delete()
+    return numFailures
+
+## @brief Create a ROOT tree with a time stamp, two correlated values and
+#  an integer cut (i.e. weight) per entry.
+#
+#  Return the tree and the dictionary of the numpy arrays of the values
+#  (each one of shape (number of entries, 1)).
+
+def createTree():
+    columns = {'event_timestamp': numpy.sort(numpy.random.uniform(0.0, 1000.0,
+                                                                  NUM_ENTRIES)),
+               'x': numpy.random.normal(0.0, 2.0, NUM_ENTRIES),
+               'w': numpy.random.randint(0, 3, NUM_ENTRIES).astype('float64')}
+    columns['y'] = 0.5*columns['x'] + numpy.random.normal(0.0, 1.0,
+                                                          NUM_ENTRIES)
+    rootTree = ROOT.TTree('testTree', 'testTree')
+    buffers = {}
+    for name in columns.keys():
+        buffers[name] = numpy.zeros((1), 'float64')
+        rootTree.Branch(name, buffers[name], '%s/D' % name)
+    for i in xrange(NUM_ENTRIES):
+        for name in columns.keys():
+            buffers[name][0] = columns[name][i]
+        rootTree.Fill()
+    for name in columns.keys():
+        columns[name] = columns[name].reshape((NUM_ENTRIES, 1))
+    return (rootTree, columns)
+
+## @brief Fill a planned 2-d histogram and project the same tree variables
+#  into a TH2F, then compare contents, errors, number of entries and the 7
+#  statistics.
+## @param rootTree
+#  The ROOT tree.
+## @param columns
+#  The numpy arrays of the tree variables.
+## @param weighted
+#  If True the cut (i.e. weight) is applied to the entries.
+
+def test2d(rootTree, columns, weighted):
+    plannedHist = ROOT.TH2F('hPlanned2d', 'hPlanned2d', 20, -5, 5, 15, -3, 3)
+    directHist = ROOT.TH2F('hDirect2d', 'hDirect2d', 20, -5, 5, 15, -3, 3)
+    cut = ['', 'w'][weighted]
+    planned = pPlannedHistogram(plannedHist, [('x', (), ()), ('y', (), ())],
+                                cut)
+    half = NUM_ENTRIES/2
+    for selection in [slice(None, half), slice(half, None)]:
+        planned.fill([columns['x'][selection], columns['y'][selection]],
+                     [None, columns['w'][selection].ravel()][weighted])
+    planned.commit()
+    rootTree.Project('hDirect2d', 'y:x', cut)
+    label = 'TH2F (%s)' % ['unweighted', 'weighted'][weighted]
+    bins = [(i, j) for i in xrange(22) for j in xrange(17)]
+    numFailures = 0
+    numFailures += compare('%s contents' % label,
+                           [plannedHist.GetBinContent(*b) for b in bins],
+                           [directHist.GetBinContent(*b) for b in bins])
+    numFailures += compare('%s errors' % label,
+                           [plannedHist.GetBinError(*b) for b in bins],
+                           [directHist.GetBinError(*b) for b in bins])
+    numFailures += compare('%s entries' % label, [plannedHist.GetEntries()],
+                           [directHist.GetEntries()])
+    numFailures += compare('%s stats' % label, getStats(plannedHist, 7),
+                           getStats(directHist, 7))
+    plannedHist.Delete()
+    directHist.Delete()
+    return numFailures
+
+## @brief Fill a planned strip chart and create the same strip chart the
+#  way the plot representation does it (i.e. through TTree::Project()
+#  and TH2::ProfileX()), then compare the two profiles.
+## @param rootTree
+#  The ROOT tree.
+## @param columns
+#  The numpy arrays of the tree variables.
+## @param rate
+#  If True a rate strip chart is used.
+
+def testStripChart(rootTree, columns, rate):
+    plotType = ['StripChart', 'RateStripChart'][rate]
+    xmlString = STRIP_CHART % (plotType, 'sc', 'sc', plotType)
+    element = minidom.parseString(xmlString).documentElement
+    rep = [pStripChartXmlRep, pRateStripChartXmlRep][rate](element)
+    timeRange = (rootTree.GetMinimum('event_timestamp'),
+                 rootTree.GetMaximum('event_timestamp'))
+    planned = pPlannedStripChart(rep, None, None,
+                                 [('event_timestamp', (), ()), ('y', (), ())],
+                                 'w', timeRange)
+    half = NUM_ENTRIES/2
+    for selection in [slice(None, half), slice(half, None)]:
+        planned.fill([columns['event_timestamp'][selection],
+                      columns['y'][selection]],
+                     columns['w'][selection].ravel())
+    planned.commit()
+    plannedProfile = rep.RootObjects['sc']
+    plannedProfile.SetName('scPlanned')
+    htemp = rep.createTimeHistogram('htemp', *timeRange)
+    rootTree.Project('htemp', 'y:event_timestamp', 'w')
+    directProfile = rep.createProfile(htemp)
+    label = plotType
+    bins = range(plannedProfile.GetNbinsX() + 2)
+    numFailures = 0
+    numFailures += compare('%s bins' % label, [plannedProfile.GetNbinsX()],
+                           [directProfile.GetNbinsX()])
+    numFailures += compare('%s contents' % label,
+                           [plannedProfile.GetBinContent(i) for i in bins],
+                           [directProfile.GetBinContent(i) for i in bins])
+    numFailures += compare('%s errors' % label,
+                           [plannedProfile.GetBinError(i) for i in bins],
+                           [directProfile.GetBinError(i) for i in bins])
+    numFailures += compare('%s bin entries' % label,
+                           [plannedProfile.GetBinEntries(i) for i in bins],
+                           [directProfile.GetBinEntries(i) for i in bins])
+    numFailures += compare('%s entries' % label,
+                           [plannedProfile.GetEntries()],
+                           [directProfile.GetEntries()])
+    plannedProfile.Delete()
+    directProfile.Delete()
+    return numFailures
+
+
+if __name__ == '__main__':
+    numpy.random.seed(1)
+    numFailures = test1d(False) + test1d(True)
+    (rootTree, columns) = createTree()
+    numFailures += test2d(rootTree, columns, False)
+    numFailures += test2d(rootTree, columns, True)
+    numFailures += testStripChart(rootTree, columns, False)
+    numFailures += testStripChart(rootTree, columns, True)
+    if numFailures:
+        sys.exit('%d mismatches found. Abort.' % numFailures)
+    print 'All checks passed.'
@@ -32,13 +32,14 @@ if __name__ == '__main__':
     gSAAFlag.SetLineColor(ROOT.kRed)
     gSAAFlag.SetMarkerColor(ROOT.kRed)
     parser = pM7Parser(inputFilePath, SAA_XML_FILE_PATH)
+    (lats, lons, alts) = parser.getEarthCoordinates()
+    dists = parser.SAAPolygon.getDistancesToBorder(lons, lats)
     for (i, met) in enumerate(parser.TimePoints):
-        pos = parser.getSCPosition((met,0))
-        pos.processCoordinates()
-        lon = pos.getLongitude()
-        lat = pos.getLatitude()
-        dsaa = pos.getDistanceToSAA()
-        fsaa = int(pos.OrbInSAA)
+        index = parser.getSCPositionIndex((met,0))
+        lon = float(lons[index])
+        lat = float(lats[index])
+        dsaa = float(dists[index])
+        fsaa = int(parser.EphemerisTable['insaa'][index])
         if (dsaa < 0 and fsaa == 0) or (dsaa > 0 and fsaa > 0):
             print 'MET %d s (%.3f, %.3f): SAA dist. is %.2f km (flag is %d)' %\
                   (met, lon, lat, dsaa, fsaa)